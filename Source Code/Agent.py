@@ -1,27 +1,85 @@
 import random
 import math
 
+# integer codes for each health status label (used by array-based engines)
+HEALTHY = 0
+ASYMPTOMATIC = 1
+SYMPTOMATIC = 2
+DEAD = 3
+STATUS_LABELS = ["healthy", "asymptomatic", "symptomatic", "dead"]
+
 class Agent:
     """Agent class
     Represents an agent on the network.
     """
     agent_id = 0
-    def __init__(self, node):
+    # current timestep of the simulation, kept up to date by Network (the default of get_status)
+    time_elapsed = 0
+    def __init__(self, node, stream=None):
         """__init__ - Agent Initialization function
         Inputs:
             - node: location at which Agent starts at
+            - (Optional) stream: UniformStream to draw the age from (random module if None)
         Outputs:
             - None; returns Agent object
         """
         # set the agent's id and increment class counter
         self.__id = Agent.agent_id; Agent.agent_id+= 1
+        # infected_at: timestep of infection (-1 when healthy or dead)
         self.__health_status = { "label": "healthy", 
-                                 "days_infected": -1 }
+                                 "infected_at": -1 }
 
-        self.__age_categorize(random.randint(0, 82))
+        self.__age_categorize(random.randint(0, 82) if stream is None else stream.integers(83))
         self.__location = node
         self.__susceptibility_factor = math.e**(-(self.__age) / 10)
 
+    @classmethod
+    def restore(cls, agent_id, node, label, infected_at, age):
+        """restore - rebuilds a checkpointed Agent without drawing a new age
+        Inputs:
+            - agent_id: the agent's id
+            - node: location of the agent
+            - label: health status label
+            - infected_at: timestep of infection (-1 when healthy or dead)
+            - age: age category [1-4]
+        Outputs:
+            - Agent object
+        """
+        agent = cls.__new__(cls)
+        agent.__id = agent_id
+        agent.__health_status = { "label": label,
+                                  "infected_at": infected_at }
+        agent.__age = age
+        agent.__location = node
+        agent.__susceptibility_factor = math.e**(-(agent.__age) / 10)
+        return agent
+
+    @classmethod
+    def create_many(cls, nodes, ages):
+        """create_many - creates a batch of healthy Agents with consecutive ids
+        Takes ages already drawn and categorized, so no random draws are made.
+        Inputs:
+            - nodes: list of starting locations
+            - ages: list of age categories [1-4]
+        Outputs:
+            - list of Agent objects, ids in list order
+        """
+        first = Agent.agent_id
+        Agent.agent_id += len(nodes)
+        # susceptibility depends only on the age category
+        susceptibility = {age: math.e**(-(age) / 10) for age in range(1, 5)}
+        agents = []
+        for i, (node, age) in enumerate(zip(nodes, ages)):
+            agent = cls.__new__(cls)
+            agent.__id = first + i
+            agent.__health_status = { "label": "healthy",
+                                      "infected_at": -1 }
+            agent.__age = age
+            agent.__location = node
+            agent.__susceptibility_factor = susceptibility[age]
+            agents.append(agent)
+        return agents
+
     # ----------------------------------------------------------#
     #                Internal Class Functions                   #
     # ----------------------------------------------------------#
@@ -53,9 +111,19 @@ class Agent:
     def get_id(self):
         # get agent's id
         return self.__id
-    def get_status(self):
-        # get status tuple: (label, days_infected)
-        return self.__health_status["label"], self.__health_status["days_infected"]
+    def get_status_code(self):
+        # get integer code of the health status label (index into STATUS_LABELS)
+        return STATUS_LABELS.index(self.__health_status["label"])
+    def get_status(self, time_elapsed=None):
+        # get status tuple at a timestep (default: the current one): (label, days_infected)
+        if time_elapsed is None:
+            time_elapsed = Agent.time_elapsed
+        if self.__health_status["infected_at"] < 0:
+            return self.__health_status["label"], -1
+        return self.__health_status["label"], time_elapsed - self.__health_status["infected_at"]
+    def get_infected_at(self):
+        # get timestep of infection (-1 when healthy or dead)
+        return self.__health_status["infected_at"]
     def get_infectious(self):
         # returns boolean about infectious or not
         if self.__health_status["label"] in ["asymptomatic", "symptomatic"]:
@@ -78,62 +146,45 @@ class Agent:
     def set_location(self, node):
         # sets location to be new node
         self.__location = node
-    def set_infected(self):
-        # sets agent to be infected - for initial cases
+    def set_infected(self, time_elapsed):
+        # sets agent to be infected at a timestep - for initial cases
         self.__health_status["label"] = "asymptomatic"
-        self.__health_status["days_infected"] = 0
+        self.__health_status["infected_at"] = time_elapsed
+    def set_symptomatic(self):
+        # asymptomatic -> symptomatic transition
+        self.__health_status["label"] = "symptomatic"
+    def set_dead(self):
+        # symptomatic -> dead transition
+        self.__health_status["label"] = "dead"
+        self.__health_status["infected_at"] = -1
 
     # ----------------------------------------------------------#
     #                     Class Methods                         #
     # ----------------------------------------------------------#
 
-    def update_agent(self, asympt_phase_length, sympt_phase_length):
-        """update_agent method
-        Performs a single time-step update on agent
-        Inputs:
-            - asympt_phase_length: integer denoting length of time for asymptomatic phase
-            - sympt_phase_length: integer denoting length of time for symptomatic phase
-        Outputs:
-            boolean: indicative of death flag
-        """
-        # updates performed only on infected individuals - skip if dead or healthy
-        if self.__health_status["label"] not in ["healthy", "dead"]:
-            # increment the days_infected counter
-            self.__health_status["days_infected"] += 1
-
-            # check if phase transition is required (asympt -> sympt) and update
-            if self.__health_status["label"] == "asymptomatic":
-                if self.__health_status["days_infected"] > asympt_phase_length:
-                    self.__health_status["label"] = "symptomatic"
-            # check if phase transition is required (sympt -> dead) and update
-            else:
-                if self.__health_status["days_infected"] > asympt_phase_length + sympt_phase_length:
-                    self.__health_status["label"] = "dead"
-                    self.__health_status["days_infected"] = -1
-                    return True
-        return False
-
-    def expose_to_infection(self, λ):
+    def expose_to_infection(self, λ, time_elapsed, stream=None):
         """expose_to_infection method
         Attempt to expose agent to infection, with probability of catching
         Inputs:
             - λ: probability of catching infection
+            - time_elapsed: current timestep (recorded as the time of infection)
+            - (Optional) stream: UniformStream to draw from (random module if None)
         Outputs:
             - boolean: returns boolean of if infection occurred; potential update in health_status
         """
         # check for existing infection; can't catch while already caught
         if self.__health_status["label"] not in ["asymptomatic", "symptomatic", "dead"]:
             # compute a probability to compare to
-            probability = random.randint(1, 100) / 100
+            probability = random.randint(1, 100) / 100 if stream is None else stream.next()
             # check if agent will be infected (factoring in susceptibility)
             # update if necessary
             if probability <= (λ * self.__susceptibility_factor):
                 self.__health_status["label"] = "asymptomatic"
-                self.__health_status["days_infected"] = 0
+                self.__health_status["infected_at"] = time_elapsed
                 return True
         return False
 
-    def move_agent(self, n_age_1, n_age_2, target_node, β):
+    def move_agent(self, n_age_1, n_age_2, target_node, β, stream=None):
         """move_agent method
         Attempts to move agent to target node
         2 Possible Probabilities dependent on situation:
@@ -146,6 +197,7 @@ class Agent:
             - n_age_2: integer representing number of same-age nearest neighbors at site 2
             - target_node: node representing location to move
             - β: age-dependent mobility factor (dictionary object)
+            - (Optional) stream: UniformStream to draw from (random module if None)
         Outputs:
             - Status (boolean): did operation succeed?
         """
@@ -154,7 +206,7 @@ class Agent:
             return False
 
         # computer a probability to compare to
-        probability = random.randint(1, 100) / 100
+        probability = random.randint(1, 100) / 100 if stream is None else stream.next()
 
         # Case 1: s_1 -> s_2 movement increases/remains constant to n_age_2 as compared to n_age_1
         if n_age_1 <= n_age_2:
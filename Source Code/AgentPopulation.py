@@ -0,0 +1,270 @@
+import numpy as np
+from Agent import HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, STATUS_LABELS
+from Storage import allocate, grow, block_ranges
+
+# age category of every integer age drawn in [0, 82]: baby = 4, youth = 3, adult = 1, elderly = 2
+AGE_CATEGORIES = np.array([4] * 5 + [3] * 10 + [1] * 50 + [2] * 18, dtype=np.uint8)
+# susceptibility factor e^(-age / 10) of each age category (index 0 unused)
+SUSCEPTIBILITY = np.exp(-np.arange(5, dtype=np.float32) / 10)
+
+def categorize_ages(ages):
+    """categorize_ages - vectorized version of Agent.__age_categorize
+    Inputs:
+        - ages: integer array of ages in [0, 82]
+    Outputs:
+        - uint8 array of age categories [1-4]
+    """
+    return AGE_CATEGORIES[ages]
+
+class AgentPopulation:
+    """AgentPopulation class
+    Struct-of-arrays store for agents. Each attribute of an Agent is a column
+    (one NumPy array per attribute) and an agent is simply a row index into
+    those columns, which is also its id. Given a working directory, the
+    columns are memory-mapped files there instead of in-memory arrays, and
+    blocks() hands them out in bounded slices.
+    """
+    # column name -> dtype; a row of these is all the memory one agent costs
+    columns = { "status": np.uint8, # integer-coded health label (see Agent.STATUS_LABELS)
+                "days_infected": np.int32, # days since infection (-1 if not infected)
+                "age": np.uint8, # age category [1-4]
+                "susceptibility": np.float32, # infection susceptibility factor
+                "location": np.int32 } # index of the node the agent occupies
+
+    def __init__(self, capacity=0, workdir=None):
+        """__init__ - AgentPopulation Initialization function
+        Inputs:
+            - (Optional) capacity: number of rows to pre-allocate
+            - (Optional) workdir: directory to memory-map the columns in (None = keep them in memory)
+        Outputs:
+            - None; returns AgentPopulation object
+        """
+        # number of rows in use
+        self.__size = 0
+        self.__workdir = workdir
+        # backing arrays; only the first self.__size rows are valid
+        self.__columns = {name: allocate(workdir, f"agent_{name}", capacity, dtype) for name, dtype in AgentPopulation.columns.items()}
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __reserve(self, capacity):
+        """__reserve - grows the backing arrays to hold at least capacity rows
+        Growth is geometric so repeated single appends (influx) are amortized O(1).
+        Inputs:
+            - capacity: minimum number of rows required
+        Outputs:
+            - None
+        """
+        current = len(self.__columns["status"])
+        if capacity <= current:
+            return
+        new_capacity = max(capacity, 2 * current, 16)
+        for name, column in self.__columns.items():
+            self.__columns[name] = grow(column, self.__workdir, f"agent_{name}", new_capacity)
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def __len__(self):
+        # number of agents stored
+        return self.__size
+
+    @property
+    def status(self):
+        # live view of the status column
+        return self.__columns["status"][:self.__size]
+    @property
+    def days_infected(self):
+        # live view of the days_infected column
+        return self.__columns["days_infected"][:self.__size]
+    @property
+    def age(self):
+        # live view of the age category column
+        return self.__columns["age"][:self.__size]
+    @property
+    def susceptibility(self):
+        # live view of the susceptibility column
+        return self.__columns["susceptibility"][:self.__size]
+    @property
+    def location(self):
+        # live view of the location column
+        return self.__columns["location"][:self.__size]
+
+    def get_agent(self, index):
+        # returns an Agent-compatible view of a single row
+        return AgentView(self, index)
+    def nbytes(self):
+        # bytes currently allocated by the backing arrays (including spare capacity)
+        return sum(column.nbytes for column in self.__columns.values())
+    def get_workdir(self):
+        # returns the directory the columns are memory-mapped in (None when in memory)
+        return self.__workdir
+
+    @staticmethod
+    def bytes_per_agent():
+        # bytes a single agent occupies across all columns
+        return sum(np.dtype(dtype).itemsize for dtype in AgentPopulation.columns.values())
+    @staticmethod
+    def estimate_bytes(count):
+        # bytes needed to store count agents, without spare capacity
+        return count * AgentPopulation.bytes_per_agent()
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def append(self, age, location, status=HEALTHY, days_infected=-1):
+        """append - adds a batch of agents to the population
+        Inputs:
+            - age: array of age categories [1-4]
+            - location: array of node indices
+            - (Optional) status: status code, scalar or array
+            - (Optional) days_infected: scalar or array
+        Outputs:
+            - indices: array of the new agents' ids
+        """
+        count = len(age)
+        start = self.__size
+        self.__reserve(start + count)
+        self.__columns["age"][start:start + count] = age
+        self.__columns["location"][start:start + count] = location
+        self.__columns["status"][start:start + count] = status
+        self.__columns["days_infected"][start:start + count] = days_infected
+        # susceptibility depends only on age category
+        self.__columns["susceptibility"][start:start + count] = SUSCEPTIBILITY[np.asarray(age, dtype=np.intp)]
+        self.__size += count
+        return np.arange(start, start + count)
+
+    def extend(self, count, status=HEALTHY, days_infected=-1):
+        """extend - adds count rows whose age and location are filled in afterwards
+        Lets a large batch be generated block by block (see blocks and
+        AgentBlock.set_ages) instead of as one array per column.
+        Inputs:
+            - count: number of agents to add
+            - (Optional) status: status code of the new agents
+            - (Optional) days_infected: day counter of the new agents
+        Outputs:
+            - start: id of the first new agent
+        """
+        start = self.__size
+        self.__reserve(start + count)
+        self.__columns["status"][start:start + count] = status
+        self.__columns["days_infected"][start:start + count] = days_infected
+        self.__size += count
+        return start
+
+    def blocks(self, size=None, start=0):
+        """blocks - consecutive slices of the population, for bounded-memory passes
+        Inputs:
+            - (Optional) size: agents per block (None = a single block)
+            - (Optional) start: id of the first agent to cover
+        Outputs:
+            - generator of AgentBlock
+        """
+        for block_start, block_stop in block_ranges(self.__size - start, size or self.__size - start):
+            yield AgentBlock(self, start + block_start, start + block_stop)
+
+    def remove(self, index):
+        """remove - removes one agent by moving the last row into its place
+        Removal is O(1), but the agent that was in the last row changes id.
+        Inputs:
+            - index: row of the agent to remove
+        Outputs:
+            - record: dictionary of the removed agent's column values
+        """
+        last = self.__size - 1
+        record = {name: column[index].item() for name, column in self.__columns.items()}
+        for column in self.__columns.values():
+            column[index] = column[last]
+        self.__size -= 1
+        return record
+
+class AgentBlock:
+    """AgentBlock class
+    Views of every column over a consecutive range of agents. It has the same
+    column attributes as AgentPopulation, so the array kernels run on a block
+    exactly as on the whole population; indices they return are local to the
+    block (add start for agent ids).
+    """
+    def __init__(self, population, start, stop):
+        """__init__ - AgentBlock Initialization function
+        Inputs:
+            - population: AgentPopulation holding the agents
+            - start: id of the first agent in the block
+            - stop: id one past the last agent in the block
+        Outputs:
+            - None; returns AgentBlock object
+        """
+        self.start = start
+        self.status = population.status[start:stop]
+        self.days_infected = population.days_infected[start:stop]
+        self.age = population.age[start:stop]
+        self.susceptibility = population.susceptibility[start:stop]
+        self.location = population.location[start:stop]
+
+    def __len__(self):
+        # number of agents in the block
+        return len(self.status)
+
+    def set_ages(self, age):
+        # sets the age categories of the block, and the susceptibility that depends on them
+        self.age[:] = age
+        self.susceptibility[:] = SUSCEPTIBILITY[np.asarray(age, dtype=np.intp)]
+
+class AgentView:
+    """AgentView class
+    Lightweight stand-in for an Agent that reads and writes one row of an
+    AgentPopulation, so code written against the Agent getters/setters keeps
+    working without allocating a full object per agent.
+    """
+    __slots__ = ("__population", "__index")
+
+    def __init__(self, population, index):
+        """__init__ - AgentView Initialization function
+        Inputs:
+            - population: AgentPopulation holding the agent
+            - index: row of the agent in the population
+        Outputs:
+            - None; returns AgentView object
+        """
+        self.__population = population
+        self.__index = index
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_id(self):
+        # get agent's id
+        return self.__index
+    def get_status(self, time_elapsed=None):
+        # get status tuple: (label, days_infected); the day counter is stored, so the timestep is not needed
+        return (STATUS_LABELS[self.__population.status[self.__index]],
+                int(self.__population.days_infected[self.__index]))
+    def get_infectious(self):
+        # returns boolean about infectious or not
+        return self.__population.status[self.__index] in (ASYMPTOMATIC, SYMPTOMATIC)
+    def get_symptomatic(self):
+        # returns if symptomatic or not
+        return bool(self.__population.status[self.__index] == SYMPTOMATIC)
+    def get_age(self):
+        # get age category
+        return int(self.__population.age[self.__index])
+    def get_location(self):
+        # get location node where agent is current on
+        return int(self.__population.location[self.__index])
+
+    # ----------------------------------------------------------#
+    #                         Setters                           #
+    # ----------------------------------------------------------#
+
+    def set_location(self, node):
+        # sets location to be new node
+        self.__population.location[self.__index] = node
+    def set_infected(self, time_elapsed=None):
+        # sets agent to be infected - for initial cases (the day counter starts at 0 whatever the timestep)
+        self.__population.status[self.__index] = ASYMPTOMATIC
+        self.__population.days_infected[self.__index] = 0
@@ -0,0 +1,373 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+from Network import Network
+from VectorNetwork import VectorNetwork
+from CompartmentNetwork import CompartmentNetwork
+from Topology import TOPOLOGIES, make_topology
+from Rng import RandomStreams
+from main import default_args
+
+# engine name -> simulation class
+ENGINES = { "graph": Network, "vector": VectorNetwork, "compartment": CompartmentNetwork }
+# modules a headless run without output should never import
+HEAVY_MODULES = ["networkx", "matplotlib", "pyarrow"]
+# startup timings compared against a baseline
+STARTUP_METRICS = ["help_ms", "import_ms", "build_ms", "first_step_ms", "time_to_first_step_ms"]
+# run in a fresh interpreter by measure_startup: imports main and the engine, builds the network and runs one step
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from main import default_args, load_engine
+args = default_args(**json.loads(sys.argv[1]))
+engine = load_engine(args.engine)
+imported = time.perf_counter()
+network = engine(args)
+built = time.perf_counter()
+network.step()
+stepped = time.perf_counter()
+print(json.dumps({ "clock": time.time(), "import_ms": (imported - start) * 1000, "build_ms": (built - imported) * 1000,
+                   "first_step_ms": (stepped - built) * 1000,
+                   "modules": sorted(name for name in sys.argv[2:] if name in sys.modules) }))
+network.close()
+"""
+
+def time_steps(network, steps):
+    """time_steps - times a number of timesteps on an initialized network
+    Inputs:
+        - network: Network or VectorNetwork object
+        - steps: number of timesteps to run
+    Outputs:
+        - float: mean wall-clock seconds per timestep
+    """
+    start = time.perf_counter()
+    for _ in range(steps):
+        network.step()
+    return (time.perf_counter() - start) / steps
+
+def benchmark_infected_scaling(engine, L, N, infected_counts, steps):
+    """benchmark_infected_scaling - per-step time against number of infected agents at fixed L
+    Transmission is disabled and the asymptomatic phase outlasts the run, so
+    the infected count stays at n_0 for every timed step.
+    Inputs:
+        - engine: name of an engine in ENGINES
+        - L: lattice dimension
+        - N: population density
+        - infected_counts: list of n_0 values to measure
+        - steps: timesteps to average over for each n_0
+    Outputs:
+        - rows: list of (n_0, seconds per step)
+    """
+    rows = []
+    for n_0 in infected_counts:
+        args = default_args(engine=engine, L=L, N=N, n_0=n_0, lam=0.0, asym_l=steps + 1, t=steps, headless=True)
+        network = ENGINES[engine](args)
+        rows.append((n_0, time_steps(network, steps)))
+    return rows
+
+def benchmark_topologies(L, names, rewire=0.1, edge_list=None):
+    """benchmark_topologies - build time and memory of each topology provider
+    Inputs:
+        - L: lattice dimension
+        - names: list of topology names
+        - (Optional) rewire: rewiring probability for small_world
+        - (Optional) edge_list: edge-list file for edge_list
+    Outputs:
+        - topologies: list of compiled Topology objects (each reports its build time and size)
+    """
+    topologies = []
+    for name in names:
+        args = default_args(L=L, topology=name, rewire=rewire, edge_list=edge_list)
+        topologies.append(make_topology(args, RandomStreams(0).get("topology")))
+    return topologies
+
+def benchmark_thread_scaling(L, N, fraction, thread_counts, steps, seed=0):
+    """benchmark_thread_scaling - vector engine phase times against the number of worker threads
+    Every thread count runs the same seeded configuration, and its series of
+    active infections is compared with the first one's: tiling must not change
+    the result.
+    Inputs:
+        - L: lattice dimension
+        - N: population density
+        - fraction: initially infected fraction of the population
+        - thread_counts: list of --threads values to measure (the first is the reference)
+        - steps: timesteps to average over for each thread count
+        - (Optional) seed: seed shared by every run
+    Outputs:
+        - rows: list of (threads, infection ms/step, death ms/step, step ms/step, identical to the reference)
+    """
+    n_0 = max(1, round(fraction * L * L * N))
+    rows, reference = [], None
+    for threads in thread_counts:
+        network = VectorNetwork(default_args(engine="vector", L=L, N=N, n_0=n_0, t=steps, seed=seed, headless=True, threads=threads))
+        network.enable_phase_timing()
+        seconds = time_steps(network, steps)
+        network.close()
+        phases = network.get_phase_times()["phases"]
+        if reference is None:
+            reference = network.get_plot_points()[0]
+        rows.append((threads, phases["infection"] * 1000 / steps, phases["death"] * 1000 / steps, seconds * 1000,
+                     network.get_plot_points()[0] == reference))
+    return rows
+
+def measure_startup(engine, L, N, seed=0):
+    """measure_startup - times a headless run from interpreter launch to the end of its first step
+    The run is a fresh `python` process, so nothing is imported in advance;
+    its command line is timed the same way with main.py --help.
+    Inputs:
+        - engine: engine name
+        - L: lattice dimension
+        - N: population density
+        - (Optional) seed: seed of the run
+    Outputs:
+        - result: dictionary of startup timings (ms) and the heavy modules the run imported
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=directory, check=True, stdout=subprocess.DEVNULL)
+    help_ms = (time.perf_counter() - start) * 1000
+    params = {"engine": engine, "L": L, "N": N, "t": 1, "seed": seed, "headless": True}
+    # wall clock rather than perf_counter: the end of the first step is read in the child
+    launched = time.time()
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, json.dumps(params)] + HEAVY_MODULES,
+                            cwd=directory, check=True, capture_output=True, text=True).stdout
+    child = json.loads(output.strip().splitlines()[-1])
+    return { "key": f"startup/{engine}/L={L}/N={N}", "config": params, "help_ms": help_ms,
+             "import_ms": child["import_ms"], "build_ms": child["build_ms"], "first_step_ms": child["first_step_ms"],
+             "time_to_first_step_ms": (child["clock"] - launched) * 1000, "modules": child["modules"] }
+
+def benchmark_startup(engines, L, N, repeats=1, seed=0):
+    """benchmark_startup - time to first step of every engine, for tracking CLI and worker startup
+    Inputs:
+        - engines: list of engine names
+        - L: lattice dimension
+        - N: population density
+        - (Optional) repeats: launches per engine (the minimum of each timing is kept)
+        - (Optional) seed: seed shared by every run
+    Outputs:
+        - report: JSON-serializable dictionary with the environment and one result per engine
+    """
+    results = []
+    for engine in engines:
+        runs = [measure_startup(engine, L, N, seed) for _ in range(repeats)]
+        result = dict(runs[0])
+        for metric in STARTUP_METRICS:
+            result[metric] = min(run[metric] for run in runs)
+        result["repeats"] = repeats
+        results.append(result)
+    return { "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+             "python": platform.python_version(), "numpy": np.__version__,
+             "machine": platform.machine(), "processor": platform.processor(),
+             "results": results }
+
+def peak_rss_mib():
+    # peak resident set size of this process in MiB (ru_maxrss is KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def expand_matrix(engines, Ls, Ns, fractions, steps, seed=0):
+    """expand_matrix - expands the benchmark matrix into a list of configurations
+    Inputs:
+        - engines: list of engine names
+        - Ls: list of lattice dimensions
+        - Ns: list of population densities
+        - fractions: list of initially infected fractions of the population
+        - steps: timesteps to time in each configuration
+        - (Optional) seed: seed shared by every configuration
+    Outputs:
+        - configs: list of dictionaries (engine, L, N, fraction, steps, seed, key)
+    """
+    configs = []
+    for engine, L, N, fraction in itertools.product(engines, Ls, Ns, fractions):
+        configs.append({ "key": f"{engine}/L={L}/N={N}/f={fraction}", "engine": engine, "L": L, "N": N,
+                         "fraction": fraction, "steps": steps, "seed": seed })
+    return configs
+
+def run_config(config):
+    """run_config - builds and runs one benchmark configuration headlessly
+    Meant to run in a fresh process, so the peak RSS it reports belongs to
+    this configuration alone.
+    Inputs:
+        - config: dictionary from expand_matrix
+    Outputs:
+        - result: dictionary of setup and per-phase timings (ms), step rate and memory
+    """
+    rss_before = peak_rss_mib()
+    agents = int(config["L"] * config["L"] * config["N"])
+    n_0 = max(1, round(config["fraction"] * agents))
+    args = default_args(engine=config["engine"], L=config["L"], N=config["N"], n_0=n_0,
+                        t=config["steps"], seed=config["seed"], headless=True)
+    start = time.perf_counter()
+    network = ENGINES[config["engine"]](args)
+    build = time.perf_counter() - start
+    network.enable_phase_timing()
+    start = time.perf_counter()
+    for _ in range(config["steps"]):
+        network.step()
+    elapsed = time.perf_counter() - start
+    network.close()
+    times = network.get_phase_times()
+    return { "key": config["key"], "config": config, "agents": agents, "n_0": n_0,
+             "build_ms": build * 1000,
+             "setup_ms": {name: seconds * 1000 for name, seconds in times["setup"].items()},
+             "phase_ms": {name: seconds * 1000 / config["steps"] for name, seconds in times["phases"].items()},
+             "step_ms": elapsed * 1000 / config["steps"],
+             "steps_per_second": config["steps"] / elapsed,
+             "infected_end": network.get_plot_points()[0][-1],
+             "peak_rss_mib": peak_rss_mib(),
+             "rss_growth_mib": peak_rss_mib() - rss_before }
+
+def best_of(results):
+    # merges repeats of one configuration, keeping the minimum of every timing
+    best = dict(results[0])
+    for field in ("build_ms", "step_ms", "peak_rss_mib", "rss_growth_mib"):
+        best[field] = min(result[field] for result in results)
+    for field in ("setup_ms", "phase_ms"):
+        best[field] = {name: min(result[field][name] for result in results) for name in results[0][field]}
+    best["steps_per_second"] = 1000 / best["step_ms"]
+    best["repeats"] = len(results)
+    return best
+
+def run_suite(configs, repeats=1):
+    """run_suite - runs every configuration, each repeat in its own process
+    Configurations run one at a time, so the timings are not contended.
+    Inputs:
+        - configs: list of configurations from expand_matrix
+        - (Optional) repeats: runs per configuration (the minimum of each timing is kept)
+    Outputs:
+        - report: JSON-serializable dictionary with the environment and one result per configuration
+    """
+    results = []
+    # a fresh process per task: ru_maxrss only ever grows within a process
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for config in configs:
+            result = best_of(pool.map(run_config, [config] * repeats, chunksize=1))
+            results.append(result)
+            print(f"{result['key']:<40} {result['step_ms']:>10.3f} ms/step {result['peak_rss_mib']:>8.1f} MiB")
+    return { "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+             "python": platform.python_version(), "numpy": np.__version__,
+             "machine": platform.machine(), "processor": platform.processor(),
+             "results": results }
+
+def report_metrics(result):
+    # flattens one result into metric name -> value
+    if "time_to_first_step_ms" in result:
+        return {metric: result[metric] for metric in STARTUP_METRICS}
+    metrics = { "build_ms": result["build_ms"], "step_ms": result["step_ms"], "peak_rss_mib": result["peak_rss_mib"] }
+    metrics.update({f"setup.{name}_ms": value for name, value in result["setup_ms"].items()})
+    metrics.update({f"phase.{name}_ms": value for name, value in result["phase_ms"].items()})
+    return metrics
+
+def compare_reports(report, baseline, tolerance=0.25, min_ms=0.5):
+    """compare_reports - compares a report against a stored baseline report
+    A metric regresses when it exceeds the baseline by more than tolerance
+    (relative). Timings below min_ms in both reports are too noisy to compare
+    and are skipped; configurations missing from either report are ignored.
+    Inputs:
+        - report: report returned by run_suite or benchmark_startup
+        - baseline: earlier report
+        - (Optional) tolerance: allowed relative slowdown / memory growth
+        - (Optional) min_ms: noise floor for timings
+    Outputs:
+        - rows: list of (key, metric, baseline value, current value, ratio, regressed)
+    """
+    previous = {result["key"]: report_metrics(result) for result in baseline["results"]}
+    rows = []
+    for result in report["results"]:
+        if result["key"] not in previous:
+            continue
+        for metric, value in report_metrics(result).items():
+            before = previous[result["key"]].get(metric)
+            if before is None or (metric.endswith("_ms") and max(before, value) < min_ms):
+                continue
+            ratio = value / before if before > 0 else float("inf")
+            rows.append((result["key"], metric, before, value, ratio, ratio > 1 + tolerance))
+    return rows
+
+def main():
+    # command-line options for the benchmark
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", type=str, nargs='?', default="graph", choices=list(ENGINES))
+    parser.add_argument("--L", type=int, nargs='?', default=100)
+    parser.add_argument("--N", type=float, nargs='?', default=1.0)
+    parser.add_argument("--steps", type=int, nargs='?', default=20)
+    parser.add_argument("--infected", type=int, nargs='*', default=[1, 10, 100, 1000])
+    parser.add_argument("--topologies", type=str, nargs='*', default=None, choices=TOPOLOGIES)
+    parser.add_argument("--edge_list", type=str, nargs='?', default=None)
+    # matrix - run the per-phase suite over engines x Ls x Ns x fractions
+    parser.add_argument("--matrix", action="store_true")
+    parser.add_argument("--engines", type=str, nargs='*', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--Ls", type=int, nargs='*', default=[50, 100, 200])
+    parser.add_argument("--Ns", type=float, nargs='*', default=[0.5, 1.0])
+    parser.add_argument("--fractions", type=float, nargs='*', default=[0.001, 0.01, 0.1])
+    parser.add_argument("--repeats", type=int, nargs='?', default=1)
+    parser.add_argument("--seed", type=int, nargs='?', default=0)
+    # threads - thread counts for the vector engine's tiled scaling benchmark (e.g. --threads 1 2 4 8)
+    parser.add_argument("--threads", type=int, nargs='*', default=None)
+    parser.add_argument("--fraction", type=float, nargs='?', default=0.01)
+    # startup - time to first step of fresh headless runs of these engines (none listed = all); uses --L, --N and --repeats
+    parser.add_argument("--startup", type=str, nargs='*', default=None, choices=list(ENGINES))
+    # report - JSON file to write the suite results to
+    parser.add_argument("--report", type=str, nargs='?', default=None)
+    # baseline - earlier report to compare against; exits with status 1 on a regression
+    parser.add_argument("--baseline", type=str, nargs='?', default=None)
+    parser.add_argument("--tolerance", type=float, nargs='?', default=0.25)
+    # min_ms - timings below this in both reports are not compared (too noisy)
+    parser.add_argument("--min_ms", type=float, nargs='?', default=0.5)
+    args = parser.parse_args()
+
+    # report topology build time and memory instead of timing steps
+    if args.topologies:
+        for topology in benchmark_topologies(args.L, args.topologies, edge_list=args.edge_list):
+            print(topology.describe())
+        return
+
+    # tiled infection/death phases of the vector engine against the number of threads
+    if args.threads:
+        print(f"engine=vector L={args.L} N={args.N} fraction={args.fraction} cores={os.cpu_count()}")
+        print(f"{'threads':>8} {'infection':>10} {'death':>10} {'step':>10} {'speedup':>8} {'efficiency':>10} {'identical':>9}")
+        rows = benchmark_thread_scaling(args.L, args.N, args.fraction, args.threads, args.steps, args.seed)
+        for threads, infection, death, step, identical in rows:
+            speedup = (rows[0][1] + rows[0][2]) / (infection + death)
+            print(f"{threads:>8} {infection:>10.3f} {death:>10.3f} {step:>10.3f} {speedup:>8.2f} {speedup * rows[0][0] / threads:>10.2f} {str(identical):>9}")
+        return
+
+    # per-phase suite or startup times, JSON report and baseline comparison
+    if args.startup is not None:
+        report = benchmark_startup(args.startup or list(ENGINES), args.L, args.N, args.repeats, args.seed)
+        print(f"{'configuration':<32} {'--help':>8} {'import':>8} {'build':>8} {'step':>8} {'first step':>11}  heavy modules")
+        for result in report["results"]:
+            print(f"{result['key']:<32} {result['help_ms']:>8.1f} {result['import_ms']:>8.1f} {result['build_ms']:>8.1f} "
+                  f"{result['first_step_ms']:>8.1f} {result['time_to_first_step_ms']:>11.1f}  {', '.join(result['modules']) or 'none'}")
+    elif args.matrix:
+        report = run_suite(expand_matrix(args.engines, args.Ls, args.Ns, args.fractions, args.steps, args.seed), args.repeats)
+    if args.startup is not None or args.matrix:
+        if args.report is not None:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.baseline is None:
+            return
+        with open(args.baseline) as f:
+            rows = compare_reports(report, json.load(f), args.tolerance, args.min_ms)
+        print(f"{'configuration':<40} {'metric':<22} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for key, metric, before, value, ratio, regressed in rows:
+            print(f"{key:<40} {metric:<22} {before:>10.3f} {value:>10.3f} {ratio:>7.2f}{'  REGRESSION' if regressed else ''}")
+        if any(row[5] for row in rows):
+            sys.exit(1)
+        return
+
+    print(f"engine={args.engine} L={args.L} N={args.N}")
+    print(f"{'infected':>10} {'ms/step':>10}")
+    for n_0, seconds in benchmark_infected_scaling(args.engine, args.L, args.N, args.infected, args.steps):
+        print(f"{n_0:>10} {seconds * 1000:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import numpy as np
+from Storage import allocate, grow
+
+class CellIndex:
+    """CellIndex class
+    Occupied-cell index and per-cell occupant lists of the vector engine, so a
+    single-agent move only touches the cells involved instead of scanning the
+    lattice and the agents. Occupied cells are counted in a Fenwick tree over
+    per-cell occupied flags, which finds the k-th occupied cell (in node order)
+    in O(log num_nodes); the occupants of each cell form a linked list in
+    ascending agent id. Both orders depend only on the agents' locations, so
+    the index is rebuilt from them after a checkpoint instead of being saved.
+    """
+    def __init__(self, num_nodes, workdir=None):
+        """__init__ - CellIndex Initialization function
+        Inputs:
+            - num_nodes: number of cells of the lattice
+            - (Optional) workdir: directory to memory-map the index in (None = keep it in memory)
+        Outputs:
+            - None; returns CellIndex object
+        """
+        self.__workdir = workdir
+        # Fenwick tree: entry i - 1 counts the occupied cells among nodes (i - lowbit(i), i] (1-based)
+        self.__tree = allocate(workdir, "occupied_tree", num_nodes, np.int64)
+        self.__num_occupied = 0
+        # first occupant of every cell and the next occupant of every agent (-1 = none)
+        self.__head = allocate(workdir, "occupant_head", num_nodes, np.int64)
+        self.__next = allocate(workdir, "occupant_next", 0, np.int64)
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __update(self, cell, delta):
+        # adds delta to the occupied count of cell in the Fenwick tree
+        i = cell + 1
+        while i <= len(self.__tree):
+            self.__tree[i - 1] += delta
+            i += i & -i
+        self.__num_occupied += delta
+
+    def __reserve(self, agent):
+        # grows the next-occupant links geometrically so they hold agent
+        if agent >= len(self.__next):
+            self.__next = grow(self.__next, self.__workdir, "occupant_next", max(agent + 1, 2 * len(self.__next), 16))
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_num_occupied(self):
+        # returns the number of cells holding at least one agent
+        return self.__num_occupied
+
+    def occupants(self, cell):
+        # returns the ids of the agents on cell, in ascending order
+        agents = []
+        agent = int(self.__head[cell])
+        while agent >= 0:
+            agents.append(agent)
+            agent = int(self.__next[agent])
+        return agents
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def build(self, node_blocks, agent_blocks):
+        """build - indexes the locations of every agent, replacing the current index
+        Works a block at a time, so only one block of agents or nodes is ever
+        copied into memory.
+        Inputs:
+            - node_blocks: (first, last) node ranges covering the lattice in order
+            - agent_blocks: AgentBlocks covering the population in order
+        Outputs:
+            - None
+        """
+        agent_blocks = list(agent_blocks)
+        self.__head[:] = -1
+        if agent_blocks:
+            self.__reserve(agent_blocks[-1].start + len(agent_blocks[-1]) - 1)
+        # link the agents from the last block back, so every list ends up in ascending id
+        for block in reversed(agent_blocks):
+            order = np.argsort(block.location, kind="stable")
+            agents = block.start + order
+            cells = block.location[order].astype(np.int64)
+            # first and last agent of the block on each cell
+            starts = np.ones(len(agents), dtype=bool)
+            starts[1:] = cells[1:] != cells[:-1]
+            ends = np.ones(len(agents), dtype=bool)
+            ends[:-1] = starts[1:]
+            self.__next[agents[:-1]] = agents[1:]
+            self.__next[agents[ends]] = self.__head[cells[ends]]
+            self.__head[cells[starts]] = agents[starts]
+        # prefix counts of the occupied cells, then turn them into the tree from the top block down
+        # (an entry only reads lower entries, which are still prefix counts at that point)
+        total = 0
+        for first, last in node_blocks:
+            self.__tree[first:last] = total + np.cumsum(self.__head[first:last] >= 0)
+            total = int(self.__tree[last - 1])
+        for first, last in reversed(node_blocks):
+            i = np.arange(first + 1, last + 1)
+            lower = i - (i & -i)
+            self.__tree[first:last] -= np.where(lower > 0, self.__tree[np.maximum(lower, 1) - 1], 0)
+        self.__num_occupied = total
+
+    def select(self, rank):
+        """select - finds an occupied cell by its rank among the occupied cells
+        Inputs:
+            - rank: position of the cell among the occupied cells in node order (0-based)
+        Outputs:
+            - int: node index of the cell
+        """
+        position, remaining = 0, rank + 1
+        step = 1 << (len(self.__tree).bit_length() - 1)
+        while step > 0:
+            if position + step <= len(self.__tree) and self.__tree[position + step - 1] < remaining:
+                position += step
+                remaining -= int(self.__tree[position - 1])
+            step >>= 1
+        return position
+
+    def add(self, agent, cell):
+        """add - places an agent on a cell, keeping the cell's occupants in ascending id
+        Inputs:
+            - agent: id of the agent
+            - cell: node index of the cell
+        Outputs:
+            - None
+        """
+        self.__reserve(agent)
+        previous, current = -1, int(self.__head[cell])
+        while 0 <= current < agent:
+            previous, current = current, int(self.__next[current])
+        self.__next[agent] = current
+        if previous >= 0:
+            self.__next[previous] = agent
+        else:
+            # cell becomes occupied when the agent is its only occupant
+            if current < 0:
+                self.__update(cell, 1)
+            self.__head[cell] = agent
+
+    def remove(self, agent, cell):
+        """remove - takes an agent off the cell it occupies
+        Inputs:
+            - agent: id of the agent
+            - cell: node index of the cell
+        Outputs:
+            - None
+        """
+        previous, current = -1, int(self.__head[cell])
+        while current != agent:
+            previous, current = current, int(self.__next[current])
+        if previous >= 0:
+            self.__next[previous] = self.__next[agent]
+        else:
+            self.__head[cell] = self.__next[agent]
+            # cell became empty
+            if self.__head[cell] < 0:
+                self.__update(cell, -1)
+
+    def move(self, agent, source, target):
+        # moves an agent from cell source to cell target
+        self.remove(agent, source)
+        self.add(agent, target)
@@ -0,0 +1,64 @@
+import json
+import os
+import numpy as np
+from Topology import Topology
+
+# bumped whenever the layout of a checkpoint changes
+CHECKPOINT_VERSION = 1
+
+def write_checkpoint(path, arrays, meta):
+    """write_checkpoint - writes simulation state as a single uncompressed .npz file
+    The file is written under a temporary name and renamed into place, so an
+    interrupted save never leaves a truncated checkpoint behind.
+    Inputs:
+        - path: checkpoint file path
+        - arrays: dictionary of name -> NumPy array (agent columns, occupancy, ...)
+        - meta: JSON-serializable dictionary (parameters, counters, RNG state)
+    Outputs:
+        - None
+    """
+    meta = dict(meta, version=CHECKPOINT_VERSION)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(path + ".tmp", path)
+
+def read_checkpoint(path, engine):
+    """read_checkpoint - reads a checkpoint written by write_checkpoint
+    Inputs:
+        - path: checkpoint file path
+        - engine: name of the engine expected to have written it
+    Outputs:
+        - (arrays, meta): dictionary of arrays and the metadata dictionary
+    """
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+        meta = json.loads(str(data["meta"]))
+    if meta.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {meta.get('version')}")
+    if meta.get("engine") != engine:
+        raise ValueError(f"{path}: checkpoint was written by the {meta.get('engine')} engine, not {engine}")
+    return arrays, meta
+
+def plot_points_to_array(plot_points):
+    # packs the per-age plot-point lists into a 5 x T array
+    return np.array([plot_points[key] for key in range(0, 5)], dtype=np.int64).reshape(5, -1)
+
+def plot_points_from_array(array):
+    # unpacks a 5 x T array into per-age plot-point lists
+    return {key: [int(value) for value in array[key]] for key in range(0, 5)}
+
+def stats_from_json(stats):
+    # restores integer age keys lost in the JSON round trip
+    return {int(key): dict(value) for key, value in stats.items()}
+
+def topology_to_arrays(topology):
+    # CSR adjacency of topologies that cannot be rebuilt from the parameters (randomized or read from a file)
+    if topology.get_name() in ("lattice", "torus"):
+        return {}
+    return { "topology_indptr": topology.get_indptr(), "topology_indices": topology.get_indices() }
+
+def topology_from_arrays(arrays, topology):
+    # the checkpointed topology when its adjacency was stored, else the one rebuilt for the run
+    if "topology_indptr" not in arrays:
+        return topology
+    return Topology(topology.get_name(), topology.get_L(), arrays["topology_indptr"], arrays["topology_indices"])
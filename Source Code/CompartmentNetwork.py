@@ -0,0 +1,613 @@
+import time
+import numpy as np
+from Agent import HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD
+from AgentPopulation import AGE_CATEGORIES, SUSCEPTIBILITY, categorize_ages
+from Display import Display, CELL_COLORS, cell_colors
+from OutputSink import make_sink
+from Recorder import make_recorder
+from Profiler import Profiler, make_profiler
+from Stopping import make_stop_criteria, pad_to_end
+from Checkpoint import write_checkpoint, read_checkpoint, plot_points_to_array, plot_points_from_array, stats_from_json, topology_to_arrays, topology_from_arrays
+from Kernels import stencil_sum, move_probability, neighbor_sum
+from Rng import RandomStreams
+from Storage import block_ranges
+from Topology import Topology, make_topology
+
+# agents counted into the compartments at a time while populating
+PLACEMENT_BLOCK = 1 << 20
+
+class CompartmentNetwork:
+    """CompartmentNetwork class
+    Cell-level alternative to the agent engines for high-density runs. Each
+    cell holds counts of agents per compartment: healthy and dead agents per
+    age category, and infected agents per age category and disease day.
+    New infections in a cell are a binomial draw over its healthy agents with
+    the agent engines' probability 1 - (1 - λ * susceptibility)^k, disease
+    progression shifts whole cohorts by a day, and movement moves one agent
+    between compartments, so the cost of a timestep depends on the number of
+    cells rather than the number of agents. The statistics have the same
+    meaning as in the agent engines.
+    """
+    def __init__(self, args):
+        """__init__ - CompartmentNetwork Initialization function
+        Inputs:
+            - args: argument parser dictionary
+        Outputs:
+            - None; returns CompartmentNetwork object
+        """
+        # one agent moves per step between compartments; a sweep would need a multinomial split of every cell
+        if getattr(args, "movement", "single") != "single":
+            raise ValueError("the compartment engine only supports --movement=single")
+        if getattr(args, "workdir", None) is not None:
+            raise ValueError("--workdir is only supported by the vector engine")
+        if getattr(args, "threads", 1) > 1:
+            raise ValueError("--threads is only supported by the vector engine")
+        # policies are applied as masks over the agent and cell arrays
+        if getattr(args, "interventions", None) is not None:
+            raise ValueError("--interventions is only supported by the vector engine")
+        # network-based parameters (taken from arguments)
+        self.__network_params = { "N": args.N, # population density of agents
+                                  "L": args.L, # lattice L/W dimension
+                                  "num_nodes": args.L * args.L, # number of total nodes
+                                  "t": args.t, # total time steps to portray
+                                  "influx": args.influx, # probability of new agent being added per timestep
+                                  "n_0": args.n_0, # initial infected population size
+                                  "movement": "single", # single-agent movement
+                                  "topology": getattr(args, "topology", "lattice") } # contact graph provider
+        # agent-based parameters (taken from arguments)
+        self.__agent_params = { "asympt_length": args.asym_l, # length of time for asympt phase
+                                "sympt_length": args.symp_l, # length of time for sympt phase
+                                "lambda": args.lam, # disease transmission probability
+                                "beta": np.array([0, 1, 2, 3, 4]) } # age-dependent mobility factor (indexed by age category)
+        # independent random streams for each phase, derived from --seed
+        self.__streams = RandomStreams(getattr(args, "seed", None))
+        # contact graph between cells, compiled to CSR adjacency
+        self.__topology = make_topology(args, self.__streams.get("topology"))
+        # initialize start time to 0
+        self.__time_elapsed = 0
+        # counter for number of agents
+        self.__num_agents = 0
+        # statistical counters
+        self.__stats = {i: {"total": 0, "alive": 0, "dead": 0, "infected": 0} for i in range(1, 5)}
+        self.__plot_points = {i: [] for i in range(0, 5)}
+        # generate the compartments, then populate them or restore a checkpoint into them
+        start = time.perf_counter()
+        self.__generate_lattice()
+        lattice_time = time.perf_counter() - start
+        if getattr(args, "resume", None):
+            self.load_checkpoint(args.resume)
+        else:
+            self.__populate_lattice()
+        # seconds spent building the run, reported with the phase times
+        self.__setup_times = { "topology": self.__topology.get_build_time(),
+                               "lattice": lattice_time,
+                               "resume" if getattr(args, "resume", None) else "populate": time.perf_counter() - start - lattice_time }
+        # initialize the display of the network (None when running headless)
+        self.__display = None if getattr(args, "headless", False) else Display(getattr(args, "render_every", 1))
+        # stream statistics to disk when an output directory is given
+        self.__sink = make_sink(args)
+        # record per-cell frames for offline replay when a recording directory is given
+        self.__recorder = make_recorder(args, self.__time_elapsed if getattr(args, "resume", None) else None)
+        if self.__recorder is not None and not getattr(args, "resume", None):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+        # per-phase instrumentation of the timestep loop (None when --profile is off)
+        self.__profiler = make_profiler(args)
+        # checkpoint settings: save every K steps (0 = never) to path
+        self.__checkpoint = { "every": getattr(args, "checkpoint_every", 0),
+                              "path": getattr(args, "checkpoint", "checkpoint.npz") }
+        # early stopping and fast-forward (None when every criterion is off)
+        self.__stopping = make_stop_criteria(args)
+        # criterion that ended the run early (None while it runs to t)
+        self.__stop_reason = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __generate_lattice(self):
+        """__generate_lattice - allocates the per-cell compartment counts
+        Infected agents are kept in a ring of disease-day cohorts: the cohort
+        with days_infected = d is slot (head + d) % D, D = asym_l + symp_l + 1,
+        so advancing every infected agent by a day only moves the head. As in
+        the agent engines an agent is symptomatic for at least one day, so
+        symp_l = 0 counts as 1.
+        Inputs:
+            - None; uses self.__network_params and self.__agent_params to get required values
+        Outputs:
+            - None; saves the compartments in self.__healthy, self.__infected and self.__dead
+        """
+        num_nodes = self.__network_params["num_nodes"]
+        num_days = self.__agent_params["asympt_length"] + max(self.__agent_params["sympt_length"], 1) + 1
+        # healthy and dead agents per age category (row age - 1) and cell
+        self.__healthy = np.zeros((4, num_nodes), dtype=np.int32)
+        self.__dead = np.zeros((4, num_nodes), dtype=np.int32)
+        # infected agents per age category, disease-day slot and cell
+        self.__infected = np.zeros((4, num_days, num_nodes), dtype=np.int32)
+        self.__head = 0
+        # infectious agents per cell (every infected compartment), kept up to date incrementally
+        self.__infectious = np.zeros(num_nodes, dtype=np.int64)
+        # number of agents (alive or dead) currently occupying each cell
+        self.__cell_counts = np.zeros(num_nodes, dtype=np.int64)
+
+    def __day_slots(self, first, last):
+        # ring slots of the cohorts with days_infected in [first, last]
+        return (self.__head + np.arange(first, last + 1)) % self.__infected.shape[1]
+
+    def __populate_lattice(self):
+        """__populate_lattice - fills lattice with N agents randomly
+        Draws ages, locations and initial cases from the placement stream in the
+        same order as the vector engine, so a seed gives both engines the same
+        initial population. Ages and locations are only held until they are
+        counted into the compartments.
+        Inputs:
+            - None; uses self.__network_params to get required values
+        Outputs:
+            - None; saves agents in the compartment counts
+        """
+        num_nodes = self.__network_params["num_nodes"]
+        # population of density * num_nodes
+        count = int(num_nodes * self.__network_params["N"])
+        placement = self.__streams.get("placement")
+        # uniform integer age in [0, 82], converted to the same categories as Agent
+        ages = np.empty(count, dtype=np.uint8)
+        for first, last in block_ranges(count, PLACEMENT_BLOCK):
+            ages[first:last] = categorize_ages(placement.integers(83, size=last - first))
+        # random location anywhere on the lattice
+        locations = np.empty(count, dtype=np.int32)
+        for first, last in block_ranges(count, PLACEMENT_BLOCK):
+            locations[first:last] = placement.integers(num_nodes, size=last - first)
+        # choose initial infected cases without replacement; they start on day 0
+        seeds = placement.sample(count, min(self.__network_params["n_0"], count))
+        seeded = np.zeros(count, dtype=bool)
+        seeded[seeds] = True
+        healthy = self.__healthy.reshape(-1)
+        day_0 = self.__infected[:, self.__head, :]
+        for first, last in block_ranges(count, PLACEMENT_BLOCK):
+            flat = (ages[first:last].astype(np.int64) - 1) * num_nodes + locations[first:last]
+            healthy += np.bincount(flat[~seeded[first:last]], minlength=4 * num_nodes).astype(np.int32)
+            self.__cell_counts += np.bincount(locations[first:last], minlength=num_nodes)
+            # few seeds, and day_0 is a strided view, so add them one by one
+            for cell in flat[seeded[first:last]].tolist():
+                day_0[cell // num_nodes, cell % num_nodes] += 1
+        self.__infectious += np.bincount(locations[seeds], minlength=num_nodes)
+        # update statistical counters
+        self.__num_agents = count
+        totals = np.bincount(ages, minlength=5)
+        infected = np.bincount(ages[seeds], minlength=5)
+        for key in self.__stats:
+            self.__stats[key]["total"] += int(totals[key])
+            self.__stats[key]["alive"] += int(totals[key])
+            self.__stats[key]["infected"] += int(infected[key])
+
+    def __check_for_infection(self):
+        """__check_for_infection - exposes the healthy agents of every cell to its infectious neighborhood
+        Infection pressure k on a cell is the number of infectious agents on the
+        cell and its neighbors, as in the agent engines. The healthy agents of age
+        category a in the cell each escape independently, so the number infected
+        is Binomial(healthy, 1 - (1 - λ * susceptibility_a)^k). Updates are
+        synchronous: agents infected this step only become infectious next step.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents newly infected
+        """
+        L = self.__network_params["L"]
+        counts = self.__infectious
+        if self.__topology.get_name() == "lattice":
+            # 3x3 stencil over the counts, zero-padded so border cells see no wrap-around
+            pressure = stencil_sum(np.pad(counts.reshape(L, L), 1)).ravel()
+        else:
+            pressure = counts + neighbor_sum(self.__topology.get_indptr(), self.__topology.get_indices(), counts)
+        # one draw per (age category, cell) with healthy agents under pressure
+        cells = np.flatnonzero(pressure)
+        healthy = self.__healthy[:, cells]
+        age_row, column = np.nonzero(healthy)
+        if len(age_row) == 0:
+            return 0
+        k = pressure[cells[column]]
+        probability = 1 - (1 - self.__agent_params["lambda"] * SUSCEPTIBILITY[age_row + 1]) ** k
+        newly_infected = self.__streams.get("infection").binomial(healthy[age_row, column], probability)
+        hit = newly_infected > 0
+        age_row, cells, newly_infected = age_row[hit], cells[column[hit]], newly_infected[hit]
+        # move them to the day-0 cohort (each (age, cell) pair appears once)
+        self.__healthy[age_row, cells] -= newly_infected.astype(np.int32)
+        self.__infected[age_row, self.__head, cells] += newly_infected.astype(np.int32)
+        self.__infectious += np.bincount(cells, weights=newly_infected, minlength=len(counts)).astype(np.int64)
+        # update statistics
+        infected = np.bincount(age_row + 1, weights=newly_infected, minlength=5)
+        for key in self.__stats:
+            self.__stats[key]["infected"] += int(infected[key])
+        return int(newly_infected.sum())
+
+    def __check_for_death(self):
+        """__check_for_death - advances the disease clock of every infected agent
+        Same transition times as the agent engines: every cohort gains a day,
+        the cohort passing asym_l days turns symptomatic and the cohort passing
+        asym_l + symp_l days dies. The dying cohort's slot becomes the new day-0
+        slot.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of transitions applied
+        """
+        asympt_length = self.__agent_params["asympt_length"]
+        last = self.__day_slots(self.__infected.shape[1] - 1, self.__infected.shape[1] - 1)[0]
+        turning = int(self.__infected[:, self.__day_slots(asympt_length, asympt_length)[0], :].sum())
+        dying = self.__infected[:, last, :]
+        dead = dying.sum(axis=1)
+        # move the dying cohort to the dead compartments, then shift the ring by a day
+        self.__dead += dying
+        self.__infectious -= dying.sum(axis=0)
+        dying[:] = 0
+        self.__head = last
+        # decrement counter for death and update statistics
+        self.__num_agents -= int(dead.sum())
+        for key in self.__stats:
+            self.__stats[key]["alive"] -= int(dead[key - 1])
+            self.__stats[key]["dead"] += int(dead[key - 1])
+        return turning + int(dead.sum())
+
+    def __compartments_at(self, cell):
+        """__compartments_at - agent counts of every compartment of a cell
+        Inputs:
+            - cell: node index
+        Outputs:
+            - 4 x (D + 2) array: per age category, healthy, then infected by disease day, then dead
+        """
+        infected = self.__infected[:, self.__day_slots(0, self.__infected.shape[1] - 1), cell]
+        return np.concatenate([self.__healthy[:, cell, None], infected, self.__dead[:, cell, None]], axis=1)
+
+    def __check_for_movement(self):
+        """__check_for_movement - checks which agent should move and tries to move agent
+        Same draws and acceptance as the vector engine: site 1 is a random
+        occupied cell, the mover a random occupant of it (picked by compartment
+        size) and site 2 a random neighbor free of symptomatic agents.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents moved (0 or 1)
+        """
+        # randomly select site 1 among the occupied sites
+        occupied = np.flatnonzero(self.__cell_counts)
+        if len(occupied) == 0:
+            return 0
+        movement = self.__streams.get("movement")
+        s_1_index = int(occupied[movement.integers(len(occupied))])
+        # identify site 1's neighbors and pick site 2 (an isolated site cannot move)
+        neighbors = self.__topology.neighbors(s_1_index).tolist()
+        if len(neighbors) == 0:
+            return 0
+        # re-roll site 2 while it holds a symptomatic agent, up to the same limit as Network
+        symptomatic = self.__day_slots(self.__agent_params["asympt_length"] + 1, self.__infected.shape[1] - 1)
+        repeat_counter = 0
+        s_2_index = neighbors[movement.integers(len(neighbors))]
+        while self.__infected[:, symptomatic, s_2_index].any():
+            if repeat_counter > 30:
+                return 0
+            s_2_index = neighbors[movement.integers(len(neighbors))]
+            repeat_counter += 1
+        # randomly select agent in s_1 to attempt to move: its age row and compartment column
+        compartments = self.__compartments_at(s_1_index)
+        rank = movement.integers(int(compartments.sum()))
+        age_row, column = divmod(int(np.searchsorted(np.cumsum(compartments), rank, side="right")), compartments.shape[1])
+        day = column - 1
+        # symptomatic agents never move
+        if self.__agent_params["asympt_length"] < day < self.__infected.shape[1]:
+            return 0
+        # same-age occupants at both sites
+        n_age_1 = compartments[age_row].sum()
+        n_age_2 = self.__compartments_at(s_2_index)[age_row].sum()
+        # same acceptance probability as Agent.move_agent
+        prob_1_to_2 = move_probability(self.__agent_params["beta"][age_row + 1], n_age_1, n_age_2)
+        # make movement if probability is sufficient
+        if movement.next() <= prob_1_to_2:
+            if column == 0:
+                counts, index = self.__healthy, (age_row,)
+            elif day == self.__infected.shape[1]:
+                counts, index = self.__dead, (age_row,)
+            else:
+                counts, index = self.__infected, (age_row, self.__day_slots(day, day)[0])
+                self.__infectious[s_1_index] -= 1
+                self.__infectious[s_2_index] += 1
+            counts[index + (s_1_index,)] -= 1
+            counts[index + (s_2_index,)] += 1
+            self.__cell_counts[s_1_index] -= 1
+            self.__cell_counts[s_2_index] += 1
+            return 1
+        return 0
+
+    def __check_for_influx(self):
+        """__check_for_influx - checks to see if new members of population should be added (randomly)
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents added (0 or 1)
+        """
+        # if probability is sufficient, add a new healthy agent to the lattice randomly
+        if self.__streams.get("influx").next() < self.__network_params["influx"]:
+            return self.__add_influx_agent()
+        return 0
+
+    def __add_influx_agent(self):
+        # adds a new healthy agent at a random cell (drawn from the influx stream); returns the number added
+        influx = self.__streams.get("influx")
+        age = int(AGE_CATEGORIES[influx.integers(83)])
+        location = influx.integers(self.__network_params["num_nodes"])
+        self.__healthy[age - 1, location] += 1
+        self.__cell_counts[location] += 1
+        # increment num_agents counter and update statistics
+        self.__num_agents += 1
+        self.__stats[age]["total"] += 1
+        self.__stats[age]["alive"] += 1
+        return 1
+
+    def __fast_forward(self):
+        """__fast_forward - jumps to the next influx arrival (with no infectious agent left nothing else can change)
+        The wait is one geometric draw on the influx stream; the timesteps
+        before the arrival hold the counters in the plot points and output rows.
+        Inputs:
+            - None
+        Outputs:
+            - boolean: True when an agent arrived at the new timestep, False when t came first
+        """
+        t = self.__network_params["t"]
+        arrival = self.__time_elapsed + self.__stopping.steps_to_arrival(self.__streams.get("influx"))
+        quiet_end = min(arrival - 1, t)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, quiet_end)
+        self.__time_elapsed = quiet_end
+        if quiet_end == t:
+            return False
+        self.__run_phase("influx", self.__add_influx_agent)
+        self.__time_elapsed += 1
+        return True
+
+    def __stop(self, reason):
+        # ends the run early: the counters are held at their current values up to t
+        self.__stop_reason = (reason, self.__time_elapsed)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, self.__network_params["t"])
+        self.__time_elapsed = self.__network_params["t"]
+
+    def __run_phase(self, name, phase):
+        # runs one phase of a timestep, reporting its wall time and agents updated when profiling
+        if self.__profiler is None:
+            phase()
+            return
+        start = time.perf_counter()
+        touched = phase()
+        self.__profiler.record(name, time.perf_counter() - start, touched)
+
+    def __timestep(self):
+        """__timestep - handling of a single timestep
+        Same phase order as Network: infection, progression/death, movement, influx.
+        Inputs:
+            - None
+        Outputs:
+            - None; compartments updated with new configuration
+        """
+        self.__run_phase("infection", self.__check_for_infection)
+        self.__run_phase("death", self.__check_for_death)
+        self.__run_phase("movement", self.__check_for_movement)
+        self.__run_phase("influx", self.__check_for_influx)
+
+        # increment timestep counter
+        self.__time_elapsed += 1
+
+    def __update_display(self, color_map=CELL_COLORS):
+        """__update_display - draws the lattice as an image of cell colors
+        Inputs:
+            - (Optional) color_map: an association dictionary for status code->RGB
+        Outputs:
+            - None; displays as a window
+        """
+        self.__display.draw_grid(f"{self.__time_elapsed} / {self.__network_params['t']} - Number of Agents: {self.__num_agents}",
+                                 cell_colors(self.get_cell_state(), color_map))
+
+    def __generate_statistical_display(self):
+        """__generate_statistical_display - generates a graph stats over time
+        Inputs:
+            - None
+        Outputs:
+            - None; displays as a window
+        """
+        self.__display.draw_statistics(f"λ={self.__agent_params['lambda']}; Density={self.__network_params['N']}; InfluxRate={self.__network_params['influx']}",
+                                       self.__network_params["t"], self.__plot_points)
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_elapsed_time(self):
+        # returns how many time steps have passed
+        return self.__time_elapsed
+    def get_num_agents(self):
+        # returns number of living agents
+        return self.__num_agents
+    def get_stats(self):
+        # returns the per-age statistical counters
+        return self.__stats
+    def get_plot_points(self):
+        # returns the per-age series of active infections (key 0 is the total)
+        return self.__plot_points
+    def get_cell_state(self):
+        # returns 4 x L x L per-cell counts of each status code
+        L = self.__network_params["L"]
+        asympt_length = self.__agent_params["asympt_length"]
+        state = np.empty((4, L * L), dtype=np.int32)
+        state[HEALTHY] = self.__healthy.sum(axis=0)
+        state[ASYMPTOMATIC] = self.__infected[:, self.__day_slots(0, asympt_length), :].sum(axis=(0, 1))
+        state[SYMPTOMATIC] = self.__infected[:, self.__day_slots(asympt_length + 1, self.__infected.shape[1] - 1), :].sum(axis=(0, 1))
+        state[DEAD] = self.__dead.sum(axis=0)
+        return state.reshape(4, L, L)
+    def get_age_counts(self):
+        # returns 4 x L x L per-cell counts of each age category (index age - 1)
+        L = self.__network_params["L"]
+        return (self.__healthy + self.__infected.sum(axis=1) + self.__dead).reshape(4, L, L)
+    def get_phase_times(self):
+        # returns setup seconds and accumulated seconds per timestep phase (empty phases until enabled)
+        return { "setup": dict(self.__setup_times),
+                 "phases": {} if self.__profiler is None else self.__profiler.get_phase_seconds() }
+    def get_stop_reason(self):
+        # returns (criterion, timestep) when a stopping criterion ended the run early, else None
+        return self.__stop_reason
+    def get_profiler(self):
+        # returns the Profiler of the run (None when profiling is off)
+        return self.__profiler
+
+    @staticmethod
+    def bytes_per_cell(asym_l, symp_l):
+        # bytes a single cell occupies across all compartments and per-cell counters
+        return 4 * (asym_l + max(symp_l, 1) + 3) * np.dtype(np.int32).itemsize + 2 * np.dtype(np.int64).itemsize
+    @staticmethod
+    def estimate_bytes(L, asym_l, symp_l):
+        # bytes needed for the compartments of an L x L lattice
+        return L * L * CompartmentNetwork.bytes_per_cell(asym_l, symp_l)
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def enable_phase_timing(self):
+        """enable_phase_timing - starts timing each phase of every following timestep
+        Wall time is accumulated per phase (infection, death, movement, influx)
+        and read back with get_phase_times; the counters restart at zero. Uses
+        the --profile profiler when there is one, otherwise a silent one.
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__profiler is None:
+            self.__profiler = Profiler()
+        self.__profiler.reset()
+
+    def step(self):
+        """step - runs a single timestep and records its statistic plot-points
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        # stop early (holding the counters to t) once a stopping criterion is met
+        if self.__stopping is not None:
+            reason = self.__stopping.check(self.__stats)
+            if reason is not None:
+                self.__stop(reason)
+                return
+        # with no infectious agent left, fast-forward jumps to the next influx arrival (or to t)
+        if self.__stopping is not None and self.__stopping.quiescent(self.__stats):
+            if not self.__fast_forward():
+                return
+        else:
+            self.__timestep()
+        # update statistic plot-points
+        for key in self.__stats:
+            self.__plot_points[key].append(self.__stats[key]["infected"] - self.__stats[key]["dead"])
+        self.__plot_points[0].append(sum([self.__stats[key]["infected"] - self.__stats[key]["dead"] for key in self.__stats]))
+        if self.__profiler is not None:
+            self.__profiler.end_step(self.__time_elapsed, self.__num_agents, self.__plot_points[0][-1])
+        # stream counters (and periodic snapshots) to the output sink
+        if self.__sink is not None:
+            self.__sink.write_step(self.__time_elapsed, self.__stats)
+            if self.__sink.wants_snapshot(self.__time_elapsed):
+                self.__sink.write_snapshot(self.__time_elapsed, self.get_cell_state())
+        # append a delta frame to the recording
+        if self.__recorder is not None and self.__recorder.wants_frame(self.__time_elapsed):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+
+    def save_checkpoint(self, path):
+        """save_checkpoint - writes the complete simulation state to a file
+        Stores the compartments (infected cohorts in disease-day order), all
+        counters and the exact state of every random stream, so a resumed run
+        is bit-identical to an uninterrupted one.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays = { "healthy": self.__healthy,
+                   "infected": self.__infected[:, self.__day_slots(0, self.__infected.shape[1] - 1), :],
+                   "dead": self.__dead,
+                   "plot_points": plot_points_to_array(self.__plot_points),
+                   **topology_to_arrays(self.__topology) }
+        meta = { "engine": "compartment",
+                 "network_params": {key: value for key, value in self.__network_params.items() if key != "t"},
+                 "agent_params": {key: value for key, value in self.__agent_params.items() if key != "beta"},
+                 "time_elapsed": self.__time_elapsed,
+                 "num_agents": self.__num_agents,
+                 "stats": self.__stats,
+                 "random_state": self.__streams.get_state() }
+        # make sure every streamed row up to this step is on disk too
+        if self.__sink is not None:
+            self.__sink.flush()
+        if self.__recorder is not None:
+            self.__recorder.flush()
+        write_checkpoint(path, arrays, meta)
+
+    def load_checkpoint(self, path):
+        """load_checkpoint - restores the simulation state written by save_checkpoint
+        Every parameter except t is taken from the checkpoint, so a run can be
+        resumed with a larger t to extend it.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays, meta = read_checkpoint(path, "compartment")
+        for key in ("L", "topology"):
+            if meta["network_params"][key] != self.__network_params[key]:
+                raise ValueError(f"{path}: checkpoint has {key}={meta['network_params'][key]}, run has {key}={self.__network_params[key]}")
+        self.__network_params.update(meta["network_params"])
+        self.__topology = topology_from_arrays(arrays, self.__topology)
+        self.__agent_params.update(meta["agent_params"])
+        self.__healthy = arrays["healthy"].copy()
+        self.__infected = arrays["infected"].copy()
+        self.__dead = arrays["dead"].copy()
+        self.__head = 0
+        self.__infectious = self.__infected.sum(axis=(0, 1), dtype=np.int64)
+        self.__cell_counts = (self.__healthy.sum(axis=0) + self.__dead.sum(axis=0)).astype(np.int64) + self.__infectious
+        self.__plot_points = plot_points_from_array(arrays["plot_points"])
+        self.__time_elapsed = meta["time_elapsed"]
+        self.__num_agents = meta["num_agents"]
+        self.__stats = stats_from_json(meta["stats"])
+        self.__streams.set_state(meta["random_state"])
+
+    def close(self):
+        """close - releases resources held by the run (flushes the output sink and recording, stops the profiler)
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__sink is not None:
+            self.__sink.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+        if self.__profiler is not None:
+            self.__profiler.close()
+
+    def run_simulation(self):
+        """run_simulation - runs t timesteps of simulation
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        while self.__time_elapsed < self.__network_params["t"]:
+            previous = self.__time_elapsed
+            self.step()
+            # draw only every render_every steps; never when headless
+            if self.__display is not None and self.__display.should_render(self.__time_elapsed, self.__network_params["t"]):
+                self.__run_phase("render", self.__update_display)
+            # periodically save a checkpoint to resume from (a fast-forward may jump past the multiple itself)
+            if self.__stop_reason is None and self.__checkpoint["every"] > 0 and self.__time_elapsed // self.__checkpoint["every"] > previous // self.__checkpoint["every"]:
+                self.save_checkpoint(self.__checkpoint["path"])
+        self.close()
+        # headless runs report the final counters instead of opening windows
+        if self.__display is None:
+            print(f"t={self.__time_elapsed} agents={self.__num_agents} stats={self.__stats}")
+            if self.__stop_reason is not None:
+                print(f"stopped early at t={self.__stop_reason[1]} ({self.__stop_reason[0]}); counters held until t={self.__time_elapsed}")
+            return
+        self.__display.show()
+        # display statistical graphs
+        self.__generate_statistical_display()
@@ -0,0 +1,139 @@
+import numpy as np
+from Agent import HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD
+
+# RGB color of each status code on the lattice image
+CELL_COLORS = { HEALTHY: (0.0, 0.5, 0.0), ASYMPTOMATIC: (1.0, 0.65, 0.0), SYMPTOMATIC: (1.0, 0.0, 0.0), DEAD: (0.5, 0.5, 0.5) }
+
+def cell_colors(cell_state, color_map=CELL_COLORS):
+    """cell_colors - color of every cell from its per-status counts
+    Same priority as Network: symptomatic, then asymptomatic, then healthy;
+    cells that are empty or hold only dead agents use the dead color.
+    Inputs:
+        - cell_state: 4 x L x L per-cell counts of each status code
+        - (Optional) color_map: association of status code -> RGB tuple
+    Outputs:
+        - colorations: L x L x 3 array of RGB colors
+    """
+    # pick the highest-priority status present on each cell
+    dominant = np.select([cell_state[SYMPTOMATIC] > 0, cell_state[ASYMPTOMATIC] > 0, cell_state[HEALTHY] > 0],
+                         [SYMPTOMATIC, ASYMPTOMATIC, HEALTHY], default=DEAD)
+    palette = np.array([color_map[code] for code in (HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD)])
+    return palette[dominant]
+
+class Display:
+    """Display class
+    Handles all matplotlib rendering for a simulation. pyplot (and networkx,
+    for the graph drawing) is only imported when something is actually drawn,
+    so headless runs never load it.
+    """
+    def __init__(self, render_every=1, figsize=(15, 8)):
+        """__init__ - Display Initialization function
+        Inputs:
+            - (Optional) render_every: draw the lattice every K timesteps (0 = never)
+            - (Optional) figsize: size of the matplotlib figure
+        Outputs:
+            - None; returns Display object
+        """
+        self.__render_every = render_every
+        self.__figsize = figsize
+        # pyplot module, imported on first draw
+        self.__plt = None
+        # node positions, computed once since the lattice never changes shape
+        self.__layout = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __pyplot(self):
+        """__pyplot - imports pyplot and opens the figure on first use
+        Inputs:
+            - None
+        Outputs:
+            - plt: the matplotlib.pyplot module
+        """
+        if self.__plt is None:
+            import matplotlib.pyplot as plt
+            self.__plt = plt
+            self.__plt.figure(figsize=self.__figsize)
+            self.__plt.plot()
+        return self.__plt
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def should_render(self, time_elapsed, t):
+        """should_render - checks if the lattice should be drawn this timestep
+        Inputs:
+            - time_elapsed: number of timesteps completed
+            - t: total number of timesteps
+        Outputs:
+            - boolean: True every render_every steps and on the final step
+        """
+        if self.__render_every <= 0:
+            return False
+        return time_elapsed % self.__render_every == 0 or time_elapsed == t
+
+    def draw_graph(self, graph, title, colorations, labels):
+        """draw_graph - draws the lattice graph with per-node colors and labels
+        Inputs:
+            - graph: networkx graph of the lattice
+            - title: figure title
+            - colorations: list of colors for the nodes
+            - labels: dictionary of labels for the nodes
+        Outputs:
+            - None; displays as a window
+        """
+        import networkx as nx
+        plt = self.__pyplot()
+        # the spectral embedding is expensive and the lattice is fixed, so compute it once
+        if self.__layout is None:
+            self.__layout = nx.spectral_layout(graph)
+        plt.clf()
+        plt.title(title)
+        nx.draw(graph, pos=self.__layout, node_color=colorations, labels=labels)
+        # update the display for animation-purposes
+        plt.pause(0.05)
+
+    def draw_grid(self, title, colorations):
+        """draw_grid - draws a lattice given as an L x L grid of colors
+        Inputs:
+            - title: figure title
+            - colorations: L x L x 3 array of RGB colors
+        Outputs:
+            - None; displays as a window
+        """
+        plt = self.__pyplot()
+        plt.clf()
+        plt.title(title)
+        plt.imshow(colorations, interpolation="nearest")
+        # update the display for animation-purposes
+        plt.pause(0.05)
+
+    def draw_statistics(self, title, t, plot_points):
+        """draw_statistics - generates a graph of stats over time
+        Inputs:
+            - title: figure title
+            - t: number of timesteps in each series
+            - plot_points: per-age series of active infections (key 0 is the total)
+        Outputs:
+            - None; displays as a window
+        """
+        plt = self.__pyplot()
+        plt.clf()
+        plt.title(title)
+        plt.plot([i for i in range(0, t)], plot_points[0], label="total population")
+        plt.plot([i for i in range(0, t)], plot_points[1], label="adults")
+        plt.plot([i for i in range(0, t)], plot_points[2], label="elderly")
+        plt.plot([i for i in range(0, t)], plot_points[3], label="youths")
+        plt.plot([i for i in range(0, t)], plot_points[4], label="babies")
+        plt.xlabel("Timesteps")
+        plt.ylabel("Number of Agents")
+        plt.legend()
+        plt.show()
+
+    def show(self):
+        # blocks on the current figure (if one was ever opened)
+        if self.__plt is not None:
+            self.__plt.show()
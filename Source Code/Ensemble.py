@@ -0,0 +1,139 @@
+import argparse
+import itertools
+import json
+import os
+import multiprocessing
+import numpy as np
+from main import default_args, load_engine
+
+# engines a sweep can run (imported by each worker on first use)
+ENGINES = ["graph", "vector", "compartment"]
+
+def load_spec(path):
+    """load_spec - reads a sweep specification
+    Example spec (every key except "sweep" is optional):
+        { "engine": "vector",
+          "base": { "L": 100, "t": 200, "n_0": 5 },
+          "sweep": { "lam": [0.1, 0.2], "N": [0.5, 1.0] },
+          "replicates": 20,
+          "seed": 12345,
+          "quantiles": [0.05, 0.5, 0.95] }
+    Inputs:
+        - path: path to a JSON file
+    Outputs:
+        - spec: dictionary with every key filled in
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    spec.setdefault("engine", "graph")
+    spec.setdefault("base", {})
+    spec.setdefault("replicates", 1)
+    spec.setdefault("seed", 0)
+    spec.setdefault("quantiles", [0.05, 0.5, 0.95])
+    if spec["engine"] not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    return spec
+
+def expand_points(spec):
+    """expand_points - expands the sweep grid into a list of parameter points
+    Inputs:
+        - spec: sweep specification
+    Outputs:
+        - points: list of dictionaries of main.py arguments, one per grid point
+    """
+    names = sorted(spec["sweep"])
+    points = []
+    for values in itertools.product(*[spec["sweep"][name] for name in names]):
+        point = dict(spec["base"])
+        point.update(zip(names, values))
+        points.append(point)
+    return points
+
+def run_seed(root_seed, point_index, replicate):
+    """run_seed - derives the seed of a single run
+    Depends only on the root seed and the run's position in the sweep, so a
+    run's result does not depend on the worker it lands on or on scheduling.
+    Inputs:
+        - root_seed: seed of the whole sweep
+        - point_index: index of the parameter point
+        - replicate: index of the replicate at that point
+    Outputs:
+        - integer seed
+    """
+    return int(np.random.SeedSequence([root_seed, point_index, replicate]).generate_state(1)[0])
+
+def run_one(task):
+    """run_one - runs a single headless simulation (executed inside a worker)
+    Inputs:
+        - task: tuple (engine, point_index, replicate, seed, params)
+    Outputs:
+        - tuple (point_index, replicate, series) with series a 5 x t array
+          of active infections (row 0 is the total, rows 1-4 the age categories)
+    """
+    engine, point_index, replicate, seed, params = task
+    args = default_args(**params, engine=engine, headless=True, seed=seed)
+    network = load_engine(engine)(args)
+    # a stopping criterion may end the run early (its series are still padded to t)
+    while network.get_elapsed_time() < args.t:
+        network.step()
+    network.close()
+    plot_points = network.get_plot_points()
+    return point_index, replicate, np.array([plot_points[key] for key in range(0, 5)], dtype=np.int32)
+
+def run_ensemble(spec, out_dir, workers=None):
+    """run_ensemble - fans the sweep out over a process pool and aggregates results
+    Each run's series is written to out_dir/runs as soon as it finishes. Once
+    every replicate of a point is in, its mean and quantile curves are written
+    to out_dir/point_XXXX.npz and the raw series are released from memory.
+    Inputs:
+        - spec: sweep specification
+        - out_dir: output directory
+        - (Optional) workers: number of worker processes (default: all cores)
+    Outputs:
+        - index: list of dictionaries describing every parameter point
+    """
+    points = expand_points(spec)
+    replicates = spec["replicates"]
+    os.makedirs(os.path.join(out_dir, "runs"), exist_ok=True)
+    tasks = [(spec["engine"], p, r, run_seed(spec["seed"], p, r), points[p])
+             for p in range(len(points)) for r in range(replicates)]
+    # finished series per point, kept only until the point is complete
+    pending = {p: {} for p in range(len(points))}
+    index = []
+    with multiprocessing.Pool(workers) as pool:
+        for point_index, replicate, series in pool.imap_unordered(run_one, tasks, chunksize=1):
+            # stream the run to disk
+            np.save(os.path.join(out_dir, "runs", f"p{point_index:04d}_r{replicate:04d}.npy"), series)
+            pending[point_index][replicate] = series
+            if len(pending[point_index]) < replicates:
+                continue
+            # point complete: aggregate in replicate order so results are deterministic
+            completed = pending.pop(point_index)
+            stack = np.stack([completed[r] for r in range(replicates)])
+            np.savez(os.path.join(out_dir, f"point_{point_index:04d}.npz"),
+                     mean=stack.mean(axis=0),
+                     quantiles=np.quantile(stack, spec["quantiles"], axis=0),
+                     quantile_levels=np.array(spec["quantiles"]))
+            index.append({"point": point_index, "params": points[point_index], "replicates": replicates})
+            print(f"point {point_index + 1}/{len(points)} done: {points[point_index]}")
+    # write an index of every point and its parameters
+    index.sort(key=lambda entry: entry["point"])
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump({"spec": spec, "points": index}, f, indent=2)
+    return index
+
+def main():
+    # command-line options for the ensemble runner
+    parser = argparse.ArgumentParser()
+    # spec - JSON sweep specification (see load_spec)
+    parser.add_argument("spec", type=str)
+    # out - directory for the per-run series and aggregated curves
+    parser.add_argument("--out", type=str, nargs='?', default="ensemble_output")
+    # workers - number of worker processes (default: all cores)
+    parser.add_argument("--workers", type=int, nargs='?', default=None)
+    args = parser.parse_args()
+
+    run_ensemble(load_spec(args.spec), args.out, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import json
+import numpy as np
+
+# policy type -> keys it accepts besides "type", "start" and "stop"
+POLICY_KEYS = { "distancing": ["ages", "reduction"], # contacts of the given ages scaled by 1 - reduction
+                "vaccination": ["ages", "rate"], # healthy agents of the given ages vaccinated with probability rate per step
+                "lockdown": ["region", "threshold"] } # no movement into or out of a region / cells with threshold+ infectious agents
+
+class Interventions:
+    """Interventions class
+    Policy layer of the vector engine. Each policy is active from its start
+    timestep until its stop timestep (exclusive; None = until the end):
+        - distancing: scales λ for the agents of some ages by 1 - reduction
+        - vaccination: each step, vaccinates every healthy, unvaccinated agent
+          of some ages with probability rate (susceptibility becomes 0)
+        - lockdown: blocks movement into and out of a rectangle of cells
+          (region = [first row, last row, first column, last column], exclusive
+          ends), or of every cell holding threshold or more infectious agents
+    Whatever the number of policies, the active ones are folded into one
+    per-age λ factor, one per-age vaccination probability, one region mask and
+    one threshold, refolded only when the set of active policies changes, so
+    the engine applies each kind with a single bulk mask per step.
+    """
+    def __init__(self, policies, L):
+        """__init__ - Interventions Initialization function
+        Inputs:
+            - policies: list of policy dictionaries (see POLICY_KEYS)
+            - L: lattice L/W dimension
+        Outputs:
+            - None; returns Interventions object
+        """
+        self.__policies = [self.__validate(policy) for policy in policies]
+        self.__L = L
+        # active policy indices the folded values below were computed for (None = not yet folded)
+        self.__active = None
+        self.__contact = np.ones(5)
+        self.__vaccination = np.zeros(5)
+        self.__region = None
+        self.__threshold = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __validate(self, policy):
+        """__validate - checks a policy and fills in its defaults
+        Inputs:
+            - policy: policy dictionary
+        Outputs:
+            - policy: a copy with start, stop and ages filled in
+        """
+        kind = policy.get("type")
+        if kind not in POLICY_KEYS:
+            raise ValueError(f"unknown intervention type {kind!r} (expected one of {', '.join(POLICY_KEYS)})")
+        unknown = set(policy) - {"type", "start", "stop"} - set(POLICY_KEYS[kind])
+        if unknown:
+            raise ValueError(f"{kind} intervention does not take {', '.join(sorted(unknown))}")
+        policy = dict(policy)
+        policy.setdefault("start", 0)
+        policy.setdefault("stop", None)
+        policy["ages"] = [int(age) for age in policy.get("ages", [1, 2, 3, 4])]
+        if not set(policy["ages"]) <= {1, 2, 3, 4}:
+            raise ValueError(f"{kind} intervention: ages must be age categories 1-4")
+        if kind == "distancing" and not 0 <= policy.get("reduction", -1) <= 1:
+            raise ValueError("distancing intervention needs a reduction in [0, 1]")
+        if kind == "vaccination" and not 0 <= policy.get("rate", -1) <= 1:
+            raise ValueError("vaccination intervention needs a rate in [0, 1]")
+        if kind == "lockdown" and ("region" in policy) == ("threshold" in policy):
+            raise ValueError("lockdown intervention needs either a region or a threshold")
+        if kind == "lockdown" and "region" in policy and len(policy["region"]) != 4:
+            raise ValueError("lockdown region is [first row, last row, first column, last column]")
+        return policy
+
+    def __fold(self, active):
+        """__fold - combines the active policies into one value (or mask) per kind
+        Inputs:
+            - active: tuple of indices of the active policies
+        Outputs:
+            - None
+        """
+        self.__contact = np.ones(5)
+        # probability of not being vaccinated by any of the policies
+        unvaccinated = np.ones(5)
+        self.__region = None
+        self.__threshold = None
+        for index in active:
+            policy = self.__policies[index]
+            if policy["type"] == "distancing":
+                self.__contact[policy["ages"]] *= 1 - policy["reduction"]
+            elif policy["type"] == "vaccination":
+                unvaccinated[policy["ages"]] *= 1 - policy["rate"]
+            elif "region" in policy:
+                if self.__region is None:
+                    self.__region = np.zeros((self.__L, self.__L), dtype=bool)
+                first_row, last_row, first_column, last_column = policy["region"]
+                self.__region[first_row:last_row, first_column:last_column] = True
+            else:
+                self.__threshold = policy["threshold"] if self.__threshold is None else min(self.__threshold, policy["threshold"])
+        self.__vaccination = 1 - unvaccinated
+        if self.__region is not None:
+            self.__region = self.__region.reshape(-1)
+        self.__active = active
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_contact(self):
+        # returns the λ factor of each age category (index 0 unused)
+        return self.__contact
+    def get_vaccination(self):
+        # returns the per-step vaccination probability of each age category (index 0 unused)
+        return self.__vaccination
+    def get_policies(self):
+        # returns the validated policies
+        return self.__policies
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def update(self, time_elapsed):
+        """update - selects the policies active at a timestep, refolding them if the set changed
+        Inputs:
+            - time_elapsed: current timestep
+        Outputs:
+            - None
+        """
+        active = tuple(index for index, policy in enumerate(self.__policies)
+                       if policy["start"] <= time_elapsed and (policy["stop"] is None or time_elapsed < policy["stop"]))
+        if active != self.__active:
+            self.__fold(active)
+
+    def locks_movement(self):
+        # checks if any lockdown is active
+        return self.__region is not None or self.__threshold is not None
+
+    def locked(self, cells, infectious):
+        """locked - which cells are under lockdown
+        Inputs:
+            - cells: integer array of cell indices
+            - infectious: per-cell infectious counts of the step
+        Outputs:
+            - boolean array, True where movement into or out of the cell is blocked
+        """
+        locked = np.zeros(len(cells), dtype=bool)
+        if self.__region is not None:
+            locked |= self.__region[cells]
+        if self.__threshold is not None:
+            locked |= infectious[cells] >= self.__threshold
+        return locked
+
+def load_interventions(path):
+    # reads a JSON list of policies
+    with open(path) as f:
+        policies = json.load(f)
+    if not isinstance(policies, list):
+        raise ValueError(f"{path}: interventions are a JSON list of policies")
+    return policies
+
+def make_interventions(args):
+    """make_interventions - builds the policy layer requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses interventions and L)
+    Outputs:
+        - Interventions, or None when no policy file was given
+    """
+    path = getattr(args, "interventions", None)
+    if path is None:
+        return None
+    return Interventions(load_interventions(path), args.L)
@@ -0,0 +1,156 @@
+import numpy as np
+from Agent import HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD
+
+# ----------------------------------------------------------#
+#        Array kernels shared by the array-based engines     #
+# ----------------------------------------------------------#
+
+def stencil_sum(padded, out=None):
+    """stencil_sum - 3x3 neighborhood sum (self + 8 neighbors) of a padded grid
+    Inputs:
+        - padded: (H + 2) x (W + 2) array; the outer ring holds the halo
+          (zeros on an open lattice border, neighbor rows across a shard boundary)
+        - (Optional) out: H x W int64 array to write the sums into
+    Outputs:
+        - pressure: H x W int64 array (out, when given)
+    """
+    H, W = padded.shape[0] - 2, padded.shape[1] - 2
+    pressure = np.zeros((H, W), dtype=np.int64) if out is None else out
+    if out is not None:
+        pressure.fill(0)
+    for di in (0, 1, 2):
+        for dj in (0, 1, 2):
+            pressure += padded[di:di + H, dj:dj + W]
+    return pressure
+
+def infect_exposed(stream, agents, k, λ):
+    """infect_exposed - one batched exposure draw for every healthy agent under pressure
+    An agent facing k infectious contacts escapes each one independently, so it
+    is infected with probability 1 - (1 - λ * susceptibility)^k.
+    Inputs:
+        - stream: UniformStream to draw the exposures from
+        - agents: AgentPopulation
+        - k: per-agent number of infectious contacts
+        - λ: probability of catching infection per contact
+    Outputs:
+        - newly_infected: indices of the agents that caught the infection
+    """
+    candidates, probability = exposure_candidates(agents, k, λ)
+    return infect_candidates(agents, candidates, probability, stream.take(len(candidates)))
+
+def exposure_candidates(agents, k, λ):
+    """exposure_candidates - the healthy agents under pressure and their infection probabilities
+    Inputs:
+        - agents: AgentPopulation (or a block of one)
+        - k: per-agent number of infectious contacts
+        - λ: probability of catching infection per contact (scalar, or an array indexed by age category)
+    Outputs:
+        - (candidates, probability): agent indices and 1 - (1 - λ * susceptibility)^k for each
+    """
+    candidates = np.flatnonzero((agents.status == HEALTHY) & (k > 0))
+    if np.ndim(λ) > 0:
+        λ = λ[agents.age[candidates]]
+    return candidates, 1 - (1 - λ * agents.susceptibility[candidates]) ** k[candidates]
+
+def infect_candidates(agents, candidates, probability, uniforms):
+    """infect_candidates - infects the candidates whose exposure draw falls below their probability
+    Inputs:
+        - agents: AgentPopulation (or a block of one)
+        - candidates, probability: as returned by exposure_candidates
+        - uniforms: one uniform float per candidate
+    Outputs:
+        - newly_infected: indices of the agents that caught the infection
+    """
+    newly_infected = candidates[uniforms < probability]
+    agents.status[newly_infected] = ASYMPTOMATIC
+    agents.days_infected[newly_infected] = 0
+    return newly_infected
+
+def advance_disease(agents, asympt_length, sympt_length):
+    """advance_disease - advances the disease clock of every infected agent
+    Same transition times as the graph engine's timer wheel: increments
+    days_infected, then applies the asymptomatic -> symptomatic and
+    symptomatic -> dead transitions, decided from the status held at the
+    start of the call.
+    Inputs:
+        - agents: AgentPopulation
+        - asympt_length: length of time for asymptomatic phase
+        - sympt_length: length of time for symptomatic phase
+    Outputs:
+        - (to_symptomatic, to_dead): indices of agents that changed status
+    """
+    status = agents.status
+    days_infected = agents.days_infected
+    infected = np.flatnonzero((status == ASYMPTOMATIC) | (status == SYMPTOMATIC))
+    days_infected[infected] += 1
+    previous = status[infected]
+    days = days_infected[infected]
+    to_symptomatic = infected[(previous == ASYMPTOMATIC) & (days > asympt_length)]
+    to_dead = infected[(previous == SYMPTOMATIC) & (days > asympt_length + sympt_length)]
+    status[to_symptomatic] = SYMPTOMATIC
+    status[to_dead] = DEAD
+    days_infected[to_dead] = -1
+    return to_symptomatic, to_dead
+
+def move_probability(β, n_age_1, n_age_2):
+    """move_probability - Metropolis acceptance of Agent.move_agent (scalars or arrays)
+    Inputs:
+        - β: age-dependent mobility factor of the mover(s)
+        - n_age_1: number of same-age agents at site 1
+        - n_age_2: number of same-age agents at site 2
+    Outputs:
+        - probability of accepting the move
+    """
+    Δn_age = np.asarray(n_age_2, dtype=np.float64) - n_age_1
+    # same two cases as Agent.move_agent; the exponent is capped only to avoid overflow
+    exponent = np.where(Δn_age >= 0, β * Δn_age, -β * Δn_age)
+    probability = np.exp(np.minimum(exponent, 50))
+    return np.where(Δn_age >= 0, np.minimum(1, probability), probability)
+
+def random_neighbors(indptr, indices, cells, uniforms):
+    """random_neighbors - a uniformly chosen neighbor for every cell, from CSR adjacency
+    Inputs:
+        - indptr, indices: CSR adjacency of the topology
+        - cells: integer node indices
+        - uniforms: one uniform float in [0, 1) per cell
+    Outputs:
+        - targets: int64 node index of the chosen neighbor of each cell (-1 for isolated nodes)
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    start = indptr[cells].astype(np.int64)
+    degree = indptr[cells + 1] - start
+    targets = np.full(len(cells), -1, dtype=np.int64)
+    connected = degree > 0
+    # the k-th neighbor, k uniform over the node's degree
+    offset = (uniforms[connected] * degree[connected]).astype(np.int64)
+    targets[connected] = indices[start[connected] + offset]
+    return targets
+
+def neighbor_sum(indptr, indices, values):
+    """neighbor_sum - per-node sum of a per-node quantity over its neighbors
+    Inputs:
+        - indptr, indices: CSR adjacency of the topology
+        - values: integer array with one value per node
+    Outputs:
+        - sums: int64 array with one sum per node
+    """
+    running = np.concatenate([[0], np.cumsum(values[indices], dtype=np.int64)])
+    return running[indptr[1:]] - running[indptr[:-1]]
+
+def count_into(target, indices):
+    """count_into - adds the number of occurrences of every index to a counter array
+    A dense bincount when the counters are not much longer than the indices,
+    otherwise only the distinct indices are counted and updated, so the
+    temporaries stay proportional to len(indices) and target can be a
+    memory-mapped array far larger than memory.
+    Inputs:
+        - target: 1-D integer counter array, updated in place
+        - indices: integer indices into target
+    Outputs:
+        - None
+    """
+    if len(target) <= 16 * len(indices):
+        target += np.bincount(indices, minlength=len(target))
+    elif len(indices) > 0:
+        cells, counts = np.unique(indices, return_counts=True)
+        target[cells] += counts
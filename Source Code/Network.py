@@ -1,8 +1,19 @@
-import networkx as nx
-import random
+import gc
 import math
-import matplotlib.pyplot as plt
+import time
+import numpy as np
 from Agent import *
+from AgentPopulation import categorize_ages
+from Rng import RandomStreams
+from Topology import Topology, make_topology
+from TimerWheel import TimerWheel
+from Kernels import move_probability, random_neighbors
+from Display import Display
+from OutputSink import make_sink
+from Recorder import make_recorder
+from Profiler import Profiler, make_profiler
+from Stopping import make_stop_criteria, pad_to_end
+from Checkpoint import write_checkpoint, read_checkpoint, plot_points_to_array, plot_points_from_array, stats_from_json, topology_to_arrays, topology_from_arrays
 
 class Network:
     """Network class
@@ -15,13 +26,24 @@ class Network:
         Outputs:
             - None; returns Network object
         """
+        # agents are Python objects on the node lists, so there are no arrays to memory-map
+        if getattr(args, "workdir", None) is not None:
+            raise ValueError("--workdir is only supported by the vector engine")
+        # the phases walk Python objects and hold the GIL, so worker threads would not run them in parallel
+        if getattr(args, "threads", 1) > 1:
+            raise ValueError("--threads is only supported by the vector engine")
+        # policies are applied as masks over the agent and cell arrays
+        if getattr(args, "interventions", None) is not None:
+            raise ValueError("--interventions is only supported by the vector engine")
         # network-based parameters (taken from arguments)
         self.__network_params = { "N": args.N, # population density of agents
                                   "L": args.L, # lattice L/W dimension
                                   "num_nodes": args.L * args.L, # number of total nodes
                                   "t": args.t, # total time steps to portray
                                   "influx": args.influx, # probability of new agent being added per timestep
-                                  "n_0": args.n_0 } # initial infected population size 
+                                  "n_0": args.n_0, # initial infected population size 
+                                  "movement": getattr(args, "movement", "single"), # single-agent or sweep movement
+                                  "topology": getattr(args, "topology", "lattice") } # contact graph provider
         # agent-based parameters (taken from arguments)
         self.__agent_params = { "asympt_length": args.asym_l, # length of time for asympt phase
                                 "sympt_length": args.symp_l, # length of time for sympt phase
@@ -29,229 +51,486 @@ class Network:
                                 "beta": { 1: 1, 2: 2 , 3: 3, 4: 4 } } # age-dependent mobility factor
         # initialize start time to 0
         self.__time_elapsed = 0
+        Agent.time_elapsed = 0
         # counter for number of agents
         self.__num_agents = 0
         # statistical counters
         self.__stats = {i: {"total": 0, "alive": 0, "dead": 0, "infected": 0} for i in range(1, 5)}
         self.__plot_points = {i: [] for i in range(0, 5)}
-        # generate and populate lattice
+        # recount every counter from the agents after each step and stop on a mismatch
+        self.__debug = getattr(args, "debug", False)
+        # index of occupied nodes: a list for O(1) uniform sampling plus each node's position in it
+        self.__occupied_nodes = []
+        self.__occupied_position = {}
+        # index of currently infected agents (id -> agent), kept in infection order
+        self.__infected = {}
+        # independent random streams for each phase, derived from --seed
+        self.__streams = RandomStreams(getattr(args, "seed", None))
+        # contact graph between nodes, compiled to CSR adjacency
+        self.__topology = make_topology(args, self.__streams.get("topology"))
+        # scheduled disease transitions, bucketed by the timestep they fire at
+        self.__timers = self.__new_timer_wheel()
+        # generate the lattice, then populate it or restore a checkpoint into it; the collector
+        # is paused meanwhile (every pass would rescan the growing population and free nothing)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        start = time.perf_counter()
         self.__generate_lattice()
-        self.__populate_lattice()
-        # initialize the display of the network
-        plt.figure(figsize=(15, 8))
-        plt.plot()
+        lattice_time = time.perf_counter() - start
+        if getattr(args, "resume", None):
+            self.load_checkpoint(args.resume)
+        else:
+            self.__populate_lattice()
+        # the lattice and agents live for the whole run: keep later collections from rescanning them
+        gc.freeze()
+        if gc_enabled:
+            gc.enable()
+        # seconds spent building the run, reported with the phase times
+        self.__setup_times = { "topology": self.__topology.get_build_time(),
+                               "lattice": lattice_time,
+                               "resume" if getattr(args, "resume", None) else "populate": time.perf_counter() - start - lattice_time }
+        # initialize the display of the network (None when running headless)
+        self.__display = None if getattr(args, "headless", False) else Display(getattr(args, "render_every", 1))
+        # stream statistics to disk when an output directory is given
+        self.__sink = make_sink(args)
+        # record per-cell frames for offline replay when a recording directory is given
+        self.__recorder = make_recorder(args, self.__time_elapsed if getattr(args, "resume", None) else None)
+        if self.__recorder is not None and not getattr(args, "resume", None):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+        # per-phase instrumentation of the timestep loop (None when --profile is off)
+        self.__profiler = make_profiler(args)
+        # checkpoint settings: save every K steps (0 = never) to path
+        self.__checkpoint = { "every": getattr(args, "checkpoint_every", 0),
+                              "path": getattr(args, "checkpoint", "checkpoint.npz") }
+        # early stopping and fast-forward (None when every criterion is off)
+        self.__stopping = make_stop_criteria(args)
+        # criterion that ended the run early (None while it runs to t)
+        self.__stop_reason = None
 
     # ----------------------------------------------------------#
     #                Internal Class Functions                   #
     # ----------------------------------------------------------#
 
     def __generate_lattice(self):
-        """__generate_lattice - generates a lattice structure
+        """__generate_lattice - sets up the empty occupancy lists of every node
+        The edges come from the CSR topology; node (i, j) has index i * L + j.
+        A networkx graph is only built when the lattice is drawn or requested.
         Inputs:
             - None; uses self.__network_params to get required values
         Outputs:
-            - None; saves lattice in self.__lattice
+            - None; saves occupancy lists in self.__occupants
         """
-        # generate an empty linear LxL lattice
-        self.__lattice = nx.grid_2d_graph(m=self.__network_params["L"], n=self.__network_params["L"])
-        # set each edge weight to be 1 for ease of display
-        for edge in self.__lattice.edges:
-            self.__lattice.edges[edge]["weight"] = 1.0
-        # manually add diagonal edges to account for full 8 neighbors per node
-        # weight for each each sqrt(1^2+1^2) = ~1.41
-        self.__lattice.add_edges_from([((x, y), (x+1, y+1))
-                                       for x in range(self.__network_params["L"]-1)
-                                       for y in range(self.__network_params["L"]-1)] + 
-                                      [((x+1, y), (x, y+1))
-                                       for x in range(self.__network_params["L"]-1)
-                                       for y in range(self.__network_params["L"]-1)], weight=1.41)
-        # generate new labels for nodes based on integer indices
-        labels = {}; index_counter = 0
-        for i in range(self.__network_params["L"]):
-            for j in range(self.__network_params["L"]):
-                labels[(i, j)] = index_counter; index_counter += 1
-        # update labels for each node to be an integer index for easier association
-        nx.relabel_nodes(self.__lattice, labels, copy=False)
         # set all nodes to 'unoccupied' (or empty list)
-        for i in range(self.__network_params["num_nodes"]):
-            self.__lattice.nodes[i]["occupants"] = []
+        self.__occupants = [[] for _ in range(self.__network_params["num_nodes"])]
+        # running counters, updated at every transition: agents per status code and per age
+        # category (row age - 1) on each node, and agents per status code and age overall
+        self.__cell_counts = np.zeros((4, self.__network_params["num_nodes"]), dtype=np.int32)
+        self.__cell_ages = np.zeros((4, self.__network_params["num_nodes"]), dtype=np.int32)
+        self.__age_counts = np.zeros((4, 4), dtype=np.int64)
+        # networkx view of the topology, built lazily by get_lattice
+        self.__lattice = None
 
+    def __new_timer_wheel(self):
+        # empty timer wheel starting at the current timestep, wide enough for a full infection
+        return TimerWheel(self.__agent_params["asympt_length"] + max(self.__agent_params["sympt_length"], 1) + 1,
+                          self.__time_elapsed)
+
+    def __schedule_transitions(self, agent):
+        """__schedule_transitions - files an infected agent's pending transitions in the timer wheel
+        Both transition times are fixed at infection. An agent infected at step s
+        turns symptomatic at step s + asympt_length and dies at step
+        s + asympt_length + max(sympt_length, 1), the steps at which a per-step
+        days_infected counter would cross each threshold.
+        Inputs:
+            - agent: asymptomatic or symptomatic Agent
+        Outputs:
+            - None
+        """
+        symptomatic_at = agent.get_infected_at() + self.__agent_params["asympt_length"]
+        if not agent.get_symptomatic():
+            self.__timers.schedule(symptomatic_at, ("symptomatic", agent))
+        self.__timers.schedule(symptomatic_at + max(self.__agent_params["sympt_length"], 1), ("dead", agent))
+
+    def __add_occupant(self, node, agent):
+        """__add_occupant - places an agent on a node, keeping the occupied-node index current
+        Inputs:
+            - node: integer node index
+            - agent: Agent to place
+        Outputs:
+            - None
+        """
+        occupants = self.__occupants[node]
+        # node becomes occupied: append to the index
+        if len(occupants) == 0:
+            self.__occupied_position[node] = len(self.__occupied_nodes)
+            self.__occupied_nodes.append(node)
+        occupants.append(agent)
+        self.__cell_counts[agent.get_status_code(), node] += 1
+        self.__cell_ages[agent.get_age() - 1, node] += 1
+
+    def __remove_occupant(self, node, occupant_index):
+        """__remove_occupant - takes an agent off a node, keeping the occupied-node index current
+        Inputs:
+            - node: integer node index
+            - occupant_index: position of the agent in the node's occupancy list
+        Outputs:
+            - agent: the removed Agent
+        """
+        occupants = self.__occupants[node]
+        agent = occupants.pop(occupant_index)
+        self.__cell_counts[agent.get_status_code(), node] -= 1
+        self.__cell_ages[agent.get_age() - 1, node] -= 1
+        # node became empty: swap it with the last index entry and drop it in O(1)
+        if len(occupants) == 0:
+            position = self.__occupied_position.pop(node)
+            last = self.__occupied_nodes.pop()
+            if last != node:
+                self.__occupied_nodes[position] = last
+                self.__occupied_position[last] = position
+        return agent
+
+    def __count_transition(self, agent, old_status, new_status):
+        """__count_transition - moves an agent between status counters after a health transition
+        Inputs:
+            - agent: Agent whose status changed (counted on its current node)
+            - old_status: previous status code
+            - new_status: new status code
+        Outputs:
+            - None
+        """
+        node, age_row = agent.get_location(), agent.get_age() - 1
+        self.__cell_counts[old_status, node] -= 1
+        self.__cell_counts[new_status, node] += 1
+        self.__age_counts[old_status, age_row] -= 1
+        self.__age_counts[new_status, age_row] += 1
+
+    def __recount(self):
+        """__recount - rebuilds every running counter from a full scan of the agents
+        Inputs:
+            - None
+        Outputs:
+            - (cell_counts, cell_ages, age_counts): the counters as the running ones should hold them
+        """
+        num_nodes = self.__network_params["num_nodes"]
+        nodes, status, ages = [], [], []
+        for node, occupants in enumerate(self.__occupants):
+            for agent in occupants:
+                nodes.append(node); status.append(STATUS_LABELS.index(agent.get_status(self.__time_elapsed)[0])); ages.append(agent.get_age() - 1)
+        nodes, status, ages = (np.array(values, dtype=np.int64) for values in (nodes, status, ages))
+        cell_counts = np.bincount(status * num_nodes + nodes, minlength=4 * num_nodes).reshape(4, num_nodes).astype(np.int32)
+        cell_ages = np.bincount(ages * num_nodes + nodes, minlength=4 * num_nodes).reshape(4, num_nodes).astype(np.int32)
+        age_counts = np.bincount(status * 4 + ages, minlength=16).reshape(4, 4)
+        return cell_counts, cell_ages, age_counts
+
+    def __check_counters(self):
+        """__check_counters - debug check of the running counters against a full recount
+        Inputs:
+            - None
+        Outputs:
+            - None; raises RuntimeError naming the first counter that disagrees
+        """
+        cell_counts, cell_ages, age_counts = self.__recount()
+        for name, running, counted in (("cell status", self.__cell_counts, cell_counts),
+                                       ("cell age", self.__cell_ages, cell_ages),
+                                       ("age status", self.__age_counts, age_counts)):
+            if not np.array_equal(running, counted):
+                row, column = (int(i[0]) for i in np.nonzero(running != counted))
+                raise RuntimeError(f"t={self.__time_elapsed}: {name} counter [{row}, {column}] is {int(running[row, column])}, "
+                                   f"a full recount gives {int(counted[row, column])}")
+        # the cumulative statistics must agree with the current counts too
+        for key in self.__stats:
+            infected = int(age_counts[ASYMPTOMATIC, key - 1] + age_counts[SYMPTOMATIC, key - 1])
+            if self.__stats[key]["infected"] - self.__stats[key]["dead"] != infected or self.__stats[key]["dead"] != int(age_counts[DEAD, key - 1]):
+                raise RuntimeError(f"t={self.__time_elapsed}: statistics of age {key} are {self.__stats[key]}, "
+                                   f"a full recount gives {infected} infected and {int(age_counts[DEAD, key - 1])} dead")
 
     def __populate_lattice(self):
         """__populate_lattice - fills lattice with N agents randomly
+        Locations and ages are drawn for the whole population at once, in the
+        same per-agent order (location, then age) as creating agents one by one,
+        and the node occupancy lists are filled from a stable counting sort by
+        location, so each node lists its agents in creation order.
         Inputs:
             - None; uses self.__agent_params to get required values
         Outputs:
             - None; saves agents in node occupancy lists
         """
+        placement = self.__streams.get("placement")
+        num_nodes = self.__network_params["num_nodes"]
+        num_agents = int(num_nodes * self.__network_params["N"])
         # handle initial infected cases by randomly assigning id's that would be infected
-        infected_indices = []
-        # repeat until required number of infected indices met
-        for i in range(self.__network_params["n_0"]):
-            # get a new index to infect
-            ind = random.randint(0, int(self.__network_params["num_nodes"] * self.__network_params["N"]))
-            while ind in infected_indices:
-                ind = random.randint(0, int(self.__network_params["num_nodes"] * self.__network_params["N"]))
-            # add to list
-            infected_indices.append(ind)
+        infected_indices = np.sort(placement.sample(num_agents, min(self.__network_params["n_0"], num_agents)))
         # randomly disperse agents across lattice, with population of density * num_nodes
-        for i in range(int(self.__network_params["num_nodes"] * self.__network_params["N"])):
-            # create agent at random location
-            agent = Agent(random.randint(0, self.__network_params["num_nodes"] - 1))
-            # check if infected
-            if i in infected_indices:
-                agent.set_infected()
-                # update infection statistics
-                self.__stats[agent.get_age()]["infected"] += 1
-            # append to lattice node occupancy list
-            self.__lattice.nodes[agent.get_location()]["occupants"].append(agent)
-            # increment number of active agents counter
-            self.__num_agents += 1
-            # update statistical counters
-            self.__stats[agent.get_age()]["total"] += 1
-            self.__stats[agent.get_age()]["alive"] += 1
+        draws = placement.take(2 * num_agents)
+        locations = (draws[0::2] * num_nodes).astype(np.int64)
+        ages = categorize_ages((draws[1::2] * 83).astype(np.int64))
+        agents = Agent.create_many(locations.tolist(), ages.tolist())
+        for i in infected_indices.tolist():
+            agent = agents[i]
+            agent.set_infected(self.__time_elapsed)
+            self.__infected[agent.get_id()] = agent
+            self.__schedule_transitions(agent)
+        # group agents by node: occupied nodes enter the index in the order they were first occupied
+        order = np.argsort(locations, kind="stable")
+        counts = np.bincount(locations, minlength=num_nodes)
+        occupied = np.flatnonzero(counts)
+        ends = np.cumsum(counts[occupied])
+        starts = ends - counts[occupied]
+        by_first_agent = np.argsort(order[starts])
+        sorted_agents = [agents[j] for j in order.tolist()]
+        for node, start, end in zip(occupied[by_first_agent].tolist(), starts[by_first_agent].tolist(), ends[by_first_agent].tolist()):
+            self.__occupants[node].extend(sorted_agents[start:end])
+            self.__occupied_position[node] = len(self.__occupied_nodes)
+            self.__occupied_nodes.append(node)
+        # update counters
+        self.__cell_counts, self.__cell_ages, self.__age_counts = self.__recount()
+        self.__num_agents += num_agents
+        totals = np.bincount(ages, minlength=5)
+        infected = np.bincount(ages[infected_indices], minlength=5)
+        for key in self.__stats:
+            self.__stats[key]["total"] += int(totals[key])
+            self.__stats[key]["alive"] += int(totals[key])
+            self.__stats[key]["infected"] += int(infected[key])
 
     def __check_for_movement(self):
         """__check_for_movement - checks which agent should move and tries to move agent
         Inputs:
             - None
         Outputs:
-            - None
+            - int: number of agents moved (0 or 1)
         """
-        # randomly select index of site 1
-        s_1_index = random.randint(0, self.__network_params["num_nodes"] - 1)
-        # ensure that s_1_index is not devoid of occupants
-        while len(self.__lattice.nodes[s_1_index]["occupants"]) == 0:
-            s_1_index = random.randint(0, self.__network_params["num_nodes"] - 1)
+        # nothing to move on an empty lattice
+        if len(self.__occupied_nodes) == 0:
+            return 0
+        movement = self.__streams.get("movement")
+        # randomly select index of site 1 directly from the occupied-node index
+        s_1_index = self.__occupied_nodes[movement.integers(len(self.__occupied_nodes))]
         # identify site 1's neighbors
-        neighbors = [n for n in self.__lattice.neighbors(s_1_index)]
+        neighbors = self.__topology.neighbors(s_1_index).tolist()
+        # an isolated site has nowhere to move to
+        if len(neighbors) == 0:
+            return 0
         # randomly select index of site 2 from list of neighbor nodes
-        s_2_index = neighbors[random.randint(0, len(neighbors) - 1)]
-        # check to ensure no infectious individual is at s_2
+        s_2_index = neighbors[movement.integers(len(neighbors))]
+        # check to ensure no infectious individual is at s_2 (every occupant, via the per-node symptomatic count)
         # use repeat_counter to ensure no infinite loops
         repeat_counter = 0
-        while True:
+        while self.__cell_counts[SYMPTOMATIC, s_2_index] > 0:
             # if caught in infinite loop, no movement
             if repeat_counter > 30:
-                return
-            # initialize a flag to catch infectiousness
-            check_infectious = False
-            # iterate over every agent in the s_2 site
-            for agent_index in range(0, len(self.__lattice.nodes[s_2_index]["occupants"]) - 1):
-                # if infectious, re-randomize s_2 and set to recheck again
-                if self.__lattice.nodes[s_2_index]["occupants"][agent_index].get_symptomatic():
-                    check_infectious = True
-                    s_2_index = neighbors[random.randint(0, len(neighbors) - 1)]
-                    repeat_counter += 1 
-                    break
-            # if check passed, exit loop
-            if not check_infectious:
-                break
+                return 0
+            # if infectious, re-randomize s_2 and recheck
+            s_2_index = neighbors[movement.integers(len(neighbors))]
+            repeat_counter += 1
         # randomly select agent in s_1 to attempt to move
-        agent_index = random.randint(0, len(self.__lattice.nodes[s_1_index]["occupants"]) - 1)
-        # initially setting n_age_1 to be 0 (to be used as a counter)
-        n_age_1 = 0
+        agent_index = movement.integers(len(self.__occupants[s_1_index]))
         # noting age category of selected agent to move
-        age_category = self.__lattice.nodes[s_1_index]["occupants"][agent_index].get_age()
-        # calculating n_age_1 by iterating over occupants of site 1 (s_1)
-        for occupant_index in range(0, len(self.__lattice.nodes[s_1_index]["occupants"])):
-            # incrementing only if matching age
-            if self.__lattice.nodes[s_1_index]["occupants"][occupant_index].get_age() == age_category:
-                n_age_1 += 1
-        # intially setting n_age_2 to be 0 (to be used as a counter)
-        n_age_2 = 0
-        # calculating n_age_2 by iterating over occupants of site 2 (s_2)
-        for occupant_index in range(0, len(self.__lattice.nodes[s_2_index]["occupants"])):
-            # incrementing only if matching age
-            if self.__lattice.nodes[s_2_index]["occupants"][occupant_index].get_age() == age_category:
-                n_age_2 += 1
+        age_category = self.__occupants[s_1_index][agent_index].get_age()
+        # n_age_1 / n_age_2: occupants of the same age at site 1 and site 2, from the per-node counters
+        n_age_1 = int(self.__cell_ages[age_category - 1, s_1_index])
+        n_age_2 = int(self.__cell_ages[age_category - 1, s_2_index])
         # attempt to move the agent from s_1 to s_2
-        if self.__lattice.nodes[s_1_index]["occupants"][agent_index].move_agent(n_age_1, n_age_2, # n_age values for s_1 and s_2 respectively
-                                                                                self.__lattice.nodes[s_2_index], # target node
-                                                                                self.__agent_params["beta"]): # beta associative list
+        if self.__occupants[s_1_index][agent_index].move_agent(n_age_1, n_age_2, # n_age values for s_1 and s_2 respectively
+                                                                                s_2_index, # target node
+                                                                                self.__agent_params["beta"], # beta associative list
+                                                                                movement):
             # on success, update lists for both s_1 and s_2 accordingly
-            self.__lattice.nodes(data=True)[s_2_index]["occupants"].append(self.__lattice.nodes(data=True)[s_1_index]["occupants"].pop(agent_index))
+            self.__add_occupant(s_2_index, self.__remove_occupant(s_1_index, agent_index))
+            return 1
+        return 0
+
+    def __sweep_movement(self):
+        """__sweep_movement - every mobile agent proposes a move in the same step
+        Each living, non-symptomatic agent proposes a uniformly chosen neighbor
+        node; proposals onto a node holding a symptomatic agent are rejected, and
+        the rest are accepted with the Metropolis probability of Agent.move_agent.
+        Per-node, per-age occupancy counts (4 x num_nodes) are taken once at the
+        start of the sweep, so every acceptance is evaluated in one batch against
+        the same snapshot, and all accepted moves are applied together: the
+        outcome does not depend on the order agents are visited in.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents moved
+        """
+        # gather the mobile agents in one pass over the occupied nodes, with their slot in the node's occupancy list
+        movers, slots = [], []
+        for node in self.__occupied_nodes:
+            for slot, agent in enumerate(self.__occupants[node]):
+                if agent.get_status(self.__time_elapsed)[0] not in ["symptomatic", "dead"]:
+                    movers.append(agent)
+                    slots.append(slot)
+        if len(movers) == 0:
+            return 0
+        movement = self.__streams.get("movement")
+        # per-node, per-age occupancy (row age - 1) and per-node symptomatic counts, snapshotted from the counters
+        age_counts = self.__cell_ages.copy()
+        symptomatic = self.__cell_counts[SYMPTOMATIC].copy()
+        source = np.array([agent.get_location() for agent in movers], dtype=np.int64)
+        age_row = np.array([agent.get_age() for agent in movers], dtype=np.int64) - 1
+        beta = np.array([0] + [self.__agent_params["beta"][age] for age in range(1, 5)])
+        # propose targets, then draw every acceptance (always both draws, so the stream stays aligned)
+        target = random_neighbors(self.__topology.get_indptr(), self.__topology.get_indices(), source, movement.take(len(movers)))
+        uniforms = movement.take(len(movers))
+        # agents on isolated nodes stay put
+        connected = target >= 0
+        target = np.where(connected, target, source)
+        prob_1_to_2 = move_probability(beta[age_row + 1], age_counts[age_row, source], age_counts[age_row, target])
+        accepted = connected & (symptomatic[target] == 0) & (uniforms <= prob_1_to_2)
+        # apply all accepted moves simultaneously; moves off a node are applied in slot order, and arrivals
+        # are appended after its original occupants, so a mover's slot only shifts by the earlier departures
+        departed = {}
+        for index in np.flatnonzero(accepted).tolist():
+            agent, s_1_index, s_2_index = movers[index], int(source[index]), int(target[index])
+            agent.set_location(s_2_index)
+            slot = slots[index] - departed.get(s_1_index, 0)
+            departed[s_1_index] = departed.get(s_1_index, 0) + 1
+            self.__add_occupant(s_2_index, self.__remove_occupant(s_1_index, slot))
+        return int(accepted.sum())
 
     def __check_for_infection(self):
         """__check_for_infection - checks all agents for infection, tries to propogate
+        Only the agents infected at the start of the phase spread the disease,
+        so the cost scales with the infected population rather than the lattice.
         Inputs:
             - None
         Outputs:
-            - None
+            - int: number of agents newly infected
         """
-        # iterate over every node in lattice
-        for node in self.__lattice.nodes(data=True):
-            # for each node, gather up all the neighboring nodes (including self)
-            neighbors = [n for n in self.__lattice.neighbors(node[0])] + [node[0]]
-            # iterate over every occupant of the node
-            for occupant_index in range(0, len(node[1]["occupants"])):
-                # if current occupant is infectious...
-                if node[1]["occupants"][occupant_index].get_infectious():
-                    # iterate over all neighboring nodes
-                    for neighbor in neighbors:
-                        # iterate over all occupants of neighboring node
-                        for o_index in range(0, len(self.__lattice.nodes[neighbor]["occupants"]) - 1):
-                            # expose each neighboring occupant to infection with probability lambda
-                            if self.__lattice.nodes[neighbor]["occupants"][o_index].expose_to_infection(self.__agent_params["lambda"]):
-                                # update statistics
-                                self.__stats[self.__lattice.nodes[neighbor]["occupants"][o_index].get_age()]["infected"] += 1
+        infection = self.__streams.get("infection")
+        newly_infected = 0
+        # iterate over a snapshot of the infected index (it grows as agents are infected)
+        for agent in list(self.__infected.values()):
+            # gather up all the neighboring nodes of the agent's node (including self)
+            node = agent.get_location()
+            neighbors = self.__topology.neighbors(node).tolist() + [node]
+            # iterate over all neighboring nodes
+            for neighbor in neighbors:
+                # iterate over all occupants of neighboring node
+                for occupant in self.__occupants[neighbor]:
+                    # expose each neighboring occupant to infection with probability lambda
+                    if occupant.expose_to_infection(self.__agent_params["lambda"], self.__time_elapsed, infection):
+                        self.__infected[occupant.get_id()] = occupant
+                        self.__schedule_transitions(occupant)
+                        self.__count_transition(occupant, HEALTHY, ASYMPTOMATIC)
+                        newly_infected += 1
+                        # update statistics
+                        self.__stats[occupant.get_age()]["infected"] += 1
+        return newly_infected
 
     def __check_for_death(self):
-        """__check_for_death - checks all agents for infectious status and applies death as needed
+        """__check_for_death - applies the disease transitions scheduled for this timestep
+        Only agents whose transition fires now are touched, so the cost is
+        O(transitions) rather than O(infected).
         Inputs:
             - None
         Outputs:
-            - None
+            - int: number of transitions applied
         """
-        # iterate over every node in lattice
-        for node in self.__lattice.nodes(data=True):
-            # for each node, iterate over all occupants
-            for occupant_index in range(0, len(node[1]["occupants"])):
-                # update agent's status
-                if node[1]["occupants"][occupant_index].update_agent(self.__agent_params["asympt_length"], self.__agent_params["sympt_length"]):
-                    # decrement counter for death
-                    self.__num_agents -= 1
-                    # update statistics
-                    self.__stats[node[1]["occupants"][occupant_index].get_age()]["alive"] -= 1
-                    self.__stats[node[1]["occupants"][occupant_index].get_age()]["dead"] += 1
+        transitions = self.__timers.advance()
+        for transition, agent in transitions:
+            # asymptomatic -> symptomatic
+            if transition == "symptomatic":
+                agent.set_symptomatic()
+                self.__count_transition(agent, ASYMPTOMATIC, SYMPTOMATIC)
+                continue
+            # symptomatic -> dead; dead agents leave the infected index
+            agent.set_dead()
+            self.__count_transition(agent, SYMPTOMATIC, DEAD)
+            del self.__infected[agent.get_id()]
+            # decrement counter for death
+            self.__num_agents -= 1
+            # update statistics
+            self.__stats[agent.get_age()]["alive"] -= 1
+            self.__stats[agent.get_age()]["dead"] += 1
+        return len(transitions)
 
     def __check_for_influx(self):
         """__check_for_influx - checks to see if new members of population should be added (randomly)
         Inputs:
             - None
         Outputs:
-            - None
+            - int: number of agents added (0 or 1)
         """
         # compute a probability of adding new agent to population
-        probability = random.randint(1, 100) / 100
+        probability = self.__streams.get("influx").next()
         # if probability is sufficient...
         if probability < self.__network_params["influx"]:
-            # add new agent to lattice randomly
-            agent = Agent(random.randint(0, self.__network_params["num_nodes"] - 1))
-            self.__lattice.nodes[agent.get_location()]["occupants"].append(agent)
-            # increment num_agents counter
-            self.__num_agents += 1
-            # update statistics
-            self.__stats[agent.get_age()]["total"] += 1
-            self.__stats[agent.get_age()]["alive"] += 1
+            return self.__add_influx_agent()
+        return 0
+
+    def __add_influx_agent(self):
+        # adds a new healthy agent at a random node (drawn from the influx stream); returns the number added
+        influx = self.__streams.get("influx")
+        agent = Agent(influx.integers(self.__network_params["num_nodes"]), influx)
+        self.__add_occupant(agent.get_location(), agent)
+        self.__age_counts[HEALTHY, agent.get_age() - 1] += 1
+        # increment num_agents counter
+        self.__num_agents += 1
+        # update statistics
+        self.__stats[agent.get_age()]["total"] += 1
+        self.__stats[agent.get_age()]["alive"] += 1
+        return 1
+
+    def __fast_forward(self):
+        """__fast_forward - jumps to the next influx arrival (with no infectious agent left nothing else can change)
+        The wait is one geometric draw on the influx stream; the timesteps
+        before the arrival hold the counters in the plot points and output rows.
+        Inputs:
+            - None
+        Outputs:
+            - boolean: True when an agent arrived at the new timestep, False when t came first
+        """
+        t = self.__network_params["t"]
+        arrival = self.__time_elapsed + self.__stopping.steps_to_arrival(self.__streams.get("influx"))
+        quiet_end = min(arrival - 1, t)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, quiet_end)
+        self.__time_elapsed = quiet_end
+        if quiet_end < t:
+            self.__run_phase("influx", self.__add_influx_agent)
+            self.__time_elapsed += 1
+        # restart the (empty) timer wheel at the new clock and move the agents' clock along
+        self.__timers = self.__new_timer_wheel()
+        Agent.time_elapsed = self.__time_elapsed
+        return quiet_end < t
+
+    def __stop(self, reason):
+        # ends the run early: the counters are held at their current values up to t
+        self.__stop_reason = (reason, self.__time_elapsed)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, self.__network_params["t"])
+        self.__time_elapsed = self.__network_params["t"]
+        Agent.time_elapsed = self.__time_elapsed
+
+    def __run_phase(self, name, phase):
+        # runs one phase of a timestep, reporting its wall time and agents updated when profiling
+        if self.__profiler is None:
+            phase()
+            return
+        start = time.perf_counter()
+        touched = phase()
+        self.__profiler.record(name, time.perf_counter() - start, touched)
 
     def __timestep(self):
         """__timestep - handling of a single timestep
         Runs a single timestep of the model on the network.
         Based on a Metropolitan algorithm, so a single agent moves per step
+        (or, with movement="sweep", every mobile agent attempts one move)
         Inputs:
             - None
         Outputs:
             - None; lattice updated with new configuration
         """
         # check if infection spreads and carry it out
-        self.__check_for_infection()
+        self.__run_phase("infection", self.__check_for_infection)
         # update status of agents and check for death - apply as needed
-        self.__check_for_death()
-        # check if agent makes movement and carry it out
-        self.__check_for_movement()
+        self.__run_phase("death", self.__check_for_death)
+        # check if agent makes movement and carry it out (one agent, or a sweep over all of them)
+        if self.__network_params["movement"] == "sweep":
+            self.__run_phase("movement", self.__sweep_movement)
+        else:
+            self.__run_phase("movement", self.__check_for_movement)
         # check if new agent to be introduce to population
-        self.__check_for_influx()
+        self.__run_phase("influx", self.__check_for_influx)
 
         # increment timestep counter
         self.__time_elapsed += 1
@@ -263,44 +542,17 @@ class Network:
         Outputs:
             - colorations: list of colors for the nodes
         """
-        # initializing a list to store the colors for each node
-        colorations = []
-        # iterate over each node in lattice
-        for node in self.__lattice.nodes(data=True):
-            # if no occupants at node, simply assign 'blank' color (equivalent to all dead)
-            if len(node[1]["occupants"]) == 0:
-                colorations.append(color_map["dead"])
-            # for all other cases, figure out color association
-            else:
-                # initialize boolean flags for each scenario
-                contains_asymp = False
-                contains_sympt = False
-                contains_healthy = False
-                # check all occupants in node for status
-                for agent in node[1]["occupants"]:
-                    # if at least one is asymptomatic, flip flag
-                    if agent.get_status()[0] == "asymptomatic":
-                        contains_asymp = True
-                    # if at least one is symptomatic, flip flag
-                    if agent.get_status()[0] == "symptomatic":
-                        contains_sympt = True
-                    # if at least one is health, flip flag
-                    if agent.get_status()[0] == "healthy":
-                        contains_healthy = True
-                # check in decreasing order of priority...
-                # 1. symptomatic
-                # 2. asymptomatic
-                # 3. healthy
-                if contains_sympt:
-                    colorations.append(color_map["symptomatic"])
-                elif contains_asymp:
-                    colorations.append(color_map["asymptomatic"])
-                elif contains_healthy:
-                    colorations.append(color_map["healthy"])
-                else:
-                    colorations.append(color_map["dead"])
+        # color by the highest-priority status present on the node, read from the per-node counters:
+        # 1. symptomatic
+        # 2. asymptomatic
+        # 3. healthy
+        # nodes that are empty or hold only dead agents get the 'blank' dead color
+        present = self.__cell_counts > 0
+        status = np.select([present[SYMPTOMATIC], present[ASYMPTOMATIC], present[HEALTHY]],
+                           [SYMPTOMATIC, ASYMPTOMATIC, HEALTHY], DEAD)
+        palette = [color_map[label] for label in STATUS_LABELS]
         # return coloration list
-        return colorations
+        return [palette[code] for code in status.tolist()]
 
     def __generate_labels(self):
         """__generate_labels - generate the node's labels
@@ -309,25 +561,11 @@ class Network:
         Outputs:
             - labels: list of labels for the nodes
         """
-        # get the iterator for node's labels
-        labels = nx.get_node_attributes(self.__lattice, "occupants")
-        # iterate over the nodes in the iterator
-        for node in labels:
-            # initialize num_infected; num_dead to 0
-            num_infected = 0; num_dead = 0
-            # iterate over the agents in the node
-            for agent in labels[node]:
-                # if agent is in any way infected, increment counter
-                if agent.get_status()[0] in ["asymptomatic", "symptomatic"]:
-                    num_infected += 1
-                # if agent is dead, increment counter
-                elif agent.get_status()[0] in ["dead"]:
-                    num_dead += 1
-            # update label depending on health status
-            if len(labels[node]) > 0:
-                labels[node] = f"{num_infected}|{len(labels[node]) - num_infected - num_dead}"
-            else:
-                labels[node] = ""
+        # infected|healthy counts of each node, read from the per-node counters (empty nodes get no label)
+        infected = (self.__cell_counts[ASYMPTOMATIC] + self.__cell_counts[SYMPTOMATIC]).tolist()
+        healthy = self.__cell_counts[HEALTHY].tolist()
+        occupied = self.__cell_counts.any(axis=0).tolist()
+        labels = {node: f"{infected[node]}|{healthy[node]}" if occupied[node] else "" for node in range(len(occupied))}
         # return list of labels
         return labels
 
@@ -338,16 +576,14 @@ class Network:
         Outputs:
             - None; displays as a window
         """
-        plt.clf()
-        plt.title(f"{self.__time_elapsed} / {self.__network_params['t']} - Number of Agents: {self.__num_agents}")
         # get list of colorations
         colorations = self.__generate_colorations(color_map)
         # get list of labels
         labels = self.__generate_labels()
         # generate the lattice drawing
-        nx.draw_spectral(self.__lattice, node_color=colorations, labels=labels)
-        # update the display for animation-purposes
-        plt.pause(0.05)
+        self.__display.draw_graph(self.get_lattice(),
+                                  f"{self.__time_elapsed} / {self.__network_params['t']} - Number of Agents: {self.__num_agents}",
+                                  colorations, labels)
 
     def __generate_statistical_display(self):
         """__generate_statistical_display - generates a graph stats over time
@@ -356,33 +592,210 @@ class Network:
         Outputs:
             - None; displays as a window
         """
-        plt.clf()
-        plt.title(f"λ={self.__agent_params['lambda']}; Density={self.__network_params['N']}; InfluxRate={self.__network_params['influx']}")
-        plt.plot([i for i in range(0, self.__network_params["t"])], self.__plot_points[0], label="total population")
-        plt.plot([i for i in range(0, self.__network_params["t"])], self.__plot_points[1], label="adults")
-        plt.plot([i for i in range(0, self.__network_params["t"])], self.__plot_points[2], label="elderly")
-        plt.plot([i for i in range(0, self.__network_params["t"])], self.__plot_points[3], label="youths")
-        plt.plot([i for i in range(0, self.__network_params["t"])], self.__plot_points[4], label="babies")
-        plt.xlabel("Timesteps")
-        plt.ylabel("Number of Agents")
-        plt.legend()
-        plt.show()
+        self.__display.draw_statistics(f"λ={self.__agent_params['lambda']}; Density={self.__network_params['N']}; InfluxRate={self.__network_params['influx']}",
+                                       self.__network_params["t"], self.__plot_points)
 
     # ----------------------------------------------------------#
     #                          Getters                          #
     # ----------------------------------------------------------#
 
     def get_lattice(self):
-        # returns the lattice structure
+        # returns a networkx graph of the topology (built on first use; nodes carry their live "occupants" lists)
+        if self.__lattice is None:
+            self.__lattice = self.__topology.to_networkx()
+            for node, occupants in enumerate(self.__occupants):
+                self.__lattice.nodes[node]["occupants"] = occupants
         return self.__lattice
+    def get_topology(self):
+        # returns the CSR contact topology
+        return self.__topology
     def get_elapsed_time(self):
         # returns how many time steps have passed
         return self.__time_elapsed
+    def get_num_agents(self):
+        # returns number of living agents
+        return self.__num_agents
+    def get_num_infected(self):
+        # returns number of currently infected agents
+        return len(self.__infected)
+    def get_stats(self):
+        # returns the per-age statistical counters
+        return self.__stats
+    def get_plot_points(self):
+        # returns the per-age series of active infections (key 0 is the total)
+        return self.__plot_points
+    def get_cell_state(self):
+        # returns 4 x L x L per-node counts of each status code (a copy of the running counters)
+        return self.__cell_counts.reshape(4, self.__network_params["L"], self.__network_params["L"]).copy()
+    def get_age_counts(self):
+        # returns 4 x 4 counts of living and dead agents per status code and age category (column age - 1)
+        return self.__age_counts.copy()
+    def get_phase_times(self):
+        # returns setup seconds and accumulated seconds per timestep phase (empty phases until enabled)
+        return { "setup": dict(self.__setup_times),
+                 "phases": {} if self.__profiler is None else self.__profiler.get_phase_seconds() }
+    def get_stop_reason(self):
+        # returns (criterion, timestep) when a stopping criterion ended the run early, else None
+        return self.__stop_reason
+    def get_profiler(self):
+        # returns the Profiler of the run (None when profiling is off)
+        return self.__profiler
 
     # ----------------------------------------------------------#
     #                     Class Methods                         #
     # ----------------------------------------------------------#
 
+    def enable_phase_timing(self):
+        """enable_phase_timing - starts timing each phase of every following timestep
+        Wall time is accumulated per phase (infection, death, movement, influx)
+        and read back with get_phase_times; the counters restart at zero. Uses
+        the --profile profiler when there is one, otherwise a silent one.
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__profiler is None:
+            self.__profiler = Profiler()
+        self.__profiler.reset()
+
+    def step(self):
+        """step - runs a single timestep and records its statistic plot-points
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        # stop early (holding the counters to t) once a stopping criterion is met
+        if self.__stopping is not None:
+            reason = self.__stopping.check(self.__stats)
+            if reason is not None:
+                self.__stop(reason)
+                return
+        # with no infectious agent left, fast-forward jumps to the next influx arrival (or to t)
+        if self.__stopping is not None and self.__stopping.quiescent(self.__stats):
+            if not self.__fast_forward():
+                return
+        else:
+            self.__timestep()
+        Agent.time_elapsed = self.__time_elapsed
+        if self.__debug:
+            self.__check_counters()
+        # update statistic plot-points: the active infections per age, read from the counters
+        active = (self.__age_counts[ASYMPTOMATIC] + self.__age_counts[SYMPTOMATIC]).tolist()
+        for key in self.__stats:
+            self.__plot_points[key].append(active[key - 1])
+        self.__plot_points[0].append(sum(active))
+        if self.__profiler is not None:
+            self.__profiler.end_step(self.__time_elapsed, self.__num_agents, self.__plot_points[0][-1])
+        # stream counters (and periodic snapshots) to the output sink
+        if self.__sink is not None:
+            self.__sink.write_step(self.__time_elapsed, self.__stats)
+            if self.__sink.wants_snapshot(self.__time_elapsed):
+                self.__sink.write_snapshot(self.__time_elapsed, self.get_cell_state())
+        # append a delta frame to the recording
+        if self.__recorder is not None and self.__recorder.wants_frame(self.__time_elapsed):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+
+    def save_checkpoint(self, path):
+        """save_checkpoint - writes the complete simulation state to a file
+        Stores every agent in node/occupant order, the occupied-node and infected
+        indexes (their order drives the random draws), all counters, the Agent id
+        counter and the state of every random stream, so a resumed run is
+        bit-identical to an uninterrupted one.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        nodes, ids, status, days, ages = [], [], [], [], []
+        for node, occupants in enumerate(self.__occupants):
+            for agent in occupants:
+                label, days_infected = agent.get_status(self.__time_elapsed)
+                nodes.append(node); ids.append(agent.get_id()); status.append(STATUS_LABELS.index(label))
+                days.append(days_infected); ages.append(agent.get_age())
+        arrays = { "node": np.array(nodes, dtype=np.int64),
+                   "id": np.array(ids, dtype=np.int64),
+                   "status": np.array(status, dtype=np.uint8),
+                   "days_infected": np.array(days, dtype=np.int32),
+                   "age": np.array(ages, dtype=np.uint8),
+                   "occupied_nodes": np.array(self.__occupied_nodes, dtype=np.int64),
+                   "infected_ids": np.array(list(self.__infected), dtype=np.int64),
+                   "plot_points": plot_points_to_array(self.__plot_points),
+                   **topology_to_arrays(self.__topology) }
+        meta = { "engine": "graph",
+                 "network_params": {key: value for key, value in self.__network_params.items() if key != "t"},
+                 "agent_params": {key: value for key, value in self.__agent_params.items() if key != "beta"},
+                 "time_elapsed": self.__time_elapsed,
+                 "num_agents": self.__num_agents,
+                 "stats": self.__stats,
+                 "agent_id": Agent.agent_id,
+                 "random_state": self.__streams.get_state() }
+        # make sure every streamed row up to this step is on disk too
+        if self.__sink is not None:
+            self.__sink.flush()
+        if self.__recorder is not None:
+            self.__recorder.flush()
+        write_checkpoint(path, arrays, meta)
+
+    def load_checkpoint(self, path):
+        """load_checkpoint - restores the simulation state written by save_checkpoint
+        Every parameter except t is taken from the checkpoint, so a run can be
+        resumed with a larger t to extend it.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays, meta = read_checkpoint(path, "graph")
+        for key in ("L", "topology"):
+            if meta["network_params"][key] != self.__network_params[key]:
+                raise ValueError(f"{path}: checkpoint has {key}={meta['network_params'][key]}, run has {key}={self.__network_params[key]}")
+        self.__network_params.update(meta["network_params"])
+        self.__topology = topology_from_arrays(arrays, self.__topology)
+        self.__lattice = None
+        self.__agent_params.update(meta["agent_params"])
+        self.__time_elapsed = meta["time_elapsed"]
+        Agent.time_elapsed = self.__time_elapsed
+        # rebuild the occupancy lists in their original order
+        for occupants in self.__occupants:
+            occupants.clear()
+        agents = {}
+        for node, agent_id, status, days, age in zip(arrays["node"].tolist(), arrays["id"].tolist(), arrays["status"].tolist(),
+                                                     arrays["days_infected"].tolist(), arrays["age"].tolist()):
+            infected_at = self.__time_elapsed - days if days >= 0 else -1
+            agents[agent_id] = Agent.restore(agent_id, node, STATUS_LABELS[status], infected_at, age)
+            self.__occupants[node].append(agents[agent_id])
+        # restore both indexes exactly as they were
+        self.__occupied_nodes = arrays["occupied_nodes"].tolist()
+        self.__occupied_position = {node: position for position, node in enumerate(self.__occupied_nodes)}
+        self.__infected = {agent_id: agents[agent_id] for agent_id in arrays["infected_ids"].tolist()}
+        # reschedule the pending transitions of every infected agent
+        self.__timers = self.__new_timer_wheel()
+        for agent in self.__infected.values():
+            self.__schedule_transitions(agent)
+        # restore counters and random state; the running counters are rebuilt from the agents
+        self.__cell_counts, self.__cell_ages, self.__age_counts = self.__recount()
+        self.__plot_points = plot_points_from_array(arrays["plot_points"])
+        self.__num_agents = meta["num_agents"]
+        self.__stats = stats_from_json(meta["stats"])
+        Agent.agent_id = meta["agent_id"]
+        self.__streams.set_state(meta["random_state"])
+
+    def close(self):
+        """close - releases resources held by the run (flushes the output sink and recording, stops the profiler)
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__sink is not None:
+            self.__sink.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+        if self.__profiler is not None:
+            self.__profiler.close()
+
     def run_simulation(self):
         """run_simulation - runs t timesteps of simulation
         Inputs:
@@ -391,13 +804,22 @@ class Network:
             - None
         """
         while self.__time_elapsed < self.__network_params["t"]:
-            self.__timestep()
-            self.__update_display()
-            # update statistic plot-points
-            for key in self.__stats:
-                self.__plot_points[key].append(self.__stats[key]["infected"] - self.__stats[key]["dead"])
-            self.__plot_points[0].append(sum([self.__stats[key]["infected"] - self.__stats[key]["dead"] for key in self.__stats]))
-        plt.show()
+            previous = self.__time_elapsed
+            self.step()
+            # draw only every render_every steps; never when headless
+            if self.__display is not None and self.__display.should_render(self.__time_elapsed, self.__network_params["t"]):
+                self.__run_phase("render", self.__update_display)
+            # periodically save a checkpoint to resume from (a fast-forward may jump past the multiple itself)
+            if self.__stop_reason is None and self.__checkpoint["every"] > 0 and self.__time_elapsed // self.__checkpoint["every"] > previous // self.__checkpoint["every"]:
+                self.save_checkpoint(self.__checkpoint["path"])
+        self.close()
+        # headless runs report the final counters instead of opening windows
+        if self.__display is None:
+            print(f"t={self.__time_elapsed} agents={self.__num_agents} stats={self.__stats}")
+            if self.__stop_reason is not None:
+                print(f"stopped early at t={self.__stop_reason[1]} ({self.__stop_reason[0]}); counters held until t={self.__time_elapsed}")
+            return
+        self.__display.show()
         # display statistical graphs
         self.__generate_statistical_display()
         
\ No newline at end of file
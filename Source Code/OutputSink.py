@@ -0,0 +1,204 @@
+import abc
+import glob
+import importlib.util
+import os
+import numpy as np
+
+# per-age counters streamed every timestep, in column order
+STAT_KEYS = ["total", "alive", "dead", "infected"]
+COLUMNS = ["time"] + [f"age{age}_{key}" for age in range(1, 5) for key in STAT_KEYS]
+
+def has_pyarrow():
+    # checks if pyarrow is installed without importing it (without it statistics are written as chunked .npz files)
+    return importlib.util.find_spec("pyarrow") is not None
+
+def import_pyarrow():
+    # imports pyarrow and its parquet module on first use, so runs that never touch Parquet do not pay for them
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("--output_format=parquet requires pyarrow")
+    return pyarrow
+
+class OutputSink(abc.ABC):
+    """OutputSink class
+    Streams per-timestep statistics to disk in fixed-size chunks, and
+    optionally full-lattice snapshots every K steps. Only one chunk of rows is
+    ever held in memory, so memory stays bounded however long the run is.
+    Abstract: subclasses implement _write_chunk to decide how a chunk of rows
+    is written, and never overwrite earlier chunks of a resumed run.
+    """
+    def __init__(self, path, chunk_size=100, snapshot_every=0):
+        """__init__ - OutputSink Initialization function
+        Inputs:
+            - path: output directory (created if needed)
+            - (Optional) chunk_size: number of timesteps buffered before a write
+            - (Optional) snapshot_every: write a lattice snapshot every K steps (0 = never)
+        Outputs:
+            - None; returns OutputSink object
+        """
+        self.__path = path
+        self.__chunk_size = chunk_size
+        self.__snapshot_every = snapshot_every
+        # pre-allocated buffer for one chunk of rows
+        self.__rows = np.zeros((chunk_size, len(COLUMNS)), dtype=np.int64)
+        self.__num_rows = 0
+        os.makedirs(path, exist_ok=True)
+        if snapshot_every > 0:
+            os.makedirs(os.path.join(path, "snapshots"), exist_ok=True)
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    @abc.abstractmethod
+    def _write_chunk(self, columns):
+        """_write_chunk - persists one chunk of rows (implemented by subclasses)
+        Inputs:
+            - columns: dictionary of column name -> int64 array
+        Outputs:
+            - None
+        """
+
+    def flush(self):
+        # writes the buffered rows, if any
+        if self.__num_rows == 0:
+            return
+        self._write_chunk({name: self.__rows[:self.__num_rows, i].copy() for i, name in enumerate(COLUMNS)})
+        self.__num_rows = 0
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_path(self):
+        # returns the output directory
+        return self.__path
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def wants_snapshot(self, time_elapsed):
+        # checks if a lattice snapshot should be written at this timestep
+        return self.__snapshot_every > 0 and time_elapsed % self.__snapshot_every == 0
+
+    def write_step(self, time_elapsed, stats):
+        """write_step - records the counters of one timestep
+        Inputs:
+            - time_elapsed: timestep the counters belong to
+            - stats: per-age statistical counters of the network
+        Outputs:
+            - None
+        """
+        row = self.__rows[self.__num_rows]
+        row[0] = time_elapsed
+        row[1:] = [stats[age][key] for age in range(1, 5) for key in STAT_KEYS]
+        self.__num_rows += 1
+        if self.__num_rows == self.__chunk_size:
+            self.flush()
+
+    def write_snapshot(self, time_elapsed, cell_state):
+        """write_snapshot - writes the full lattice state of one timestep
+        Inputs:
+            - time_elapsed: timestep of the snapshot
+            - cell_state: 4 x L x L per-cell counts of each status code
+        Outputs:
+            - None
+        """
+        np.savez_compressed(os.path.join(self.__path, "snapshots", f"snapshot_{time_elapsed:08d}.npz"),
+                            time=time_elapsed, cell_state=cell_state)
+
+    def close(self):
+        # writes any remaining rows
+        self.flush()
+
+class NpzSink(OutputSink):
+    """NpzSink class
+    Writes each chunk as its own stats_XXXXXX.npz file, so a crashed run
+    keeps every chunk completed before the crash.
+    """
+    def __init__(self, path, chunk_size=100, snapshot_every=0, resume=False):
+        super().__init__(path, chunk_size, snapshot_every)
+        existing = sorted(glob.glob(os.path.join(path, "stats_*.npz")))
+        # a resumed run continues numbering after its earlier chunks; a new run replaces them
+        if not resume:
+            for chunk in existing:
+                os.remove(chunk)
+            existing = []
+        self.__num_chunks = len(existing)
+
+    def _write_chunk(self, columns):
+        # write to a temporary name and rename, so a chunk file is never partial
+        target = os.path.join(self.get_path(), f"stats_{self.__num_chunks:06d}.npz")
+        with open(target + ".tmp", "wb") as f:
+            np.savez(f, **columns)
+        os.replace(target + ".tmp", target)
+        self.__num_chunks += 1
+
+class ParquetSink(OutputSink):
+    """ParquetSink class
+    Writes each chunk as its own complete stats_XXXXXX.parquet file (footer
+    included), so a crashed run keeps every chunk completed before the crash.
+    """
+    def __init__(self, path, chunk_size=100, snapshot_every=0, resume=False):
+        super().__init__(path, chunk_size, snapshot_every)
+        self.__pyarrow = import_pyarrow()
+        existing = sorted(glob.glob(os.path.join(path, "stats_*.parquet")))
+        # a resumed run continues numbering after its earlier chunks; a new run replaces them
+        if not resume:
+            for chunk in existing:
+                os.remove(chunk)
+            existing = []
+        self.__num_chunks = len(existing)
+
+    def _write_chunk(self, columns):
+        # write to a temporary name and rename, so a chunk file is never partial
+        target = os.path.join(self.get_path(), f"stats_{self.__num_chunks:06d}.parquet")
+        self.__pyarrow.parquet.write_table(self.__pyarrow.table(columns), target + ".tmp")
+        os.replace(target + ".tmp", target)
+        self.__num_chunks += 1
+
+def make_sink(args):
+    """make_sink - builds the output sink requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses output, output_format,
+          output_chunk, snapshot_every and resume)
+    Outputs:
+        - OutputSink, or None when no output directory was given
+    """
+    path = getattr(args, "output", None)
+    if path is None:
+        return None
+    output_format = getattr(args, "output_format", "auto")
+    if output_format == "auto":
+        output_format = "parquet" if has_pyarrow() else "npz"
+    sink_class = ParquetSink if output_format == "parquet" else NpzSink
+    return sink_class(path, getattr(args, "output_chunk", 100), getattr(args, "snapshot_every", 0),
+                      resume=bool(getattr(args, "resume", None)))
+
+def load_stats(path):
+    """load_stats - reads the statistics streamed by a sink back into memory
+    Rows are read in write order. A run resumed from a checkpoint re-writes
+    the timesteps after that checkpoint, so for repeated timesteps only the
+    latest row is kept.
+    Inputs:
+        - path: output directory of a run
+    Outputs:
+        - columns: dictionary of column name -> int64 array over all timesteps
+    """
+    parts = sorted(glob.glob(os.path.join(path, "stats_*.parquet")))
+    if parts:
+        pyarrow = import_pyarrow()
+        tables = [pyarrow.parquet.read_table(chunk) for chunk in parts]
+        chunks = [{name: table[name].to_numpy() for name in COLUMNS} for table in tables]
+    else:
+        chunks = [np.load(chunk) for chunk in sorted(glob.glob(os.path.join(path, "stats_*.npz")))]
+    if not chunks:
+        return {name: np.zeros(0, dtype=np.int64) for name in COLUMNS}
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS}
+    # keep the last occurrence of every timestep
+    _, last = np.unique(columns["time"][::-1], return_index=True)
+    keep = len(columns["time"]) - 1 - last
+    return {name: column[keep] for name, column in columns.items()}
@@ -0,0 +1,172 @@
+import http.server
+import threading
+import time
+
+# phases of a timestep, in the order the engines run them
+PHASES = ["infection", "death", "movement", "influx"]
+
+class Profiler:
+    """Profiler class
+    Instrumentation of the timestep loop. Engines report the wall time of
+    every phase (plus rendering) and the number of agents the phase updated
+    (newly infected, transitioned, moved or added); the profiler keeps running
+    totals and the step rate. They can be printed as a periodic metrics line
+    and served as Prometheus text exposition from a local HTTP endpoint.
+    """
+    def __init__(self, report_every=0, port=None):
+        """__init__ - Profiler Initialization function
+        Inputs:
+            - (Optional) report_every: print a metrics line every K steps (0 = never)
+            - (Optional) port: serve /metrics on 127.0.0.1:port (None = no endpoint, 0 = any free port)
+        Outputs:
+            - None; returns Profiler object
+        """
+        self.__report_every = report_every
+        self.reset()
+        # current values of the run (timestep, living agents, active infections)
+        self.__gauges = { "time_elapsed": 0, "agents": 0, "infected": 0 }
+        self.__server = None
+        if port is not None:
+            self.__server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _metrics_handler(self))
+            self.__server.daemon_threads = True
+            threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+            print(f"serving metrics on http://127.0.0.1:{self.get_port()}/metrics")
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_phase_seconds(self):
+        # returns accumulated wall time per phase
+        return dict(self.__seconds)
+    def get_phase_touched(self):
+        # returns accumulated number of agents updated per phase
+        return dict(self.__touched)
+    def get_steps(self):
+        # returns the number of steps recorded since the last reset
+        return self.__steps
+    def get_step_rate(self):
+        # returns the mean steps per second since the last reset
+        elapsed = time.perf_counter() - self.__start
+        return self.__steps / elapsed if elapsed > 0 else 0.0
+    def get_port(self):
+        # returns the port of the metrics endpoint (None when not serving)
+        return None if self.__server is None else self.__server.server_address[1]
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def reset(self):
+        # restarts every counter at zero
+        self.__seconds = dict.fromkeys(PHASES, 0.0)
+        self.__touched = dict.fromkeys(PHASES, 0)
+        self.__steps = 0
+        self.__start = time.perf_counter()
+        # time and step count of the last metrics line, for the recent step rate
+        self.__last_report = (self.__start, 0)
+
+    def record(self, phase, seconds, touched=None):
+        """record - adds one run of a phase to the totals
+        Inputs:
+            - phase: phase name
+            - seconds: wall time the phase took
+            - (Optional) touched: number of agents the phase updated (None = 0)
+        Outputs:
+            - None
+        """
+        self.__seconds[phase] = self.__seconds.get(phase, 0.0) + seconds
+        self.__touched[phase] = self.__touched.get(phase, 0) + (touched or 0)
+
+    def end_step(self, time_elapsed, num_agents, num_infected):
+        """end_step - marks the end of a timestep, printing a metrics line when due
+        Inputs:
+            - time_elapsed: timestep just completed
+            - num_agents: number of living agents
+            - num_infected: number of active infections
+        Outputs:
+            - None
+        """
+        self.__steps += 1
+        self.__gauges = { "time_elapsed": time_elapsed, "agents": num_agents, "infected": num_infected }
+        if self.__report_every > 0 and self.__steps % self.__report_every == 0:
+            print(self.metrics_line(), flush=True)
+
+    def metrics_line(self):
+        """metrics_line - one-line summary of the run since the last metrics line
+        Inputs:
+            - None
+        Outputs:
+            - string: timestep, recent and mean step rate, gauges and per-phase ms/step (agents updated)
+        """
+        now = time.perf_counter()
+        last_time, last_steps = self.__last_report
+        recent = (self.__steps - last_steps) / (now - last_time) if now > last_time else 0.0
+        self.__last_report = (now, self.__steps)
+        steps = max(self.__steps, 1)
+        phases = " ".join(f"{phase}={seconds * 1000 / steps:.3f}ms({self.__touched[phase]})"
+                          for phase, seconds in self.__seconds.items())
+        return (f"[profile] t={self.__gauges['time_elapsed']} steps/s={recent:.1f} (mean {self.get_step_rate():.1f}) "
+                f"agents={self.__gauges['agents']} infected={self.__gauges['infected']} {phases}")
+
+    def prometheus_text(self):
+        """prometheus_text - the counters in Prometheus text exposition format
+        Inputs:
+            - None
+        Outputs:
+            - string
+        """
+        seconds, touched = self.get_phase_seconds(), self.get_phase_touched()
+        lines = ["# HELP epidemic_phase_seconds_total Wall time spent in each phase of the timestep loop.",
+                 "# TYPE epidemic_phase_seconds_total counter"]
+        lines += [f'epidemic_phase_seconds_total{{phase="{phase}"}} {value:.6f}' for phase, value in seconds.items()]
+        lines += ["# HELP epidemic_phase_agents_total Agents updated by each phase.",
+                  "# TYPE epidemic_phase_agents_total counter"]
+        lines += [f'epidemic_phase_agents_total{{phase="{phase}"}} {value}' for phase, value in touched.items()]
+        lines += ["# HELP epidemic_steps_total Timesteps completed.",
+                  "# TYPE epidemic_steps_total counter",
+                  f"epidemic_steps_total {self.__steps}",
+                  "# HELP epidemic_step_rate Mean timesteps per second.",
+                  "# TYPE epidemic_step_rate gauge",
+                  f"epidemic_step_rate {self.get_step_rate():.3f}"]
+        for name, value in self.__gauges.items():
+            lines += [f"# TYPE epidemic_{name} gauge", f"epidemic_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        # prints the final metrics line (when reporting) and stops the endpoint
+        if self.__report_every > 0 and self.__steps % self.__report_every != 0:
+            print(self.metrics_line(), flush=True)
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+def _metrics_handler(profiler):
+    # request handler class serving the profiler's counters at /metrics
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = profiler.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, format, *args):
+            # keep scrapes out of the run's output
+            pass
+    return MetricsHandler
+
+def make_profiler(args):
+    """make_profiler - builds the profiler requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses profile, profile_every and metrics_port)
+    Outputs:
+        - Profiler, or None when profiling is off
+    """
+    if not getattr(args, "profile", False):
+        return None
+    return Profiler(getattr(args, "profile_every", 100), getattr(args, "metrics_port", None))
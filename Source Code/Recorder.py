@@ -0,0 +1,235 @@
+import json
+import os
+import numpy as np
+from Storage import allocate, block_ranges, block_rows
+
+# raw append-only files of a recording, and the dtype of one row of each
+RECORDING_FILES = { "frames": ("frames.bin", np.int64, 4), # time, first row in cells/counts, number of rows, keyframe flag
+                    "cells": ("cells.bin", np.int32, 1), # index i * L + j of every changed cell
+                    "counts": ("counts.bin", np.uint16, 4) } # its healthy/asymptomatic/symptomatic/dead counts
+
+class Recorder:
+    """Recorder class
+    Records the per-cell status counts of a run (the 4 x L x L cell state the
+    display colors and labels are computed from) as delta frames: each frame
+    stores only the cells whose counts changed since the previous frame, and
+    every keyframe_every frames a keyframe stores every occupied cell so a
+    replay can start anywhere. Frames go to raw append-only files that
+    Recording memory-maps, so neither side holds more than one frame in memory;
+    with a working directory the previous frame is memory-mapped too and frames
+    are compared a block of cells at a time, so not even one is.
+    """
+    def __init__(self, path, L, every=1, keyframe_every=100, resume_time=None, workdir=None, block=None):
+        """__init__ - Recorder Initialization function
+        Inputs:
+            - path: recording directory (created if needed)
+            - L: lattice L/W dimension
+            - (Optional) every: record a frame every K timesteps
+            - (Optional) keyframe_every: store a full frame every K frames
+            - (Optional) resume_time: timestep a resumed run restarts from; frames
+              recorded after it are dropped (None = start a new recording)
+            - (Optional) workdir: working directory to memory-map the previous frame in (None = in memory)
+            - (Optional) block: cells compared at a time (None = every cell at once)
+        Outputs:
+            - None; returns Recorder object
+        """
+        self.__path = path
+        self.__L = L
+        self.__every = every
+        self.__keyframe_every = keyframe_every
+        os.makedirs(path, exist_ok=True)
+        # frames and rows already in the files
+        self.__num_frames = 0
+        self.__num_rows = 0
+        if resume_time is not None and os.path.exists(os.path.join(path, "meta.json")):
+            self.__truncate(resume_time)
+        else:
+            for name, _, _ in RECORDING_FILES.values():
+                open(os.path.join(path, name), "wb").close()
+        self.__files = {key: open(os.path.join(path, name), "ab") for key, (name, _, _) in RECORDING_FILES.items()}
+        # counts of the last recorded frame (none yet: the next frame is a keyframe)
+        self.__previous = allocate(workdir, "recorder_previous", (4, L * L), np.uint16)
+        self.__has_previous = False
+        self.__block = L * L if block is None else block
+        self.__since_keyframe = 0
+        self.__write_meta()
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __truncate(self, resume_time):
+        """__truncate - drops the frames recorded after a checkpoint's timestep
+        Inputs:
+            - resume_time: last timestep to keep
+        Outputs:
+            - None
+        """
+        recording = Recording(self.__path)
+        if recording.get_L() != self.__L:
+            raise ValueError(f"{self.__path}: recording has L={recording.get_L()}, run has L={self.__L}")
+        frames = recording.get_frames()
+        keep = int(np.searchsorted(frames[:, 0], resume_time, side="right"))
+        self.__num_frames = keep
+        self.__num_rows = int(frames[keep - 1, 1] + frames[keep - 1, 2]) if keep > 0 else 0
+        del recording, frames
+        for key, (name, dtype, width) in RECORDING_FILES.items():
+            rows = self.__num_frames if key == "frames" else self.__num_rows
+            with open(os.path.join(self.__path, name), "r+b") as f:
+                f.truncate(rows * width * np.dtype(dtype).itemsize)
+
+    def __write_meta(self):
+        # writes the recording header (rewritten as frames are added)
+        with open(os.path.join(self.__path, "meta.json"), "w") as f:
+            json.dump({ "L": self.__L, "every": self.__every, "keyframe_every": self.__keyframe_every,
+                        "num_frames": self.__num_frames, "num_rows": self.__num_rows }, f)
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def wants_frame(self, time_elapsed):
+        # checks if a frame should be recorded at this timestep
+        return time_elapsed % self.__every == 0
+
+    def record(self, time_elapsed, cell_state):
+        """record - appends the frame of a timestep
+        Inputs:
+            - time_elapsed: timestep of the frame
+            - cell_state: 4 x L x L per-cell counts of each status code
+        Outputs:
+            - None
+        """
+        counts = np.asarray(cell_state).reshape(4, -1)
+        if counts.max(initial=0) > np.iinfo(np.uint16).max:
+            raise OverflowError(f"a cell holds more than {np.iinfo(np.uint16).max} agents; the recording stores uint16 counts")
+        keyframe = not self.__has_previous or self.__since_keyframe >= self.__keyframe_every
+        if keyframe:
+            self.__since_keyframe = 0
+        self.__since_keyframe += 1
+        num_changed = 0
+        for start, stop in block_ranges(counts.shape[1], self.__block):
+            block = np.asarray(counts[:, start:stop], dtype=np.uint16)
+            previous = self.__previous[:, start:stop]
+            # keyframes store every occupied cell, other frames only the cells that changed
+            if keyframe:
+                changed = np.flatnonzero(block.any(axis=0))
+            else:
+                changed = np.flatnonzero((block != previous).any(axis=0))
+            self.__files["cells"].write((changed + start).astype(np.int32).tobytes())
+            self.__files["counts"].write(np.ascontiguousarray(block[:, changed].T).tobytes())
+            previous[:] = block
+            num_changed += len(changed)
+        self.__files["frames"].write(np.array([time_elapsed, self.__num_rows, num_changed, keyframe], dtype=np.int64).tobytes())
+        self.__num_rows += num_changed
+        self.__num_frames += 1
+        self.__has_previous = True
+
+    def flush(self):
+        # pushes every recorded frame to disk and updates the header
+        for f in self.__files.values():
+            f.flush()
+        self.__write_meta()
+
+    def close(self):
+        # flushes and closes the recording files
+        self.flush()
+        for f in self.__files.values():
+            f.close()
+
+class Recording:
+    """Recording class
+    Memory-mapped reader of a directory written by Recorder. Frames are
+    rebuilt from the nearest keyframe, and reading frames in order applies
+    each delta once.
+    """
+    def __init__(self, path):
+        """__init__ - Recording Initialization function
+        Inputs:
+            - path: recording directory
+        Outputs:
+            - None; returns Recording object
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            self.__meta = json.load(f)
+        self.__arrays = {}
+        for key, (name, dtype, width) in RECORDING_FILES.items():
+            rows = self.__meta["num_frames"] if key == "frames" else self.__meta["num_rows"]
+            # np.memmap cannot map an empty file
+            if rows == 0:
+                self.__arrays[key] = np.zeros((0, width), dtype=dtype)
+            else:
+                self.__arrays[key] = np.memmap(os.path.join(path, name), dtype=dtype, mode="r", shape=(rows, width))
+        self.__cells = self.__arrays["cells"].reshape(-1)
+
+    def __len__(self):
+        # number of frames
+        return self.__meta["num_frames"]
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_L(self):
+        # returns the lattice L/W dimension
+        return self.__meta["L"]
+    def get_frames(self):
+        # returns the frame table: one (time, first row, number of rows, keyframe) row per frame
+        return self.__arrays["frames"]
+    def get_times(self):
+        # returns the timestep of every frame
+        return self.__arrays["frames"][:, 0]
+    def nbytes(self):
+        # returns the size of the recording files
+        return sum(array.nbytes for array in self.__arrays.values())
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def iter_frames(self, start=0, stop=None, stride=1):
+        """iter_frames - yields frames in order, applying each delta once
+        Inputs:
+            - (Optional) start: first frame index
+            - (Optional) stop: frame index to stop before (None = the last frame)
+            - (Optional) stride: yield every stride-th frame
+        Outputs:
+            - generator of (time, cell_state), cell_state a 4 x L x L uint16 array
+              (a view that the next frame overwrites; copy it to keep it)
+        """
+        L = self.get_L()
+        frames = self.__arrays["frames"]
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        # rebuild from the last keyframe at or before start
+        first = int(np.flatnonzero(frames[:start + 1, 3])[-1])
+        state = np.zeros((L * L, 4), dtype=np.uint16)
+        for index in range(first, stop):
+            time_elapsed, offset, length, keyframe = (int(value) for value in frames[index])
+            if keyframe:
+                state[:] = 0
+            state[self.__cells[offset:offset + length]] = self.__arrays["counts"][offset:offset + length]
+            if index >= start and (index - start) % stride == 0:
+                yield time_elapsed, state.T.reshape(4, L, L)
+
+    def frame(self, index):
+        # returns (time, cell_state) of a single frame
+        for time_elapsed, cell_state in self.iter_frames(index, index + 1):
+            return time_elapsed, cell_state.copy()
+        raise IndexError(f"frame {index} out of range (recording has {len(self)} frames)")
+
+def make_recorder(args, resume_time=None):
+    """make_recorder - builds the recorder requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses record, L, record_every, keyframe_every,
+          workdir and block_rows)
+        - (Optional) resume_time: timestep a resumed run restarts from
+    Outputs:
+        - Recorder, or None when no recording directory was given
+    """
+    path = getattr(args, "record", None)
+    if path is None:
+        return None
+    return Recorder(path, args.L, getattr(args, "record_every", 1), getattr(args, "keyframe_every", 100), resume_time,
+                    getattr(args, "workdir", None), block_rows(args) * args.L)
@@ -0,0 +1,261 @@
+import numpy as np
+
+# simulation phases that draw random numbers; each gets an independent stream
+PHASES = ["infection", "movement", "influx", "placement", "topology", "interventions"]
+# spawn key of the child sequence worker streams are spawned from; fixed and clear of the phase children,
+# so appending a phase to PHASES never changes the streams handed to workers
+WORKER_KEY = 2**31
+
+class UniformStream:
+    """UniformStream class
+    Hands out uniform floats in [0, 1) from pre-generated blocks, so hot loops
+    pay an array lookup per draw instead of a generator call. Every double
+    consumes exactly one output of the PCG64 generator and bulk requests that
+    the block cannot satisfy are drawn straight from the generator, so the
+    sequence of values is the same whatever the block size.
+    """
+    def __init__(self, seed_sequence, block_size=4096):
+        """__init__ - UniformStream Initialization function
+        Inputs:
+            - seed_sequence: numpy SeedSequence for this stream
+            - (Optional) block_size: number of floats generated per refill
+        Outputs:
+            - None; returns UniformStream object
+        """
+        self.__generator = np.random.Generator(np.random.PCG64(seed_sequence))
+        self.__block_size = block_size
+        # current block, read position, and generator state the block was drawn from
+        self.__block = np.empty(0)
+        self.__position = 0
+        self.__block_state = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __refill(self):
+        # draws the next block of uniforms
+        self.__block_state = self.__generator.bit_generator.state
+        self.__block = self.__generator.random(self.__block_size)
+        self.__position = 0
+
+    def __release(self):
+        # drops the rest of the block, leaving the generator right after the last float handed out
+        if self.__position < len(self.__block):
+            self.__generator.bit_generator.state = self.__block_state
+            self.__generator.bit_generator.advance(self.__position)
+        self.__block = np.empty(0)
+        self.__position = 0
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_generator(self):
+        # the underlying Generator; only for one-off non-uniform draws made before any buffered draw
+        return self.__generator
+
+    def get_state(self):
+        """get_state - JSON-serializable state of the stream
+        Stores the generator state at the start of the current block plus the
+        read position, rather than the block itself.
+        Inputs:
+            - None
+        Outputs:
+            - state: dictionary
+        """
+        if self.__position < len(self.__block):
+            return { "bit_generator": self.__block_state, "block_length": len(self.__block), "position": self.__position }
+        return { "bit_generator": self.__generator.bit_generator.state, "block_length": 0, "position": 0 }
+
+    # ----------------------------------------------------------#
+    #                         Setters                           #
+    # ----------------------------------------------------------#
+
+    def set_state(self, state):
+        """set_state - restores a state returned by get_state
+        Inputs:
+            - state: dictionary
+        Outputs:
+            - None
+        """
+        self.__generator.bit_generator.state = state["bit_generator"]
+        self.__block = np.empty(0)
+        self.__position = 0
+        if state["block_length"] > 0:
+            # regenerate the block and skip what was already handed out
+            self.__block_state = state["bit_generator"]
+            self.__block = self.__generator.random(state["block_length"])
+            self.__position = state["position"]
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def next(self):
+        # returns the next uniform float in [0, 1)
+        if self.__position == len(self.__block):
+            self.__refill()
+        value = self.__block[self.__position]
+        self.__position += 1
+        return float(value)
+
+    def take(self, count):
+        """take - returns the next count uniform floats as an array
+        Inputs:
+            - count: number of floats
+        Outputs:
+            - float64 array of length count
+        """
+        available = len(self.__block) - self.__position
+        if count <= available:
+            values = self.__block[self.__position:self.__position + count].copy()
+            self.__position += count
+            return values
+        # use up the block, then draw the remainder directly
+        values = np.concatenate([self.__block[self.__position:], self.__generator.random(count - available)])
+        self.__block = np.empty(0)
+        self.__position = 0
+        return values
+
+    def integers(self, high, size=None):
+        """integers - uniform integers in [0, high)
+        Inputs:
+            - high: exclusive upper bound
+            - (Optional) size: number of integers (None = a single int)
+        Outputs:
+            - int, or int64 array of length size
+        """
+        if size is None:
+            return int(self.next() * high)
+        return (self.take(size) * high).astype(np.int64)
+
+    def binomial(self, n, p):
+        """binomial - binomial draws, one per element of n and p
+        Drawn from the generator itself, positioned right after the last float
+        handed out, so the values do not depend on the block size and get_state
+        stays exact.
+        Inputs:
+            - n: integer array of trial counts
+            - p: array of success probabilities
+        Outputs:
+            - int64 array of successes
+        """
+        self.__release()
+        return self.__generator.binomial(n, p)
+
+    def split(self, counts):
+        """split - reserves the next sum(counts) floats as consecutive slices
+        Each slice can be drawn on its own (e.g. by a different thread) and
+        slice i holds exactly the floats that sequential take(counts[i]) calls
+        would have returned, so the values do not depend on how the slices are
+        scheduled. The stream continues after the last reserved float.
+        Inputs:
+            - counts: number of floats in each slice
+        Outputs:
+            - list of StreamSlice, one per count
+        """
+        self.__release()
+        state = self.__generator.bit_generator.state
+        offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        self.__generator.bit_generator.advance(int(offsets[-1]))
+        return [StreamSlice(state, int(offset), int(count)) for offset, count in zip(offsets[:-1], counts)]
+
+    def sample(self, population, k):
+        """sample - k distinct integers from [0, population) (Floyd's algorithm)
+        Costs O(k) draws and memory, independent of the population size.
+        Inputs:
+            - population: size of the range to sample from
+            - k: number of distinct values
+        Outputs:
+            - int64 array of length k
+        """
+        chosen = {}
+        for j in range(population - k, population):
+            value = int(self.next() * (j + 1))
+            chosen[j if value in chosen else value] = True
+        return np.fromiter(chosen, dtype=np.int64, count=k)
+
+class StreamSlice:
+    """StreamSlice class
+    A reserved run of floats from a UniformStream (see UniformStream.split),
+    drawn from a private copy of the generator.
+    """
+    def __init__(self, state, offset, count):
+        """__init__ - StreamSlice Initialization function
+        Inputs:
+            - state: PCG64 state at the start of the reserved floats
+            - offset: position of this slice's first float after that state
+            - count: number of floats in the slice
+        Outputs:
+            - None; returns StreamSlice object
+        """
+        self.__state = state
+        self.__offset = offset
+        self.__count = count
+
+    def __len__(self):
+        # number of floats in the slice
+        return self.__count
+
+    def draw(self):
+        # returns the slice's floats as an array
+        bit_generator = np.random.PCG64()
+        bit_generator.state = self.__state
+        bit_generator.advance(self.__offset)
+        return np.random.Generator(bit_generator).random(self.__count)
+
+class RandomStreams:
+    """RandomStreams class
+    One independent UniformStream per simulation phase, all derived from a
+    single seed, so changing how one phase draws numbers does not perturb
+    the others.
+    """
+    def __init__(self, seed=None, block_size=4096):
+        """__init__ - RandomStreams Initialization function
+        Inputs:
+            - (Optional) seed: integer seed, SeedSequence, or None for fresh OS entropy
+            - (Optional) block_size: floats generated per refill of each stream
+        Outputs:
+            - None; returns RandomStreams object
+        """
+        self.__seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.__block_size = block_size
+        self.__streams = {phase: UniformStream(child, block_size)
+                          for phase, child in zip(PHASES, self.__seed_sequence.spawn(len(PHASES)))}
+        # parent of the worker streams (see spawn)
+        self.__worker_sequence = np.random.SeedSequence(self.__seed_sequence.entropy,
+                                                        spawn_key=self.__seed_sequence.spawn_key + (WORKER_KEY,),
+                                                        pool_size=self.__seed_sequence.pool_size)
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get(self, phase):
+        # returns the stream of a phase
+        return self.__streams[phase]
+    def get_seed(self):
+        # returns the root entropy (pass it as --seed to reproduce an unseeded run)
+        return self.__seed_sequence.entropy
+    def get_state(self):
+        # JSON-serializable state of every stream
+        return {phase: stream.get_state() for phase, stream in self.__streams.items()}
+
+    # ----------------------------------------------------------#
+    #                         Setters                           #
+    # ----------------------------------------------------------#
+
+    def set_state(self, state):
+        # restores a state returned by get_state (streams added since it was saved keep their seeded state)
+        for phase, stream in self.__streams.items():
+            if phase in state:
+                stream.set_state(state[phase])
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def spawn(self, count):
+        # returns count further independent RandomStreams (e.g. one per worker), drawn from the dedicated worker sequence
+        return [RandomStreams(child, self.__block_size) for child in self.__worker_sequence.spawn(count)]
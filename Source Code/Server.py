@@ -0,0 +1,406 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+from main import build_parser, default_args, load_engine
+
+# engines a run may use, imported by each worker on first use (the sharded engine runs its own worker processes)
+ENGINES = ["graph", "vector", "compartment"]
+# main.py arguments a run request may not set: the server runs headless and keeps runs off the shared disk
+SERVER_ARGUMENTS = ["headless", "render_every", "output", "output_format", "output_chunk", "snapshot_every",
+                    "record", "record_every", "keyframe_every", "checkpoint", "checkpoint_every", "resume",
+                    "profile", "profile_every", "metrics_port", "workdir", "shards", "debug", "estimate_memory"]
+# HTTP status code -> reason phrase of every response the server sends
+REASONS = { 200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable" }
+
+def run_params(request):
+    """run_params - validates a run request against the main.py arguments
+    Values are parsed exactly as on the command line, so "--lam=0.2" and
+    {"lam": 0.2} describe the same run; flags such as fast_forward take true
+    or false. A request without a seed gets a fresh one, which is reported
+    back so the run can be repeated.
+    Inputs:
+        - request: dictionary of main.py arguments (engine, L, N, t, lam, seed, ...)
+    Outputs:
+        - params: dictionary of every run argument, defaults filled in
+    """
+    if not isinstance(request, dict):
+        raise ValueError("a run request is a JSON object of main.py arguments")
+    defaults = vars(default_args())
+    unknown = sorted(key for key in request if key not in defaults or key in SERVER_ARGUMENTS)
+    if unknown:
+        raise ValueError(f"unsupported arguments: {', '.join(unknown)}")
+    parser = build_parser()
+    parser.exit_on_error = False
+    # flags are given bare when true and left out when false
+    argv = [f"--{key}" if value is True else f"--{key}={value}"
+            for key, value in request.items() if value is not None and value is not False]
+    try:
+        args = parser.parse_args(argv)
+    except argparse.ArgumentError as error:
+        raise ValueError(str(error))
+    if args.engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    if args.seed is None:
+        args.seed = secrets.randbits(32)
+    return {key: value for key, value in vars(args).items() if key not in SERVER_ARGUMENTS}
+
+def run_key(params):
+    # cache key of a run: hash of its complete, canonical argument set (seed included)
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:20]
+
+def step_event(network, t):
+    # progress of a run after a timestep: living agents, active infections (total and per age) and the counters
+    plot_points = network.get_plot_points()
+    return { "time_elapsed": network.get_elapsed_time(),
+             "progress": network.get_elapsed_time() / t,
+             "agents": network.get_num_agents(),
+             "infected": plot_points[0][-1],
+             "infected_by_age": [plot_points[key][-1] for key in range(1, 5)],
+             "stats": network.get_stats() }
+
+def run_job(key, params, progress):
+    """run_job - runs a single headless simulation (executed inside a worker)
+    Inputs:
+        - key: cache key of the run, sent with every progress event
+        - params: run arguments (see run_params)
+        - progress: multiprocessing queue receiving (key, event) after every timestep
+    Outputs:
+        - result: dictionary of the final counters, the per-age series of active infections
+          and the number of progress events sent (fewer than time_elapsed when the run stopped early)
+    """
+    args = default_args(**params, headless=True)
+    network = load_engine(args.engine)(args)
+    events = 0
+    while network.get_elapsed_time() < args.t:
+        network.step()
+        progress.put((key, step_event(network, args.t)))
+        events += 1
+    network.close()
+    plot_points = network.get_plot_points()
+    return { "time_elapsed": network.get_elapsed_time(),
+             "events": events,
+             "agents": network.get_num_agents(),
+             "stats": network.get_stats(),
+             "plot_points": [plot_points[key] for key in range(0, 5)] }
+
+class Run:
+    """Run class
+    A run request known to the server: its arguments, status (queued,
+    running, done or failed), the events streamed so far and, once finished,
+    its result. Server-sent event subscribers get every event from the first.
+    """
+    def __init__(self, key, params, events=None, result=None):
+        """__init__ - Run Initialization function
+        Inputs:
+            - key: cache key of the run
+            - params: run arguments
+            - (Optional) events: step events of a finished run (read from the cache)
+            - (Optional) result: result of a finished run (read from the cache)
+        Outputs:
+            - None; returns Run object
+        """
+        self.key = key
+        self.params = params
+        self.status = "queued" if result is None else "done"
+        self.cached = result is not None
+        self.events = [] if events is None else events
+        self.result = result
+        self.error = None
+        # queues of the connected event streams
+        self.__subscribers = set()
+
+    def summary(self):
+        # JSON description of the run (its result included once done)
+        summary = { "id": self.key, "status": self.status, "cached": self.cached, "params": self.params,
+                    "time_elapsed": self.events[-1]["time_elapsed"] if self.events else 0 }
+        if self.result is not None:
+            summary["result"] = self.result
+        if self.error is not None:
+            summary["error"] = self.error
+        return summary
+
+    def publish(self, event):
+        # records a step event and hands it to every subscriber
+        self.events.append(event)
+        for queue in self.__subscribers:
+            queue.put_nowait(("step", event))
+
+    def finish(self, status, result=None, error=None):
+        # marks the run done or failed and ends every subscriber's stream
+        self.status, self.result, self.error = status, result, error
+        for queue in self.__subscribers:
+            queue.put_nowait((status, self.summary()))
+
+    async def stream(self):
+        """stream - every event of the run, from the first step to the final summary
+        Inputs:
+            - None
+        Outputs:
+            - async generator of (event name, data) pairs
+        """
+        queue = asyncio.Queue()
+        # events published before subscribing come from the history; later ones from the queue
+        history = list(self.events)
+        finished = self.status in ("done", "failed")
+        if not finished:
+            self.__subscribers.add(queue)
+        try:
+            for event in history:
+                yield "step", event
+            if finished:
+                yield self.status, self.summary()
+                return
+            while True:
+                name, data = await queue.get()
+                yield name, data
+                if name != "step":
+                    return
+        finally:
+            self.__subscribers.discard(queue)
+
+class SimulationServer:
+    """SimulationServer class
+    Asyncio HTTP service that runs simulations for local clients. Run
+    requests go into a bounded queue and are executed by a fixed pool of
+    worker processes; every timestep's counters are streamed to clients as
+    server-sent events. Finished runs are cached on disk under a hash of their
+    arguments and seed, so an identical request returns the stored result
+    without running again. Endpoints:
+        POST /runs              queue a run (JSON object of main.py arguments)
+        GET  /runs              list the runs known to the server
+        GET  /runs/<id>         status of a run, with its result once done
+        GET  /runs/<id>/events  server-sent events: "step" per timestep, then "done" or "failed"
+    """
+    def __init__(self, cache_dir="run_cache", workers=None, queue_size=16):
+        """__init__ - SimulationServer Initialization function
+        Inputs:
+            - (Optional) cache_dir: directory of the result cache (created if needed)
+            - (Optional) workers: number of worker processes (default: all cores)
+            - (Optional) queue_size: runs that may wait for a worker before requests are refused
+        Outputs:
+            - None; returns SimulationServer object
+        """
+        self.__cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__workers = workers or os.cpu_count() or 1
+        self.__queue_size = queue_size
+        # runs by key: queued, running and finished in this session (finished runs also live in the cache)
+        self.__runs = {}
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __cache_path(self, key):
+        # file holding a finished run's arguments, step events and result
+        return os.path.join(self.__cache_dir, f"{key}.json")
+
+    def __load_cached(self, key):
+        # finished run from the result cache (None when not cached)
+        try:
+            with open(self.__cache_path(key)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return Run(key, cached["params"], cached["events"], cached["result"])
+
+    def __store(self, run):
+        # writes a finished run to the cache; written to a temporary file first so readers never see half of it
+        path = self.__cache_path(run.key)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"params": run.params, "events": run.events, "result": run.result}, f)
+        os.replace(path + ".tmp", path)
+
+    def __submit(self, request):
+        """__submit - finds or queues the run of a request
+        Inputs:
+            - request: dictionary of main.py arguments
+        Outputs:
+            - Run: the existing run for identical arguments and seed, a cached one, or a newly queued one
+        """
+        params = run_params(request)
+        key = run_key(params)
+        run = self.__runs.get(key)
+        # failed runs are retried; anything else is shared
+        if run is not None and run.status != "failed":
+            return run
+        run = self.__load_cached(key)
+        if run is None:
+            if self.__queue.full():
+                raise OverflowError(f"{self.__queue_size} runs are already waiting for a worker")
+            run = Run(key, params)
+            self.__queue.put_nowait(run)
+        self.__runs[key] = run
+        return run
+
+    async def __worker(self):
+        # takes queued runs one at a time and executes them in the process pool
+        loop = asyncio.get_running_loop()
+        while True:
+            run = await self.__queue.get()
+            run.status = "running"
+            try:
+                result = await loop.run_in_executor(self.__pool, run_job, run.key, run.params, self.__progress)
+            except Exception as error:
+                run.finish("failed", error=f"{type(error).__name__}: {error}")
+            else:
+                # the result returns before the last progress events have been relayed
+                await self.__drain_progress(run, result["events"])
+                run.finish("done", result)
+                self.__store(run)
+            self.__queue.task_done()
+
+    async def __relay_progress(self):
+        # moves step events from the worker processes to their runs
+        loop = asyncio.get_running_loop()
+        while True:
+            key, event = await loop.run_in_executor(None, self.__progress.get)
+            run = self.__runs.get(key)
+            if run is not None and run.status == "running":
+                run.publish(event)
+
+    async def __drain_progress(self, run, events):
+        # waits until the relay has delivered a run's step events (one per step call of the worker)
+        while len(run.events) < events:
+            await asyncio.sleep(0.01)
+
+    async def __read_request(self, reader):
+        """__read_request - reads one HTTP/1.1 request
+        Inputs:
+            - reader: asyncio StreamReader of the connection
+        Outputs:
+            - (method, path, body), or None when the client closed the connection
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), urlsplit(target).path.rstrip("/") or "/", body
+
+    async def __respond(self, writer, status, payload):
+        # writes a JSON response and closes the connection
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def __stream_events(self, writer, run):
+        # writes a run's events as a server-sent event stream until it finishes or the client leaves
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        async for name, data in run.stream():
+            writer.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            await writer.drain()
+
+    async def __handle(self, reader, writer):
+        """__handle - serves one connection
+        Inputs:
+            - reader, writer: asyncio streams of the connection
+        Outputs:
+            - None
+        """
+        try:
+            request = await self.__read_request(reader)
+            if request is None:
+                return
+            method, path, body = request
+            parts = path.strip("/").split("/")
+            if parts[0] != "runs" or len(parts) > 3 or len(parts) == 3 and parts[2] != "events":
+                await self.__respond(writer, 404, {"error": f"no such resource: {path}"})
+            elif len(parts) == 1 and method == "POST":
+                try:
+                    run = self.__submit(json.loads(body or b"{}"))
+                except ValueError as error:
+                    await self.__respond(writer, 400, {"error": str(error)})
+                except OverflowError as error:
+                    await self.__respond(writer, 503, {"error": str(error)})
+                else:
+                    await self.__respond(writer, 200 if run.status == "done" else 202, run.summary())
+            elif method != "GET":
+                await self.__respond(writer, 405, {"error": f"{method} is not supported on {path}"})
+            elif len(parts) == 1:
+                await self.__respond(writer, 200, [{key: value for key, value in run.summary().items() if key != "result"}
+                                                   for run in self.__runs.values()])
+            else:
+                run = self.__runs.get(parts[1]) or self.__load_cached(parts[1])
+                if run is None:
+                    await self.__respond(writer, 404, {"error": f"no such run: {parts[1]}"})
+                elif len(parts) == 2:
+                    await self.__respond(writer, 200, run.summary())
+                else:
+                    await self.__stream_events(writer, run)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # the client went away
+            pass
+        except Exception as error:
+            await self.__respond(writer, 500, {"error": f"{type(error).__name__}: {error}"})
+        finally:
+            writer.close()
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    async def serve(self, port=8000, started=None):
+        """serve - serves the API on 127.0.0.1 until cancelled
+        Inputs:
+            - (Optional) port: port to listen on (0 = any free port)
+            - (Optional) started: callback receiving the bound port once listening
+        Outputs:
+            - None
+        """
+        context = multiprocessing.get_context("spawn")
+        self.__queue = asyncio.Queue(self.__queue_size)
+        with context.Manager() as manager, ProcessPoolExecutor(self.__workers, mp_context=context) as pool:
+            self.__pool = pool
+            self.__progress = manager.Queue()
+            tasks = [asyncio.create_task(self.__worker()) for _ in range(self.__workers)]
+            tasks.append(asyncio.create_task(self.__relay_progress()))
+            server = await asyncio.start_server(self.__handle, "127.0.0.1", port)
+            if started is not None:
+                started(server.sockets[0].getsockname()[1])
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # unblock the relay's pending get so its thread can finish
+                self.__progress.put((None, None))
+
+def main():
+    # command-line options for the simulation server
+    parser = argparse.ArgumentParser()
+    # port - port on 127.0.0.1 to serve the API on
+    parser.add_argument("--port", type=int, nargs='?', default=8000)
+    # workers - number of simulations run at once, one process each (default: all cores)
+    parser.add_argument("--workers", type=int, nargs='?', default=None)
+    # queue_size - runs that may wait for a worker; further requests get 503 until one starts
+    parser.add_argument("--queue_size", "--queue-size", type=int, nargs='?', default=16)
+    # cache - directory of the result cache shared by identical requests
+    parser.add_argument("--cache", type=str, nargs='?', default="run_cache")
+    args = parser.parse_args()
+
+    server = SimulationServer(args.cache, args.workers, args.queue_size)
+    try:
+        asyncio.run(server.serve(args.port, lambda port: print(f"serving simulations on http://127.0.0.1:{port}/runs", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
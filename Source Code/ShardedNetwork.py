@@ -0,0 +1,780 @@
+import multiprocessing
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+from Agent import HEALTHY, SYMPTOMATIC, ASYMPTOMATIC
+from AgentPopulation import AgentPopulation, categorize_ages
+from Display import Display
+from OutputSink import make_sink
+from Recorder import make_recorder
+from Profiler import make_profiler
+from Stopping import make_stop_criteria, pad_to_end
+from Checkpoint import write_checkpoint, read_checkpoint, plot_points_to_array, plot_points_from_array, stats_from_json
+from Kernels import stencil_sum, infect_exposed, advance_disease, move_probability
+from Rng import RandomStreams
+
+# agent columns saved per strip in a checkpoint (susceptibility is derived from age)
+STRIP_COLUMNS = ["status", "days_infected", "age", "location"]
+# channels of the movement halo: 0 = symptomatic count, 1-4 = occupancy per age category
+MOVE_CHANNELS = 5
+# seconds a strip waits at the halo barrier for the others before giving up (a strip that died never arrives)
+BARRIER_TIMEOUT = 120
+# seconds a strip worker is given to exit after "stop" before it is terminated
+STOP_TIMEOUT = 5
+
+def _halo_views(buffer, num_strips, L):
+    """_halo_views - maps the shared-memory block onto the two halo arrays
+    Inputs:
+        - buffer: shared memory buffer
+        - num_strips: number of strips
+        - L: lattice dimension
+    Outputs:
+        - infectious_halo: (strips, 2, L) infectious counts of each strip's top/bottom row
+        - move_halo: (strips, 2, MOVE_CHANNELS, L) movement counts of each strip's top/bottom row
+    """
+    block = np.ndarray((num_strips * 2 * L * (1 + MOVE_CHANNELS),), dtype=np.int32, buffer=buffer)
+    infectious_halo = block[:num_strips * 2 * L].reshape(num_strips, 2, L)
+    move_halo = block[num_strips * 2 * L:].reshape(num_strips, 2, MOVE_CHANNELS, L)
+    return infectious_halo, move_halo
+
+class StripWorker:
+    """StripWorker class
+    Owns the agents of one horizontal strip of rows [row_start, row_end) and
+    runs its share of every timestep inside a worker process. Boundary rows
+    are exchanged with the neighboring strips through shared memory.
+    """
+    def __init__(self, config):
+        """__init__ - StripWorker Initialization function
+        Inputs:
+            - config: dictionary with index, rows, L, num_strips, agent params,
+              random streams, shared memory name and barrier
+        Outputs:
+            - None; returns StripWorker object
+        """
+        self.__index = config["index"]
+        self.__row_start, self.__row_end = config["rows"]
+        self.__L = config["L"]
+        self.__num_strips = config["num_strips"]
+        self.__agent_params = config["agent_params"]
+        self.__barrier = config["barrier"]
+        self.__streams = config["streams"]
+        self.__agents = AgentPopulation()
+        # attach to the shared halo buffers
+        self.__shm = shared_memory.SharedMemory(name=config["shm_name"])
+        self.__infectious_halo, self.__move_halo = _halo_views(self.__shm.buf, self.__num_strips, self.__L)
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __local_cells(self):
+        # index of each agent's cell within the strip
+        return self.__agents.location - self.__row_start * self.__L
+
+    def __num_cells(self):
+        # number of cells in the strip
+        return (self.__row_end - self.__row_start) * self.__L
+
+    def __occupied_count(self):
+        # number of cells in the strip holding at least one agent
+        return int(np.count_nonzero(np.bincount(self.__local_cells(), minlength=self.__num_cells())))
+
+    def __publish_move_halo(self):
+        """__publish_move_halo - writes symptomatic and per-age counts of the boundary rows
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        H, L = self.__row_end - self.__row_start, self.__L
+        local = self.__local_cells()
+        counts = np.zeros((MOVE_CHANNELS, H * L), dtype=np.int64)
+        counts[0] = np.bincount(local[self.__agents.status == SYMPTOMATIC], minlength=H * L)
+        counts[1:] = np.bincount(local * 4 + (self.__agents.age - 1), minlength=4 * H * L).reshape(H * L, 4).T
+        counts = counts.reshape(MOVE_CHANNELS, H, L)
+        self.__move_halo[self.__index, 0] = counts[:, 0]
+        self.__move_halo[self.__index, 1] = counts[:, -1]
+
+    def __remote_count(self, node, channel):
+        """__remote_count - reads a movement count for a node in a neighboring strip's boundary row
+        Inputs:
+            - node: global node index (in row row_start - 1 or row_end)
+            - channel: movement halo channel
+        Outputs:
+            - integer count
+        """
+        row, col = divmod(node, self.__L)
+        if row < self.__row_start:
+            return int(self.__move_halo[self.__index - 1, 1, channel, col])
+        return int(self.__move_halo[self.__index + 1, 0, channel, col])
+
+    # ----------------------------------------------------------#
+    #                     Message Handlers                      #
+    # ----------------------------------------------------------#
+
+    def populate(self, count, num_infected):
+        """populate - creates the strip's initial agents
+        Inputs:
+            - count: number of agents in the strip
+            - num_infected: number of them initially infected
+        Outputs:
+            - (totals, infected): per-age counts (index = age category)
+        """
+        placement = self.__streams.get("placement")
+        age = categorize_ages(placement.integers(83, size=count))
+        location = self.__row_start * self.__L + placement.integers((self.__row_end - self.__row_start) * self.__L, size=count)
+        self.__agents.append(age, location)
+        seeds = placement.sample(count, num_infected)
+        self.__agents.status[seeds] = ASYMPTOMATIC
+        self.__agents.days_infected[seeds] = 0
+        return np.bincount(age, minlength=5), np.bincount(age[seeds], minlength=5)
+
+    def infect(self):
+        """infect - infection and disease progression for the strip
+        Publishes the strip's boundary infectious counts, waits for every strip
+        to do the same, then uses the neighbors' rows as the stencil halo.
+        Inputs:
+            - None
+        Outputs:
+            - (infected, dead, occupied): per-age new infections and deaths, and
+              the number of occupied cells after the phase
+        """
+        H, L = self.__row_end - self.__row_start, self.__L
+        status = self.__agents.status
+        local = self.__local_cells()
+        infectious = (status == ASYMPTOMATIC) | (status == SYMPTOMATIC)
+        counts = np.bincount(local[infectious], minlength=H * L).reshape(H, L)
+        # halo exchange: publish own boundary rows, then read the neighbors'
+        self.__infectious_halo[self.__index, 0] = counts[0]
+        self.__infectious_halo[self.__index, 1] = counts[-1]
+        self.__barrier.wait(BARRIER_TIMEOUT)
+        padded = np.zeros((H + 2, L + 2), dtype=np.int64)
+        padded[1:-1, 1:-1] = counts
+        if self.__index > 0:
+            padded[0, 1:-1] = self.__infectious_halo[self.__index - 1, 1]
+        if self.__index < self.__num_strips - 1:
+            padded[-1, 1:-1] = self.__infectious_halo[self.__index + 1, 0]
+        k = stencil_sum(padded).ravel()[local]
+        newly_infected = infect_exposed(self.__streams.get("infection"), self.__agents, k, self.__agent_params["lambda"])
+        _, to_dead = advance_disease(self.__agents, self.__agent_params["asympt_length"], self.__agent_params["sympt_length"])
+        # movement reads the post-progression boundary rows
+        self.__publish_move_halo()
+        return (np.bincount(self.__agents.age[newly_infected], minlength=5),
+                np.bincount(self.__agents.age[to_dead], minlength=5),
+                self.__occupied_count())
+
+    def move(self):
+        """move - attempts a single-agent move starting in this strip
+        Same rules as VectorNetwork: uniform occupied site 1, random neighbor
+        site 2 re-rolled while it holds a symptomatic agent, Metropolis
+        acceptance on same-age counts. Site 2 may lie in a neighboring strip.
+        Inputs:
+            - None
+        Outputs:
+            - None, or a record of an agent that left the strip (to be migrated)
+        """
+        L = self.__L
+        local = self.__local_cells()
+        occupied = np.flatnonzero(np.bincount(local, minlength=self.__num_cells()))
+        if len(occupied) == 0:
+            return None
+        movement = self.__streams.get("movement")
+        s_1_index = int(occupied[movement.integers(len(occupied))]) + self.__row_start * L
+        i, j = divmod(s_1_index, L)
+        neighbors = [(i + di) * L + (j + dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                     if (di, dj) != (0, 0) and 0 <= i + di < L and 0 <= j + dj < L]
+        location, status, age = self.__agents.location, self.__agents.status, self.__agents.age
+        # symptomatic count of a node, local or from the halo
+        def symptomatic(node):
+            if self.__row_start <= node // L < self.__row_end:
+                return np.count_nonzero((location == node) & (status == SYMPTOMATIC))
+            return self.__remote_count(node, 0)
+        repeat_counter = 0
+        s_2_index = neighbors[movement.integers(len(neighbors))]
+        while symptomatic(s_2_index) > 0:
+            if repeat_counter > 30:
+                return None
+            s_2_index = neighbors[movement.integers(len(neighbors))]
+            repeat_counter += 1
+        occupants = np.flatnonzero(location == s_1_index)
+        agent = occupants[movement.integers(len(occupants))]
+        if status[agent] == SYMPTOMATIC:
+            return None
+        age_category = int(age[agent])
+        n_age_1 = np.count_nonzero(age[occupants] == age_category)
+        if self.__row_start <= s_2_index // L < self.__row_end:
+            n_age_2 = np.count_nonzero((location == s_2_index) & (age == age_category))
+        else:
+            n_age_2 = self.__remote_count(s_2_index, age_category)
+        if movement.next() > move_probability(self.__agent_params["beta"][age_category], n_age_1, n_age_2):
+            return None
+        location[agent] = s_2_index
+        # the agent crossed the strip boundary: hand it over
+        if not self.__row_start <= s_2_index // L < self.__row_end:
+            return self.__agents.remove(agent)
+        return None
+
+    def receive(self, record):
+        """receive - adds an agent (migrant or influx) to the strip
+        Inputs:
+            - record: dictionary of the agent's column values
+        Outputs:
+            - None
+        """
+        self.__agents.append([record["age"]], [record["location"]], record["status"], record["days_infected"])
+
+    def checkpoint(self):
+        """checkpoint - the strip's agent columns and random stream state
+        Inputs:
+            - None
+        Outputs:
+            - (columns, random_state): dictionary of column arrays and the stream state
+        """
+        columns = {name: getattr(self.__agents, name).copy() for name in STRIP_COLUMNS}
+        return columns, self.__streams.get_state()
+
+    def restore(self, columns, random_state):
+        """restore - replaces the strip's agents and random stream state from a checkpoint
+        Inputs:
+            - columns: dictionary of column arrays
+            - random_state: stream state returned by checkpoint
+        Outputs:
+            - None
+        """
+        self.__agents = AgentPopulation(capacity=len(columns["status"]))
+        self.__agents.append(columns["age"], columns["location"], columns["status"], columns["days_infected"])
+        self.__streams.set_state(random_state)
+
+    def cell_state(self):
+        """cell_state - per-cell counts of each status code for the strip
+        Inputs:
+            - None
+        Outputs:
+            - 4 x H x L int32 array
+        """
+        H, L = self.__row_end - self.__row_start, self.__L
+        counts = np.bincount(self.__local_cells().astype(np.int64) * 4 + self.__agents.status, minlength=4 * H * L)
+        return counts.reshape(H, L, 4).transpose(2, 0, 1).astype(np.int32)
+
+    def close(self):
+        # detaches from the shared halo buffers
+        del self.__infectious_halo, self.__move_halo
+        self.__shm.close()
+
+def _run_strip_worker(conn, config):
+    """_run_strip_worker - worker process loop; dispatches controller messages
+    Replies are ("ok", value). When a command fails the traceback is sent back
+    as ("error", traceback) and the halo barrier is broken, so the other strips
+    stop waiting for this one; the controller raises the error.
+    Inputs:
+        - conn: pipe end connected to the controller
+        - config: StripWorker configuration
+    Outputs:
+        - None
+    """
+    worker = None
+    try:
+        worker = StripWorker(config)
+        while True:
+            command, payload = conn.recv()
+            if command == "stop":
+                return
+            if command == "receive":
+                # no reply: the next message to this worker is processed after it
+                worker.receive(payload)
+                continue
+            conn.send(("ok", getattr(worker, command)(*payload)))
+    except EOFError:
+        # the controller went away; there is nobody left to report to
+        pass
+    except Exception:
+        config["barrier"].abort()
+        try:
+            conn.send(("error", traceback.format_exc()))
+        except OSError:
+            pass
+    finally:
+        if worker is not None:
+            worker.close()
+
+class ShardedNetwork:
+    """ShardedNetwork class
+    Splits the L x L lattice into horizontal strips, one worker process per
+    strip. Each step the strips exchange one-row halos of infectious counts
+    (and, for movement, symptomatic and per-age counts) through shared memory,
+    and agents that move across a strip boundary migrate between workers.
+    Follows the same rules as VectorNetwork.
+    """
+    def __init__(self, args):
+        """__init__ - ShardedNetwork Initialization function
+        Inputs:
+            - args: argument parser dictionary
+        Outputs:
+            - None; returns ShardedNetwork object
+        """
+        # a sweep would move agents across several strips at once; only single-agent moves are sharded
+        if getattr(args, "movement", "single") != "single":
+            raise ValueError("the sharded engine only supports --movement=single")
+        # strips exchange one-row halos, which presumes the open lattice
+        if getattr(args, "topology", "lattice") != "lattice":
+            raise ValueError("the sharded engine only supports --topology=lattice")
+        # strips already live in shared memory split across workers; memory-mapped state is a vector engine feature
+        if getattr(args, "workdir", None) is not None:
+            raise ValueError("--workdir is only supported by the vector engine")
+        # strips already run in parallel, one process each: use --shards
+        if getattr(args, "threads", 1) > 1:
+            raise ValueError("--threads is only supported by the vector engine (use --shards)")
+        # policies are applied as masks over the agent and cell arrays
+        if getattr(args, "interventions", None) is not None:
+            raise ValueError("--interventions is only supported by the vector engine")
+        # network-based parameters (taken from arguments)
+        self.__network_params = { "N": args.N, # population density of agents
+                                  "L": args.L, # lattice L/W dimension
+                                  "num_nodes": args.L * args.L, # number of total nodes
+                                  "t": args.t, # total time steps to portray
+                                  "influx": args.influx, # probability of new agent being added per timestep
+                                  "n_0": args.n_0, # initial infected population size
+                                  "shards": min(args.L, getattr(args, "shards", None) or multiprocessing.cpu_count()) } # number of strips
+        # agent-based parameters (taken from arguments)
+        self.__agent_params = { "asympt_length": args.asym_l, # length of time for asympt phase
+                                "sympt_length": args.symp_l, # length of time for sympt phase
+                                "lambda": args.lam, # disease transmission probability
+                                "beta": np.array([0, 1, 2, 3, 4]) } # age-dependent mobility factor (indexed by age category)
+        # independent random streams for the controller, and further ones spawned per strip
+        self.__streams = RandomStreams(getattr(args, "seed", None))
+        # initialize start time to 0
+        self.__time_elapsed = 0
+        # statistical counters
+        self.__stats = {i: {"total": 0, "alive": 0, "dead": 0, "infected": 0} for i in range(1, 5)}
+        self.__plot_points = {i: [] for i in range(0, 5)}
+        # occupied cells per strip, reported by the infection phase for the movement phase
+        self.__occupied = []
+        # strip worker processes, their pipes and the shared halo buffers (released by __stop_workers)
+        self.__workers = []
+        self.__connections = []
+        self.__shm = None
+        self.__sink = self.__recorder = self.__profiler = None
+        try:
+            # start the strip workers, then populate them or restore a checkpoint into them
+            self.__start_workers(self.__streams.spawn(self.__network_params["shards"]))
+            if getattr(args, "resume", None):
+                self.load_checkpoint(args.resume)
+            else:
+                self.__populate_lattice()
+            # only the final statistics are drawn; lattices this large are not rendered
+            self.__display = None if getattr(args, "headless", False) else Display(0)
+            # stream statistics to disk when an output directory is given
+            self.__sink = make_sink(args)
+            # record per-cell frames for offline replay when a recording directory is given
+            self.__recorder = make_recorder(args, self.__time_elapsed if getattr(args, "resume", None) else None)
+            if self.__recorder is not None and not getattr(args, "resume", None):
+                self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+            # per-phase instrumentation of the timestep loop (None when --profile is off)
+            self.__profiler = make_profiler(args)
+        except BaseException:
+            # a half-built network would leave its worker processes and shared memory behind
+            if self.__recorder is not None:
+                self.__recorder.close()
+            self.__stop_workers(force=True)
+            raise
+        # checkpoint settings: save every K steps (0 = never) to path
+        self.__checkpoint = { "every": getattr(args, "checkpoint_every", 0),
+                              "path": getattr(args, "checkpoint", "checkpoint.npz") }
+        # early stopping and fast-forward (None when every criterion is off)
+        self.__stopping = make_stop_criteria(args)
+        # criterion that ended the run early (None while it runs to t)
+        self.__stop_reason = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __start_workers(self, streams):
+        """__start_workers - allocates the halo buffers and spawns one process per strip
+        Inputs:
+            - streams: one RandomStreams per strip
+        Outputs:
+            - None
+        """
+        L, S = self.__network_params["L"], self.__network_params["shards"]
+        # strip boundaries: row_bounds[s] .. row_bounds[s + 1]
+        self.__row_bounds = np.concatenate([[0], np.cumsum([len(rows) for rows in np.array_split(np.arange(L), S)])])
+        self.__shm = shared_memory.SharedMemory(create=True, size=S * 2 * L * (1 + MOVE_CHANNELS) * 4)
+        barrier = multiprocessing.Barrier(S)
+        for s in range(S):
+            parent, child = multiprocessing.Pipe()
+            config = { "index": s, "rows": (int(self.__row_bounds[s]), int(self.__row_bounds[s + 1])), "L": L,
+                       "num_strips": S, "agent_params": self.__agent_params, "streams": streams[s],
+                       "shm_name": self.__shm.name, "barrier": barrier }
+            worker = multiprocessing.Process(target=_run_strip_worker, args=(child, config), daemon=True)
+            self.__connections.append(parent)
+            self.__workers.append(worker)
+            worker.start()
+            # only the worker holds the other end, so its pipe reports EOF if it dies
+            child.close()
+
+    def __stop_workers(self, force=False):
+        """__stop_workers - stops every strip worker and releases the shared halo buffers
+        Workers that do not exit on "stop" (or cannot be told to) are
+        terminated. Safe to call more than once.
+        Inputs:
+            - (Optional) force: terminate the workers straight away (after a failure,
+              when the others may be stuck waiting at the halo barrier)
+        Outputs:
+            - None
+        """
+        for conn in self.__connections:
+            try:
+                conn.send(("stop", ()))
+            except OSError:
+                pass
+        for worker in self.__workers:
+            if worker.pid is None:
+                continue
+            worker.join(0 if force else STOP_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for conn in self.__connections:
+            conn.close()
+        self.__workers, self.__connections = [], []
+        if self.__shm is not None:
+            self.__shm.close()
+            self.__shm.unlink()
+            self.__shm = None
+
+    def __send(self, s, message):
+        # sends a message to one strip worker; a worker that has died stops every strip and raises
+        try:
+            self.__connections[s].send(message)
+        except OSError:
+            self.__workers[s].join(STOP_TIMEOUT)
+            exitcode = self.__workers[s].exitcode
+            self.__stop_workers(force=True)
+            raise RuntimeError(f"strip worker {s} exited unexpectedly (exit code {exitcode})")
+
+    def __receive(self, s):
+        """__receive - reply of one strip worker
+        A failed or dead worker stops every strip and raises, rather than
+        leaving the controller waiting for a reply that never comes.
+        Inputs:
+            - s: strip index
+        Outputs:
+            - the value returned by the worker's command
+        """
+        try:
+            status, value = self.__connections[s].recv()
+        except EOFError:
+            self.__workers[s].join(STOP_TIMEOUT)
+            exitcode = self.__workers[s].exitcode
+            self.__stop_workers(force=True)
+            raise RuntimeError(f"strip worker {s} exited unexpectedly (exit code {exitcode})")
+        if status == "error":
+            self.__stop_workers(force=True)
+            raise RuntimeError(f"strip worker {s} failed:\n{value}")
+        return value
+
+    def __strip_of(self, node):
+        # index of the strip owning a node
+        return int(np.searchsorted(self.__row_bounds, node // self.__network_params["L"], side="right") - 1)
+
+    def __broadcast(self, command, payloads=None):
+        """__broadcast - sends a command to every strip and gathers the replies
+        Inputs:
+            - command: StripWorker method name
+            - (Optional) payloads: list of per-strip argument tuples
+        Outputs:
+            - replies: list of per-strip return values
+        """
+        for s in range(len(self.__connections)):
+            self.__send(s, (command, payloads[s] if payloads else ()))
+        return [self.__receive(s) for s in range(len(self.__connections))]
+
+    def __populate_lattice(self):
+        """__populate_lattice - distributes N agents and n_0 infections over the strips
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        L = self.__network_params["L"]
+        count = int(self.__network_params["num_nodes"] * self.__network_params["N"])
+        # uniform locations: a strip's share is proportional to its number of rows
+        rows = np.diff(self.__row_bounds)
+        # one-off non-uniform draws, made before anything is buffered from the placement stream
+        generator = self.__streams.get("placement").get_generator()
+        strip_counts = generator.multinomial(count, rows / L)
+        strip_infected = generator.multivariate_hypergeometric(strip_counts, min(self.__network_params["n_0"], count))
+        replies = self.__broadcast("populate", [(int(c), int(n)) for c, n in zip(strip_counts, strip_infected)])
+        for totals, infected in replies:
+            for key in self.__stats:
+                self.__stats[key]["total"] += int(totals[key])
+                self.__stats[key]["alive"] += int(totals[key])
+                self.__stats[key]["infected"] += int(infected[key])
+
+    def __check_for_infection(self):
+        """__check_for_infection - infection and progression on every strip in parallel
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents newly infected or dead
+        """
+        self.__occupied = []
+        touched = 0
+        for infected, dead, strip_occupied in self.__broadcast("infect"):
+            self.__occupied.append(strip_occupied)
+            touched += int(infected.sum() + dead.sum())
+            for key in self.__stats:
+                self.__stats[key]["infected"] += int(infected[key])
+                self.__stats[key]["alive"] -= int(dead[key])
+                self.__stats[key]["dead"] += int(dead[key])
+        return touched
+
+    def __check_for_movement(self):
+        """__check_for_movement - single-agent move, starting in a strip chosen by occupancy
+        Site 1 is uniform among all occupied cells: its strip is chosen first,
+        weighted by the occupied counts returned by the infection phase.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents migrated to another strip (moves within a strip are not reported)
+        """
+        occupied = np.cumsum(self.__occupied)
+        if occupied[-1] == 0:
+            return 0
+        s = int(np.searchsorted(occupied, self.__streams.get("movement").next() * occupied[-1], side="right"))
+        self.__send(s, ("move", ()))
+        migrant = self.__receive(s)
+        if migrant is None:
+            return 0
+        self.__send(self.__strip_of(migrant["location"]), ("receive", migrant))
+        return 1
+
+    def __check_for_influx(self):
+        """__check_for_influx - the controller draws a new agent and hands it to the owning strip
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents added (0 or 1)
+        """
+        if self.__streams.get("influx").next() >= self.__network_params["influx"]:
+            return 0
+        return self.__add_influx_agent()
+
+    def __add_influx_agent(self):
+        # draws a new healthy agent at a random cell and hands it to the owning strip; returns the number added
+        influx = self.__streams.get("influx")
+        age = int(categorize_ages(influx.integers(83, size=1))[0])
+        node = influx.integers(self.__network_params["num_nodes"])
+        self.__send(self.__strip_of(node), ("receive", { "age": age, "location": node, "status": HEALTHY, "days_infected": -1 }))
+        self.__stats[age]["total"] += 1
+        self.__stats[age]["alive"] += 1
+        return 1
+
+    def __fast_forward(self):
+        """__fast_forward - jumps to the next influx arrival (with no infectious agent left nothing else can change)
+        The wait is one geometric draw on the influx stream; the timesteps
+        before the arrival hold the counters in the plot points and output rows.
+        Inputs:
+            - None
+        Outputs:
+            - boolean: True when an agent arrived at the new timestep, False when t came first
+        """
+        t = self.__network_params["t"]
+        arrival = self.__time_elapsed + self.__stopping.steps_to_arrival(self.__streams.get("influx"))
+        quiet_end = min(arrival - 1, t)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, quiet_end)
+        self.__time_elapsed = quiet_end
+        if quiet_end == t:
+            return False
+        self.__run_phase("influx", self.__add_influx_agent)
+        self.__time_elapsed += 1
+        return True
+
+    def __stop(self, reason):
+        # ends the run early: the counters are held at their current values up to t
+        self.__stop_reason = (reason, self.__time_elapsed)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, self.__network_params["t"])
+        self.__time_elapsed = self.__network_params["t"]
+
+    def __run_phase(self, name, phase):
+        # runs one phase of a timestep, reporting its wall time and agents updated when profiling
+        if self.__profiler is None:
+            phase()
+            return
+        start = time.perf_counter()
+        touched = phase()
+        self.__profiler.record(name, time.perf_counter() - start, touched)
+
+    def __timestep(self):
+        """__timestep - handling of a single timestep across all strips
+        Progression runs inside the strips' infection round, so it is profiled
+        as part of the infection phase.
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        self.__run_phase("infection", self.__check_for_infection)
+        self.__run_phase("movement", self.__check_for_movement)
+        self.__run_phase("influx", self.__check_for_influx)
+
+        # increment timestep counter
+        self.__time_elapsed += 1
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_elapsed_time(self):
+        # returns how many time steps have passed
+        return self.__time_elapsed
+    def get_num_agents(self):
+        # returns number of living agents
+        return sum(self.__stats[key]["alive"] for key in self.__stats)
+    def get_stats(self):
+        # returns the per-age statistical counters
+        return self.__stats
+    def get_plot_points(self):
+        # returns the per-age series of active infections (key 0 is the total)
+        return self.__plot_points
+    def get_cell_state(self):
+        # returns 4 x L x L per-cell counts of each status code, gathered from every strip
+        return np.concatenate(self.__broadcast("cell_state"), axis=1)
+    def get_stop_reason(self):
+        # returns (criterion, timestep) when a stopping criterion ended the run early, else None
+        return self.__stop_reason
+    def get_profiler(self):
+        # returns the Profiler of the run (None when profiling is off)
+        return self.__profiler
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def step(self):
+        """step - runs a single timestep and records its statistic plot-points
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        # stop early (holding the counters to t) once a stopping criterion is met
+        if self.__stopping is not None:
+            reason = self.__stopping.check(self.__stats)
+            if reason is not None:
+                self.__stop(reason)
+                return
+        # with no infectious agent left, fast-forward jumps to the next influx arrival (or to t)
+        if self.__stopping is not None and self.__stopping.quiescent(self.__stats):
+            if not self.__fast_forward():
+                return
+        else:
+            self.__timestep()
+        # update statistic plot-points
+        for key in self.__stats:
+            self.__plot_points[key].append(self.__stats[key]["infected"] - self.__stats[key]["dead"])
+        self.__plot_points[0].append(sum([self.__stats[key]["infected"] - self.__stats[key]["dead"] for key in self.__stats]))
+        if self.__profiler is not None:
+            self.__profiler.end_step(self.__time_elapsed, self.get_num_agents(), self.__plot_points[0][-1])
+        # stream counters (and periodic snapshots) to the output sink
+        if self.__sink is not None:
+            self.__sink.write_step(self.__time_elapsed, self.__stats)
+            if self.__sink.wants_snapshot(self.__time_elapsed):
+                self.__sink.write_snapshot(self.__time_elapsed, self.get_cell_state())
+        # append a delta frame to the recording
+        if self.__recorder is not None and self.__recorder.wants_frame(self.__time_elapsed):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+
+    def save_checkpoint(self, path):
+        """save_checkpoint - writes the complete simulation state to a file
+        Gathers every strip's agent columns and random stream state, so a resumed
+        run (with the same number of shards) is bit-identical to an
+        uninterrupted one.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        strips = self.__broadcast("checkpoint")
+        arrays = {name: np.concatenate([columns[name] for columns, _ in strips]) for name in STRIP_COLUMNS}
+        arrays["strip_sizes"] = np.array([len(columns["status"]) for columns, _ in strips], dtype=np.int64)
+        arrays["plot_points"] = plot_points_to_array(self.__plot_points)
+        meta = { "engine": "sharded",
+                 "network_params": {key: value for key, value in self.__network_params.items() if key != "t"},
+                 "agent_params": {key: value for key, value in self.__agent_params.items() if key != "beta"},
+                 "time_elapsed": self.__time_elapsed,
+                 "stats": self.__stats,
+                 "random_state": self.__streams.get_state(),
+                 "strip_random_states": [random_state for _, random_state in strips] }
+        # make sure every streamed row up to this step is on disk too
+        if self.__sink is not None:
+            self.__sink.flush()
+        if self.__recorder is not None:
+            self.__recorder.flush()
+        write_checkpoint(path, arrays, meta)
+
+    def load_checkpoint(self, path):
+        """load_checkpoint - restores the simulation state written by save_checkpoint
+        Every parameter except t is taken from the checkpoint, so a run can be
+        resumed with a larger t to extend it.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays, meta = read_checkpoint(path, "sharded")
+        for key in ("L", "shards"):
+            if meta["network_params"][key] != self.__network_params[key]:
+                raise ValueError(f"{path}: checkpoint has {key}={meta['network_params'][key]}, run has {key}={self.__network_params[key]}")
+        self.__network_params.update(meta["network_params"])
+        self.__agent_params.update(meta["agent_params"])
+        bounds = np.concatenate([[0], np.cumsum(arrays["strip_sizes"])])
+        self.__broadcast("restore", [({name: arrays[name][bounds[s]:bounds[s + 1]] for name in STRIP_COLUMNS}, meta["strip_random_states"][s])
+                                     for s in range(self.__network_params["shards"])])
+        self.__plot_points = plot_points_from_array(arrays["plot_points"])
+        self.__time_elapsed = meta["time_elapsed"]
+        self.__stats = stats_from_json(meta["stats"])
+        self.__streams.set_state(meta["random_state"])
+
+    def close(self):
+        """close - stops the strip workers and releases the shared halo buffers (after flushing outputs)
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__sink is not None:
+            self.__sink.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+        if self.__profiler is not None:
+            self.__profiler.close()
+        self.__stop_workers()
+
+    def run_simulation(self):
+        """run_simulation - runs t timesteps of simulation
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        try:
+            while self.__time_elapsed < self.__network_params["t"]:
+                previous = self.__time_elapsed
+                self.step()
+                # periodically save a checkpoint to resume from (a fast-forward may jump past the multiple itself)
+                if self.__stop_reason is None and self.__checkpoint["every"] > 0 and self.__time_elapsed // self.__checkpoint["every"] > previous // self.__checkpoint["every"]:
+                    self.save_checkpoint(self.__checkpoint["path"])
+        finally:
+            self.close()
+        # headless runs report the final counters instead of opening windows
+        if self.__display is None:
+            print(f"t={self.__time_elapsed} agents={self.get_num_agents()} stats={self.__stats}")
+            if self.__stop_reason is not None:
+                print(f"stopped early at t={self.__stop_reason[1]} ({self.__stop_reason[0]}); counters held until t={self.__time_elapsed}")
+            return
+        # display statistical graphs
+        self.__display.draw_statistics(f"λ={self.__agent_params['lambda']}; Density={self.__network_params['N']}; InfluxRate={self.__network_params['influx']}",
+                                       self.__network_params["t"], self.__plot_points)
@@ -0,0 +1,114 @@
+import collections
+import math
+
+class StopCriteria:
+    """StopCriteria class
+    Decides when a run can end before its last timestep, and when it can be
+    fast-forwarded. Once no agent is infectious the epidemic cannot restart
+    (influx only adds healthy agents), so the remaining steps can only move
+    agents and add new ones:
+        - extinct: no infectious agents and no influx; nothing can change
+          any more, so stopping is exact
+        - steady: no infection or death for window consecutive steps
+        - attack: the share of all agents ever infected reached a target
+    With fast_forward, an extinct run always stops, and a run with no
+    infectious agents but with influx jumps straight from one influx arrival
+    to the next: the gap is a single geometric draw instead of one draw per
+    timestep, and the counters are held over the steps in between.
+    """
+    def __init__(self, influx, extinct=False, steady_window=0, attack_rate=None, fast_forward=False):
+        """__init__ - StopCriteria Initialization function
+        Inputs:
+            - influx: influx rate of the run
+            - (Optional) extinct: stop when no agent is infectious and influx is 0
+            - (Optional) steady_window: stop after this many steps without infection or death (0 = never)
+            - (Optional) attack_rate: stop once this share of all agents has been infected (None = never)
+            - (Optional) fast_forward: skip every phase but influx once no agent is infectious
+        Outputs:
+            - None; returns StopCriteria object
+        """
+        self.__influx = influx
+        self.__extinct = extinct or fast_forward
+        self.__steady_window = steady_window
+        self.__attack_rate = attack_rate
+        self.__fast_forward = fast_forward
+        # (infected, dead) totals of the last steady_window + 1 checks
+        self.__history = collections.deque(maxlen=steady_window + 1)
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def check(self, stats):
+        """check - checks the criteria against the counters (called once per timestep)
+        Inputs:
+            - stats: per-age statistical counters of the network
+        Outputs:
+            - string: the criterion that was met, or None to keep running
+        """
+        infected = sum(stats[key]["infected"] for key in stats)
+        dead = sum(stats[key]["dead"] for key in stats)
+        total = sum(stats[key]["total"] for key in stats)
+        if self.__extinct and infected == dead and self.__influx == 0:
+            return "extinct"
+        if self.__attack_rate is not None and total > 0 and infected / total >= self.__attack_rate:
+            return "attack"
+        if self.__steady_window > 0:
+            self.__history.append((infected, dead))
+            if len(self.__history) == self.__history.maxlen and self.__history[0] == self.__history[-1]:
+                return "steady"
+        return None
+
+    def quiescent(self, stats):
+        # checks if the next step can be fast-forwarded: fast_forward is on and no agent is infectious
+        return self.__fast_forward and all(stats[key]["infected"] == stats[key]["dead"] for key in stats)
+
+    def steps_to_arrival(self, stream):
+        """steps_to_arrival - timesteps until the next influx arrival, drawn in one go
+        An agent arrives each step with probability influx, so the wait is
+        geometric; it is drawn by inversion from a single uniform.
+        Inputs:
+            - stream: UniformStream of the influx phase
+        Outputs:
+            - int: 1 when the next timestep brings an agent, k when the k - 1 before it bring none
+        """
+        if self.__influx >= 1:
+            return 1
+        return int(math.log1p(-stream.next()) / math.log1p(-self.__influx)) + 1
+
+def pad_to_end(plot_points, stats, sink, time_elapsed, t):
+    """pad_to_end - holds the current counters over the timesteps after time_elapsed, up to t
+    Fills the rest of a stopped run, or a stretch skipped by fast-forward: the
+    plot points are extended to t values and a row is written to the output
+    sink for every timestep in between, so series stay aligned to --t.
+    Inputs:
+        - plot_points: per-age series of active infections (key 0 is the total), extended in place
+        - stats: per-age statistical counters of the network
+        - sink: output sink of the run (None = no output)
+        - time_elapsed: timestep the counters belong to
+        - t: last timestep to fill (the last timestep of the run for a stop)
+    Outputs:
+        - None
+    """
+    active = {key: stats[key]["infected"] - stats[key]["dead"] for key in stats}
+    active[0] = sum(active.values())
+    for key in plot_points:
+        plot_points[key].extend([active[key]] * (t - time_elapsed))
+    if sink is not None:
+        for step in range(time_elapsed + 1, t + 1):
+            sink.write_step(step, stats)
+
+def make_stop_criteria(args):
+    """make_stop_criteria - builds the stopping criteria requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses influx, stop_extinct, stop_steady, stop_attack and fast_forward)
+    Outputs:
+        - StopCriteria, or None when every criterion is off
+    """
+    extinct = getattr(args, "stop_extinct", False)
+    steady_window = getattr(args, "stop_steady", 0)
+    attack_rate = getattr(args, "stop_attack", None)
+    fast_forward = getattr(args, "fast_forward", False)
+    if not (extinct or steady_window > 0 or attack_rate is not None or fast_forward):
+        return None
+    return StopCriteria(args.influx, extinct, steady_window, attack_rate, fast_forward)
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+
+# lattice rows processed at a time when the state is memory-mapped (--workdir without --block_rows)
+DEFAULT_BLOCK_ROWS = 256
+
+# ----------------------------------------------------------#
+#     Array storage: in memory or memory-mapped on disk      #
+# ----------------------------------------------------------#
+
+def allocate(workdir, name, shape, dtype):
+    """allocate - zero-filled array, in memory or backed by a file in the working directory
+    File-backed arrays are numpy.memmap objects over workdir/<name>.bin, so the
+    operating system pages them in and out and only the parts being touched
+    need to be resident.
+    Inputs:
+        - workdir: working directory (None = ordinary in-memory array)
+        - name: file name of the array, without extension
+        - shape: array shape
+        - dtype: array dtype
+    Outputs:
+        - numpy array (numpy.memmap when workdir is given)
+    """
+    # np.memmap cannot map an empty file
+    if workdir is None or int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    os.makedirs(workdir, exist_ok=True)
+    return np.memmap(os.path.join(workdir, f"{name}.bin"), dtype=dtype, mode="w+", shape=shape)
+
+def grow(array, workdir, name, length):
+    """grow - lengthens a 1-D array allocated with allocate, keeping its contents
+    A file-backed array is extended in place (the file grows and is mapped
+    again), so its contents are never copied through memory.
+    Inputs:
+        - array: array returned by allocate (or by an earlier grow)
+        - workdir: working directory it was allocated in (None = in memory)
+        - name: file name it was allocated under
+        - length: new number of elements (at least len(array))
+    Outputs:
+        - the grown array
+    """
+    if not isinstance(array, np.memmap):
+        grown = allocate(workdir, name, (length,), array.dtype)
+        grown[:len(array)] = array
+        return grown
+    array.flush()
+    return np.memmap(os.path.join(workdir, f"{name}.bin"), dtype=array.dtype, mode="r+", shape=(length,))
+
+def block_rows(args):
+    """block_rows - lattice rows processed at a time, from the arguments
+    Inputs:
+        - args: argument parser dictionary (uses block_rows, workdir, threads and L)
+    Outputs:
+        - int: --block_rows if given, else DEFAULT_BLOCK_ROWS with --workdir, else one
+          tile of rows per thread with --threads, else L (the whole lattice)
+    """
+    rows = getattr(args, "block_rows", None)
+    threads = getattr(args, "threads", 1)
+    if rows is None:
+        if getattr(args, "workdir", None) is not None:
+            rows = DEFAULT_BLOCK_ROWS
+        elif threads > 1:
+            rows = -(-args.L // threads)
+        else:
+            rows = args.L
+    return max(1, min(rows, args.L))
+
+def block_ranges(length, block):
+    # (start, stop) pairs splitting range(length) into consecutive blocks of at most block elements
+    return [(start, min(start + block, length)) for start in range(0, length, max(block, 1))]
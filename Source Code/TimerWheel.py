@@ -0,0 +1,64 @@
+class TimerWheel:
+    """TimerWheel class
+    Bucketed timer wheel keyed by timestep. Each event is filed in the bucket
+    of the step it fires at, and advancing the wheel hands back only that
+    step's bucket. A wheel of size buckets accepts events due up to size - 1
+    steps ahead, so a bucket never mixes events of different steps.
+    """
+    def __init__(self, size, start=0):
+        """__init__ - TimerWheel Initialization function
+        Inputs:
+            - size: number of buckets (longest schedule-ahead distance + 1)
+            - (Optional) start: first timestep the wheel will fire
+        Outputs:
+            - None; returns TimerWheel object
+        """
+        self.__buckets = [[] for _ in range(size)]
+        # next timestep to fire
+        self.__time = start
+        # number of events waiting in the wheel
+        self.__num_events = 0
+
+    def __len__(self):
+        # number of pending events
+        return self.__num_events
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_time(self):
+        # returns the next timestep to fire
+        return self.__time
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def schedule(self, due, event):
+        """schedule - files an event to fire at timestep due
+        Inputs:
+            - due: timestep at which the event fires
+            - event: any object, handed back by advance
+        Outputs:
+            - None
+        """
+        if not self.__time <= due < self.__time + len(self.__buckets):
+            raise ValueError(f"event due at step {due} is outside the wheel's window "
+                             f"[{self.__time}, {self.__time + len(self.__buckets)})")
+        self.__buckets[due % len(self.__buckets)].append(event)
+        self.__num_events += 1
+
+    def advance(self):
+        """advance - fires the current timestep and moves on to the next
+        Inputs:
+            - None
+        Outputs:
+            - events: list of events due at this timestep, in scheduling order
+        """
+        slot = self.__time % len(self.__buckets)
+        events = self.__buckets[slot]
+        self.__buckets[slot] = []
+        self.__num_events -= len(events)
+        self.__time += 1
+        return events
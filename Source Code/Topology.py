@@ -0,0 +1,250 @@
+import time
+import numpy as np
+from Storage import allocate, block_ranges, block_rows
+
+# the 8 neighbor offsets of a cell (4 straight + 4 diagonal), in row-major order
+NEIGHBOR_OFFSETS = np.array([(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if (di, dj) != (0, 0)], dtype=np.int32)
+
+class Topology:
+    """Topology class
+    Contact graph over the L x L nodes of a run, compiled to CSR adjacency: the
+    neighbors of node n are indices[indptr[n]:indptr[n + 1]], in increasing
+    order. The arrays may be memory-mapped files (see --workdir). Node n keeps the lattice index i * L + j it is drawn and reported
+    at, whatever edges the provider generated.
+    """
+    def __init__(self, name, L, indptr, indices, build_time=0.0):
+        """__init__ - Topology Initialization function
+        Inputs:
+            - name: provider that generated the graph
+            - L: lattice L/W dimension (the graph has L * L nodes)
+            - indptr: int32 array of length L * L + 1 (int64 past 2^31 - 1 edges)
+            - indices: int32 array of neighbor node indices
+            - (Optional) build_time: seconds spent generating and compiling
+        Outputs:
+            - None; returns Topology object
+        """
+        self.__name = name
+        self.__L = L
+        self.__indices = np.asarray(indices, dtype=np.int32)
+        self.__indptr = np.asarray(indptr, dtype=np.int32 if len(self.__indices) <= np.iinfo(np.int32).max else np.int64)
+        self.__build_time = build_time
+        if len(self.__indptr) != L * L + 1:
+            raise ValueError(f"{name} topology: indptr has {len(self.__indptr) - 1} nodes, expected {L * L}")
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_name(self):
+        # returns the provider name
+        return self.__name
+    def get_L(self):
+        # returns the lattice L/W dimension
+        return self.__L
+    def get_num_nodes(self):
+        # returns the number of nodes (L * L)
+        return self.__L * self.__L
+    def get_num_edges(self):
+        # returns the number of undirected edges
+        return len(self.__indices) // 2
+    def get_indptr(self):
+        # returns the CSR row pointer array
+        return self.__indptr
+    def get_indices(self):
+        # returns the CSR neighbor array
+        return self.__indices
+    def get_degrees(self):
+        # returns the number of neighbors of every node
+        return np.diff(self.__indptr)
+    def get_build_time(self):
+        # returns the seconds spent generating and compiling the graph
+        return self.__build_time
+    def nbytes(self):
+        # returns the memory held by the CSR arrays
+        return self.__indptr.nbytes + self.__indices.nbytes
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def neighbors(self, node):
+        # returns the neighbors of a node (a view into the CSR arrays)
+        return self.__indices[self.__indptr[node]:self.__indptr[node + 1]]
+
+    def describe(self):
+        # one-line summary of size, memory and build time
+        return (f"{self.__name}: {self.get_num_nodes()} nodes, {self.get_num_edges()} edges, "
+                f"{self.nbytes() / 2**20:.1f} MiB, built in {self.__build_time:.3f} s")
+
+    def to_networkx(self):
+        """to_networkx - builds a networkx graph of the topology (only needed for drawing)
+        Edges between diagonal lattice positions get weight 1.41, all others 1.0,
+        as in the original lattice drawing.
+        Inputs:
+            - None
+        Outputs:
+            - graph: networkx Graph with integer nodes
+        """
+        import networkx as nx
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.get_num_nodes()))
+        sources = np.repeat(np.arange(self.get_num_nodes()), self.get_degrees())
+        upper = sources < self.__indices
+        for u, v in zip(sources[upper].tolist(), self.__indices[upper].tolist()):
+            diagonal = u // self.__L != v // self.__L and u % self.__L != v % self.__L
+            graph.add_edge(u, v, weight=1.41 if diagonal else 1.0)
+        return graph
+
+def compile_csr(L, sources, targets):
+    """compile_csr - compiles an undirected edge list into sorted CSR adjacency
+    Edges are symmetrized; self loops and duplicate edges are dropped.
+    Inputs:
+        - L: lattice L/W dimension (nodes are 0 .. L * L - 1)
+        - sources, targets: integer arrays of edge endpoints
+    Outputs:
+        - (indptr, indices): int32 CSR arrays
+    """
+    num_nodes = L * L
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    # one key per directed edge, sorted by source then target; drop repeats
+    keys = np.concatenate([sources[keep] * num_nodes + targets[keep], targets[keep] * num_nodes + sources[keep]])
+    keys.sort()
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    sources, targets = np.divmod(keys, num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr.astype(np.int32), targets.astype(np.int32)
+
+def _grid_csr(L, wrap, workdir=None, rows_per_block=None):
+    """_grid_csr - CSR adjacency of the 8-neighbor lattice, built a block of rows at a time
+    Neighbor k of node n is n + di * L + dj. On the open lattice it exists when
+    both the row and the column offset stay on the lattice, so validity and
+    degrees come from L x 8 and L x 3 tables rather than per-node coordinates,
+    and row-major offsets already give sorted rows. On the torus every offset
+    wraps and each row is sorted.
+    Inputs:
+        - L: lattice L/W dimension
+        - wrap: wrap around the borders (torus) instead of dropping off-lattice neighbors
+        - (Optional) workdir: directory to memory-map the arrays in (None = in memory)
+        - (Optional) rows_per_block: lattice rows generated at a time (None = all)
+    Outputs:
+        - (indptr, indices): CSR arrays
+    """
+    coords = np.arange(L)
+    rows = coords[:, None] + NEIGHBOR_OFFSETS[:, 0]
+    cols = coords[:, None] + NEIGHBOR_OFFSETS[:, 1]
+    row_ok, col_ok = (rows >= 0) & (rows < L), (cols >= 0) & (cols < L)
+    # degree of (i, j): valid row offsets x valid column offsets, minus the node itself
+    steps = coords[:, None] + np.array([-1, 0, 1])
+    inside = np.full(L, 3) if wrap else ((steps >= 0) & (steps < L)).sum(axis=1)
+    num_entries = int(inside.sum()) ** 2 - L * L
+    indptr = allocate(workdir, "topology_indptr", L * L + 1, np.int32 if num_entries <= np.iinfo(np.int32).max else np.int64)
+    indices = allocate(workdir, "topology_indices", num_entries, np.int32)
+    offsets = (NEIGHBOR_OFFSETS[:, 0] * L + NEIGHBOR_OFFSETS[:, 1]).astype(np.int32)
+    for first, last in block_ranges(L, rows_per_block or L):
+        nodes = np.arange(first * L, last * L, dtype=np.int32)
+        start = int(indptr[first * L])
+        indptr[first * L + 1:last * L + 1] = start + np.cumsum(np.outer(inside[first:last], inside).ravel() - 1)
+        if wrap:
+            i, j = np.divmod(nodes, np.int32(L))
+            neighbors = np.sort(((i[:, None] + NEIGHBOR_OFFSETS[:, 0]) % L) * L + (j[:, None] + NEIGHBOR_OFFSETS[:, 1]) % L, axis=1).ravel()
+        else:
+            valid = (row_ok[first:last, None, :] & col_ok[None, :, :]).reshape(-1, 8)
+            neighbors = (nodes[:, None] + offsets)[valid]
+        indices[start:start + len(neighbors)] = neighbors
+    return indptr, indices
+
+def lattice(L, workdir=None, rows_per_block=None):
+    """lattice - open L x L lattice with 8 neighbors per interior cell
+    Inputs:
+        - L: lattice L/W dimension
+        - (Optional) workdir: directory to memory-map the arrays in (None = in memory)
+        - (Optional) rows_per_block: lattice rows generated at a time (None = all)
+    Outputs:
+        - (indptr, indices): int32 CSR arrays
+    """
+    return _grid_csr(L, False, workdir, rows_per_block)
+
+def torus(L, workdir=None, rows_per_block=None):
+    """torus - L x L lattice with 8 neighbors per cell, wrapping at the borders
+    Inputs:
+        - L: lattice L/W dimension (at least 3, so the 8 neighbors are distinct)
+        - (Optional) workdir: directory to memory-map the arrays in (None = in memory)
+        - (Optional) rows_per_block: lattice rows generated at a time (None = all)
+    Outputs:
+        - (indptr, indices): int32 CSR arrays
+    """
+    if L < 3:
+        raise ValueError("the torus topology needs L >= 3")
+    return _grid_csr(L, True, workdir, rows_per_block)
+
+def small_world(L, rewire, stream):
+    """small_world - Watts-Strogatz style rewiring of the open lattice
+    Every lattice edge keeps its first endpoint and, with probability rewire,
+    has its second endpoint replaced by a uniformly random node.
+    Inputs:
+        - L: lattice L/W dimension
+        - rewire: probability of rewiring each edge
+        - stream: UniformStream to draw the rewiring from
+    Outputs:
+        - (indptr, indices): int32 CSR arrays
+    """
+    indptr, indices = lattice(L)
+    sources = np.repeat(np.arange(L * L, dtype=np.int64), np.diff(indptr))
+    upper = sources < indices
+    sources, targets = sources[upper], indices[upper].astype(np.int64)
+    rewired = stream.take(len(sources)) < rewire
+    targets[rewired] = stream.integers(L * L, size=int(rewired.sum()))
+    return compile_csr(L, sources, targets)
+
+def edge_list(L, path):
+    """edge_list - contact graph read from a whitespace-separated edge-list file
+    Each line holds two node indices (i * L + j); lines starting with # are
+    comments. Edges are undirected.
+    Inputs:
+        - L: lattice L/W dimension
+        - path: edge-list file path
+    Outputs:
+        - (indptr, indices): int32 CSR arrays
+    """
+    edges = np.loadtxt(path, dtype=np.int64, comments="#", ndmin=2, usecols=(0, 1))
+    if edges.size and (edges.min() < 0 or edges.max() >= L * L):
+        raise ValueError(f"{path}: node indices must lie in [0, {L * L}) for L={L}")
+    return compile_csr(L, edges[:, 0], edges[:, 1])
+
+# names accepted by --topology
+TOPOLOGIES = ["lattice", "torus", "small_world", "edge_list"]
+
+def make_topology(args, stream):
+    """make_topology - builds and compiles the topology requested by the arguments
+    Inputs:
+        - args: argument parser dictionary (uses L, topology, rewire, edge_list, workdir and block_rows)
+        - stream: UniformStream for randomized providers
+    Outputs:
+        - Topology
+    With --workdir the arrays are memory-mapped files there: lattice and torus
+    are generated straight into them a block of rows at a time, the other
+    providers are compiled in memory and then moved to disk.
+    """
+    name = getattr(args, "topology", "lattice")
+    workdir = getattr(args, "workdir", None)
+    start = time.perf_counter()
+    if name == "lattice":
+        indptr, indices = lattice(args.L, workdir, block_rows(args))
+    elif name == "torus":
+        indptr, indices = torus(args.L, workdir, block_rows(args))
+    elif name == "small_world":
+        indptr, indices = small_world(args.L, getattr(args, "rewire", 0.1), stream)
+    elif name == "edge_list":
+        if getattr(args, "edge_list", None) is None:
+            raise ValueError("--topology=edge_list requires --edge_list")
+        indptr, indices = edge_list(args.L, args.edge_list)
+    else:
+        raise ValueError(f"unknown topology {name}; expected one of {TOPOLOGIES}")
+    if workdir is not None and name not in ("lattice", "torus"):
+        stored = allocate(workdir, "topology_indptr", len(indptr), indptr.dtype), allocate(workdir, "topology_indices", len(indices), indices.dtype)
+        stored[0][:], stored[1][:] = indptr, indices
+        indptr, indices = stored
+    return Topology(name, args.L, indptr, indices, time.perf_counter() - start)
@@ -0,0 +1,733 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from Agent import HEALTHY, ASYMPTOMATIC, SYMPTOMATIC
+from AgentPopulation import AgentPopulation, categorize_ages
+from CellIndex import CellIndex
+from Display import Display, CELL_COLORS, cell_colors
+from OutputSink import make_sink
+from Recorder import make_recorder
+from Interventions import make_interventions
+from Profiler import Profiler, make_profiler
+from Stopping import make_stop_criteria, pad_to_end
+from Checkpoint import write_checkpoint, read_checkpoint, plot_points_to_array, plot_points_from_array, stats_from_json, topology_to_arrays, topology_from_arrays
+from Kernels import stencil_sum, exposure_candidates, infect_candidates, advance_disease, move_probability, random_neighbors, neighbor_sum, count_into
+from Rng import RandomStreams
+from Storage import allocate, block_ranges, block_rows
+from Topology import Topology, make_topology
+
+class VectorNetwork:
+    """VectorNetwork class
+    Array-based alternative to Network. Agent state is kept in an
+    AgentPopulation (one NumPy column per attribute) instead of per-node lists
+    of Agent objects, so every phase of a timestep is a handful of vectorized
+    operations. The agent columns and per-cell counters can be memory-mapped
+    files in a working directory (--workdir); each phase then walks the
+    lattice a block of rows at a time, so memory use stays flat as L grows.
+    """
+    def __init__(self, args):
+        """__init__ - VectorNetwork Initialization function
+        Inputs:
+            - args: argument parser dictionary
+        Outputs:
+            - None; returns VectorNetwork object
+        """
+        # network-based parameters (taken from arguments)
+        self.__network_params = { "N": args.N, # population density of agents
+                                  "L": args.L, # lattice L/W dimension
+                                  "num_nodes": args.L * args.L, # number of total nodes
+                                  "t": args.t, # total time steps to portray
+                                  "influx": args.influx, # probability of new agent being added per timestep
+                                  "n_0": args.n_0, # initial infected population size
+                                  "movement": getattr(args, "movement", "single"), # single-agent or sweep movement
+                                  "topology": getattr(args, "topology", "lattice") } # contact graph provider
+        # storage of the run (not saved in checkpoints, so a run can resume into a different layout)
+        self.__storage = { "workdir": getattr(args, "workdir", None), # directory of the memory-mapped arrays (None = in memory)
+                           "block_rows": block_rows(args), # lattice rows processed at a time (one tile)
+                           "threads": max(1, getattr(args, "threads", 1)) } # worker threads of the infection and death phases
+        if self.__storage["workdir"] is not None and self.__network_params["movement"] == "sweep":
+            raise ValueError("--workdir only supports --movement=single")
+        # worker threads running the tiles of the infection and death phases (None = the tiles run in turn)
+        self.__pool = ThreadPoolExecutor(self.__storage["threads"]) if self.__storage["threads"] > 1 else None
+        # memory-mapped buffer get_cell_state fills with --workdir (allocated on first use)
+        self.__cell_state = None
+        # agent-based parameters (taken from arguments)
+        self.__agent_params = { "asympt_length": args.asym_l, # length of time for asympt phase
+                                "sympt_length": args.symp_l, # length of time for sympt phase
+                                "lambda": args.lam, # disease transmission probability
+                                "beta": np.array([0, 1, 2, 3, 4]) } # age-dependent mobility factor (indexed by age category)
+        # independent random streams for each phase, derived from --seed
+        self.__streams = RandomStreams(getattr(args, "seed", None))
+        # contact graph between cells, compiled to CSR adjacency
+        self.__topology = make_topology(args, self.__streams.get("topology"))
+        # per-step policies: distancing, vaccination, lockdown (None when --interventions is not given)
+        self.__interventions = make_interventions(args)
+        # initialize start time to 0
+        self.__time_elapsed = 0
+        # counter for number of agents
+        self.__num_agents = 0
+        # statistical counters
+        self.__stats = {i: {"total": 0, "alive": 0, "dead": 0, "infected": 0} for i in range(1, 5)}
+        self.__plot_points = {i: [] for i in range(0, 5)}
+        # generate the lattice, then populate it or restore a checkpoint into it
+        start = time.perf_counter()
+        self.__generate_lattice()
+        lattice_time = time.perf_counter() - start
+        if getattr(args, "resume", None):
+            self.load_checkpoint(args.resume)
+        else:
+            self.__populate_lattice()
+        # occupied cells and per-cell occupants for single-agent movement (None with sweep movement)
+        self.__cell_index = None
+        if self.__network_params["movement"] == "single":
+            self.__cell_index = CellIndex(self.__network_params["num_nodes"], self.__storage["workdir"])
+            self.__cell_index.build(self.__node_blocks(), self.__agent_blocks())
+        # seconds spent building the run, reported with the phase times
+        self.__setup_times = { "topology": self.__topology.get_build_time(),
+                               "lattice": lattice_time,
+                               "resume" if getattr(args, "resume", None) else "populate": time.perf_counter() - start - lattice_time }
+        # initialize the display of the network (None when running headless)
+        self.__display = None if getattr(args, "headless", False) else Display(getattr(args, "render_every", 1))
+        # stream statistics to disk when an output directory is given
+        self.__sink = make_sink(args)
+        # record per-cell frames for offline replay when a recording directory is given
+        self.__recorder = make_recorder(args, self.__time_elapsed if getattr(args, "resume", None) else None)
+        if self.__recorder is not None and not getattr(args, "resume", None):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+        # per-phase instrumentation of the timestep loop (None when --profile is off)
+        self.__profiler = make_profiler(args)
+        # checkpoint settings: save every K steps (0 = never) to path
+        self.__checkpoint = { "every": getattr(args, "checkpoint_every", 0),
+                              "path": getattr(args, "checkpoint", "checkpoint.npz") }
+        # early stopping and fast-forward (None when every criterion is off)
+        self.__stopping = make_stop_criteria(args)
+        # criterion that ended the run early (None while it runs to t)
+        self.__stop_reason = None
+
+    # ----------------------------------------------------------#
+    #                Internal Class Functions                   #
+    # ----------------------------------------------------------#
+
+    def __generate_lattice(self):
+        """__generate_lattice - allocates the per-cell occupancy counters
+        The lattice itself is implicit: node (i, j) has index i * L + j, matching
+        Network, and its edges come from the CSR topology.
+        Inputs:
+            - None; uses self.__network_params to get required values
+        Outputs:
+            - None; saves per-cell occupancy counts in self.__cell_counts
+        """
+        workdir = self.__storage["workdir"]
+        num_nodes = self.__network_params["num_nodes"]
+        # number of agents (alive or dead) currently occupying each cell
+        self.__cell_counts = allocate(workdir, "cell_counts", num_nodes, np.int64)
+        # the same counts split by age category (row age - 1), for the movement acceptance
+        self.__age_counts = allocate(workdir, "age_counts", (4, num_nodes), np.int32)
+        # infectious agents on each cell and infection pressure on it, rebuilt every step
+        self.__infectious = allocate(workdir, "infectious", num_nodes, np.int64)
+        self.__pressure = allocate(workdir, "pressure", num_nodes, np.int64)
+
+    def __map_tiles(self, function, tiles):
+        # applies function to every tile, on the thread pool when there is one; results come back in tile order
+        if self.__pool is None:
+            return [function(tile) for tile in tiles]
+        return list(self.__pool.map(function, tiles))
+
+    def __tile_waves(self, tiles):
+        # groups tiles into waves of one tile per thread, so only a wave's temporaries are alive at once
+        wave = []
+        for tile in tiles:
+            wave.append(tile)
+            if len(wave) == self.__storage["threads"]:
+                yield wave
+                wave = []
+        if wave:
+            yield wave
+
+    def __node_blocks(self):
+        # (first, last) node ranges of the lattice row blocks
+        L = self.__network_params["L"]
+        return [(first * L, last * L) for first, last in block_ranges(L, self.__storage["block_rows"])]
+
+    def __agent_blocks(self, start=0):
+        # the agents from start on, in blocks of as many agents as a row block has cells
+        return self.__agents.blocks(self.__storage["block_rows"] * self.__network_params["L"], start)
+
+    def __new_agents(self, count, stream):
+        """__new_agents - adds a batch of new healthy agents at random locations
+        Ages are drawn for the whole batch, then locations, a block at a time;
+        the stream hands out the same values whatever the block size.
+        Inputs:
+            - count: number of agents to create
+            - stream: UniformStream to draw ages and locations from
+        Outputs:
+            - start: id of the first new agent
+        """
+        start = self.__agents.extend(count)
+        # uniform integer age in [0, 82], converted to the same categories as Agent
+        for block in self.__agent_blocks(start):
+            block.set_ages(categorize_ages(stream.integers(83, size=len(block))))
+        # random location anywhere on the lattice
+        for block in self.__agent_blocks(start):
+            block.location[:] = stream.integers(self.__network_params["num_nodes"], size=len(block))
+        return start
+
+    def __populate_lattice(self):
+        """__populate_lattice - fills lattice with N agents randomly
+        Inputs:
+            - None; uses self.__network_params to get required values
+        Outputs:
+            - None; saves agents in the agent arrays
+        """
+        # population of density * num_nodes
+        count = int(self.__network_params["num_nodes"] * self.__network_params["N"])
+        self.__agents = AgentPopulation(capacity=count, workdir=self.__storage["workdir"])
+        placement = self.__streams.get("placement")
+        self.__new_agents(count, placement)
+        # choose initial infected cases without replacement
+        seeds = placement.sample(count, min(self.__network_params["n_0"], count))
+        self.__agents.status[seeds] = ASYMPTOMATIC
+        self.__agents.days_infected[seeds] = 0
+        # update occupancy (per age, then summed over ages) and statistical counters
+        self.__count_ages()
+        self.__num_agents = count
+        totals = sum((np.bincount(block.age, minlength=5) for block in self.__agent_blocks()), np.zeros(5, dtype=np.int64))
+        infected = np.bincount(self.__agents.age[seeds], minlength=5)
+        for key in self.__stats:
+            self.__stats[key]["total"] += int(totals[key])
+            self.__stats[key]["alive"] += int(totals[key])
+            self.__stats[key]["infected"] += int(infected[key])
+
+    def __count_ages(self):
+        # counts the per-age occupancy of every cell from the agent arrays into the (zeroed) counters, then the total occupancy
+        num_nodes = self.__network_params["num_nodes"]
+        age_counts = self.__age_counts.reshape(-1)
+        for block in self.__agent_blocks():
+            count_into(age_counts, (block.age.astype(np.int64) - 1) * num_nodes + block.location)
+        for first, last in self.__node_blocks():
+            self.__cell_counts[first:last] = self.__age_counts[:, first:last].sum(axis=0, dtype=np.int64)
+
+    def __apply_interventions(self):
+        """__apply_interventions - selects the policies of this timestep and vaccinates
+        Every healthy, unvaccinated agent is vaccinated with the folded per-age
+        probability in one masked pass per block; distancing and lockdown are
+        applied by the infection and movement phases.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents vaccinated
+        """
+        self.__interventions.update(self.__time_elapsed)
+        vaccination = self.__interventions.get_vaccination()
+        if not vaccination.any():
+            return 0
+        stream = self.__streams.get("interventions")
+        vaccinated = 0
+        for block in self.__agent_blocks():
+            eligible = np.flatnonzero((block.status == HEALTHY) & (block.susceptibility > 0) & (vaccination[block.age] > 0))
+            chosen = eligible[stream.take(len(eligible)) < vaccination[block.age[eligible]]]
+            block.susceptibility[chosen] = 0
+            vaccinated += len(chosen)
+        return vaccinated
+
+    def __unlocked(self, source, target):
+        # movement allowed from source to target cells: neither end under lockdown (always, without one)
+        if self.__interventions is None or not self.__interventions.locks_movement():
+            return np.ones(len(source), dtype=bool)
+        return ~(self.__interventions.locked(source, self.__infectious) | self.__interventions.locked(target, self.__infectious))
+
+    def __check_for_movement(self):
+        """__check_for_movement - checks which agent should move and tries to move agent
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents moved (0 or 1)
+        """
+        # randomly select site 1 among the occupied sites (in node order) from the occupied-cell index
+        index = self.__cell_index
+        if index.get_num_occupied() == 0:
+            return 0
+        movement = self.__streams.get("movement")
+        s_1_index = index.select(movement.integers(index.get_num_occupied()))
+        # identify site 1's neighbors and pick site 2 (an isolated site cannot move)
+        neighbors = self.__topology.neighbors(s_1_index).tolist()
+        if len(neighbors) == 0:
+            return 0
+        status = self.__agents.status
+        # site 1's occupants, and the neighbors holding a symptomatic agent, from the per-cell occupant lists
+        occupants = index.occupants(s_1_index)
+        screened = {node for node in neighbors if any(status[agent] == SYMPTOMATIC for agent in index.occupants(node))}
+        # re-roll site 2 while it holds a symptomatic agent, up to the same limit as Network
+        repeat_counter = 0
+        s_2_index = neighbors[movement.integers(len(neighbors))]
+        while s_2_index in screened:
+            if repeat_counter > 30:
+                return 0
+            s_2_index = neighbors[movement.integers(len(neighbors))]
+            repeat_counter += 1
+        # randomly select agent in s_1 to attempt to move
+        location = self.__agents.location
+        age = self.__agents.age
+        agent = occupants[movement.integers(len(occupants))]
+        # symptomatic agents never move
+        if status[agent] == SYMPTOMATIC:
+            return 0
+        # same-age occupants at both sites, from the per-age occupancy counts
+        age_category = age[agent]
+        n_age_1 = self.__age_counts[age_category - 1, s_1_index]
+        n_age_2 = self.__age_counts[age_category - 1, s_2_index]
+        # same acceptance probability as Agent.move_agent
+        prob_1_to_2 = move_probability(self.__agent_params["beta"][age_category], n_age_1, n_age_2)
+        # make movement if probability is sufficient
+        if movement.next() <= prob_1_to_2 and self.__unlocked(np.array([s_1_index]), np.array([s_2_index]))[0]:
+            location[agent] = s_2_index
+            index.move(agent, s_1_index, s_2_index)
+            self.__cell_counts[s_1_index] -= 1
+            self.__cell_counts[s_2_index] += 1
+            self.__age_counts[age_category - 1, s_1_index] -= 1
+            self.__age_counts[age_category - 1, s_2_index] += 1
+            return 1
+        return 0
+
+    def __sweep_movement(self):
+        """__sweep_movement - every mobile agent proposes a move in the same step
+        Each living, non-symptomatic agent proposes a uniformly chosen neighbor
+        cell; proposals onto a cell holding a symptomatic agent are rejected, and
+        the rest are accepted with the Metropolis probability of Agent.move_agent,
+        all evaluated in one batch. Every proposal is judged against the occupancy
+        at the start of the sweep and all accepted moves are applied together, so
+        the outcome does not depend on the order agents are visited in.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents moved
+        """
+        status = self.__agents.status
+        location = self.__agents.location
+        movers = np.flatnonzero((status == HEALTHY) | (status == ASYMPTOMATIC))
+        if len(movers) == 0:
+            return 0
+        movement = self.__streams.get("movement")
+        num_nodes = self.__network_params["num_nodes"]
+        source = location[movers].astype(np.int64)
+        age_row = self.__agents.age[movers].astype(np.int64) - 1
+        # propose targets, then draw every acceptance (always both draws, so the stream stays aligned)
+        target = random_neighbors(self.__topology.get_indptr(), self.__topology.get_indices(), source, movement.take(len(movers)))
+        uniforms = movement.take(len(movers))
+        # agents on isolated nodes stay put
+        connected = target >= 0
+        target = np.where(connected, target, source)
+        symptomatic = np.bincount(location[status == SYMPTOMATIC], minlength=num_nodes)
+        prob_1_to_2 = move_probability(self.__agent_params["beta"][age_row + 1],
+                                       self.__age_counts[age_row, source], self.__age_counts[age_row, target])
+        accepted = connected & (symptomatic[target] == 0) & (uniforms <= prob_1_to_2) & self.__unlocked(source, target)
+        # apply all accepted moves simultaneously
+        location[movers[accepted]] = target[accepted]
+        source, target, age_row = source[accepted], target[accepted], age_row[accepted]
+        self.__cell_counts += np.bincount(target, minlength=num_nodes) - np.bincount(source, minlength=num_nodes)
+        age_counts = self.__age_counts.reshape(-1)
+        np.subtract.at(age_counts, age_row * num_nodes + source, 1)
+        np.add.at(age_counts, age_row * num_nodes + target, 1)
+        return len(target)
+
+    def __check_for_infection(self):
+        """__check_for_infection - exposes every healthy agent to its infectious neighborhood
+        Infection pressure on a cell is the number of infectious agents on the cell
+        and its neighbors: a 3x3 stencil over the per-cell infectious counts on the
+        open lattice, a CSR neighbor sum on any other topology.
+        An agent facing k infectious contacts escapes each one independently, so it
+        is infected with probability 1 - (1 - λ * susceptibility)^k. Updates are
+        synchronous: agents infected this step only become infectious next step.
+        Counts, pressure and exposures are each computed a block (tile) at a time,
+        on --threads worker threads when there are several; the tiles only read
+        the infectious-count snapshot and write their own cells and agents, and
+        the exposures are drawn in agent order, so the result depends neither on
+        the block size nor on the number of threads.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents newly infected
+        """
+        L = self.__network_params["L"]
+        # distancing scales λ per age category
+        λ = self.__agent_params["lambda"] if self.__interventions is None else self.__agent_params["lambda"] * self.__interventions.get_contact()
+        counts = self.__infectious
+        counts.fill(0)
+        # the infectious agents of every tile are found in parallel, then counted into the snapshot
+        for locations in self.__map_tiles(lambda block: block.location[(block.status == ASYMPTOMATIC) | (block.status == SYMPTOMATIC)],
+                                          self.__agent_blocks()):
+            count_into(counts, locations)
+        # every tile of the pressure only reads the snapshot and writes its own rows
+        if self.__topology.get_name() == "lattice":
+            # 3x3 stencil over the counts of each row block and a one-row halo, zero-padded so border cells see no wrap-around
+            grid = counts.reshape(L, L)
+            def tile_pressure(rows):
+                first, last = rows
+                window = np.pad(grid[max(first - 1, 0):last + 1], ((int(first == 0), int(last == L)), (1, 1)))
+                stencil_sum(window, out=self.__pressure[first * L:last * L].reshape(last - first, L))
+            self.__map_tiles(tile_pressure, block_ranges(L, self.__storage["block_rows"]))
+        else:
+            indptr, indices = self.__topology.get_indptr(), self.__topology.get_indices()
+            def tile_pressure(nodes):
+                first, last = nodes
+                rows = indptr[first:last + 1].astype(np.int64)
+                self.__pressure[first:last] = counts[first:last] + neighbor_sum(rows - rows[0], indices[rows[0]:rows[-1]], counts)
+            self.__map_tiles(tile_pressure, self.__node_blocks())
+        # gather the contact count of every agent and draw the exposures, a wave of tiles at a time: each
+        # tile draws its own slice of the infection stream, the floats sequential draws would have given it
+        infection = self.__streams.get("infection")
+        def tile_infect(tile):
+            block, (candidates, probability), draws = tile
+            return np.bincount(block.age[infect_candidates(block, candidates, probability, draws.draw())], minlength=5)
+        infected = np.zeros(5, dtype=np.int64)
+        for wave in self.__tile_waves(self.__agent_blocks()):
+            exposures = self.__map_tiles(lambda block: exposure_candidates(block, self.__pressure[block.location], λ), wave)
+            slices = infection.split([len(candidates) for candidates, _ in exposures])
+            infected += sum(self.__map_tiles(tile_infect, zip(wave, exposures, slices)), np.zeros(5, dtype=np.int64))
+        # update statistics
+        for key in self.__stats:
+            self.__stats[key]["infected"] += int(infected[key])
+        return int(infected.sum())
+
+    def __check_for_death(self):
+        """__check_for_death - advances the disease clock of every infected agent
+        Same transition times as the graph engine's timer wheel: increments
+        days_infected, then applies the asymptomatic -> symptomatic and
+        symptomatic -> dead transitions.
+        Inputs:
+            - None
+        Outputs:
+            - int: number of transitions applied
+        """
+        # tiles are independent: each advances the clocks of its own agents
+        def tile_advance(block):
+            to_symptomatic, to_dead = advance_disease(block, self.__agent_params["asympt_length"], self.__agent_params["sympt_length"])
+            return len(to_symptomatic) + len(to_dead), np.bincount(block.age[to_dead], minlength=5)
+        transitions = 0
+        dead = np.zeros(5, dtype=np.int64)
+        for count, ages in self.__map_tiles(tile_advance, self.__agent_blocks()):
+            transitions += count
+            dead += ages
+        # decrement counter for death and update statistics
+        self.__num_agents -= int(dead.sum())
+        for key in self.__stats:
+            self.__stats[key]["alive"] -= int(dead[key])
+            self.__stats[key]["dead"] += int(dead[key])
+        return transitions
+
+    def __check_for_influx(self):
+        """__check_for_influx - checks to see if new members of population should be added (randomly)
+        Inputs:
+            - None
+        Outputs:
+            - int: number of agents added (0 or 1)
+        """
+        # if probability is sufficient, add a new agent to the lattice randomly
+        if self.__streams.get("influx").next() < self.__network_params["influx"]:
+            return self.__add_influx_agent()
+        return 0
+
+    def __add_influx_agent(self):
+        # adds a new healthy agent at a random cell (drawn from the influx stream); returns the number added
+        start = self.__new_agents(1, self.__streams.get("influx"))
+        agent = self.__agents.get_agent(start)
+        if self.__cell_index is not None:
+            self.__cell_index.add(start, agent.get_location())
+        self.__cell_counts[agent.get_location()] += 1
+        self.__age_counts[agent.get_age() - 1, agent.get_location()] += 1
+        # increment num_agents counter and update statistics
+        self.__num_agents += 1
+        self.__stats[agent.get_age()]["total"] += 1
+        self.__stats[agent.get_age()]["alive"] += 1
+        return 1
+
+    def __fast_forward(self):
+        """__fast_forward - jumps to the next influx arrival (with no infectious agent left nothing else can change)
+        The wait is one geometric draw on the influx stream; the timesteps
+        before the arrival hold the counters in the plot points and output rows.
+        Inputs:
+            - None
+        Outputs:
+            - boolean: True when an agent arrived at the new timestep, False when t came first
+        """
+        t = self.__network_params["t"]
+        arrival = self.__time_elapsed + self.__stopping.steps_to_arrival(self.__streams.get("influx"))
+        quiet_end = min(arrival - 1, t)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, quiet_end)
+        self.__time_elapsed = quiet_end
+        if quiet_end == t:
+            return False
+        self.__run_phase("influx", self.__add_influx_agent)
+        self.__time_elapsed += 1
+        return True
+
+    def __stop(self, reason):
+        # ends the run early: the counters are held at their current values up to t
+        self.__stop_reason = (reason, self.__time_elapsed)
+        pad_to_end(self.__plot_points, self.__stats, self.__sink, self.__time_elapsed, self.__network_params["t"])
+        self.__time_elapsed = self.__network_params["t"]
+
+    def __run_phase(self, name, phase):
+        # runs one phase of a timestep, reporting its wall time and agents updated when profiling
+        if self.__profiler is None:
+            phase()
+            return
+        start = time.perf_counter()
+        touched = phase()
+        self.__profiler.record(name, time.perf_counter() - start, touched)
+
+    def __timestep(self):
+        """__timestep - handling of a single timestep
+        Same phase order as Network: infection, progression/death, movement, influx,
+        preceded by the interventions of the step when there are any.
+        Inputs:
+            - None
+        Outputs:
+            - None; agent arrays updated with new configuration
+        """
+        if self.__interventions is not None:
+            self.__run_phase("interventions", self.__apply_interventions)
+        self.__run_phase("infection", self.__check_for_infection)
+        self.__run_phase("death", self.__check_for_death)
+        if self.__network_params["movement"] == "sweep":
+            self.__run_phase("movement", self.__sweep_movement)
+        else:
+            self.__run_phase("movement", self.__check_for_movement)
+        self.__run_phase("influx", self.__check_for_influx)
+
+        # increment timestep counter
+        self.__time_elapsed += 1
+
+    def __generate_colorations(self, color_map):
+        """__generate_colorations - generate the color of every cell
+        Same priority as Network: symptomatic, then asymptomatic, then healthy;
+        cells that are empty or hold only dead agents use the dead color.
+        Inputs:
+            - color_map: association of status code -> RGB tuple
+        Outputs:
+            - colorations: L x L x 3 array of RGB colors
+        """
+        return cell_colors(self.get_cell_state(), color_map)
+
+    def __update_display(self, color_map=CELL_COLORS):
+        """__update_display - draws the lattice as an image of cell colors
+        Inputs:
+            - (Optional) color_map: an association dictionary for status code->RGB
+        Outputs:
+            - None; displays as a window
+        """
+        self.__display.draw_grid(f"{self.__time_elapsed} / {self.__network_params['t']} - Number of Agents: {self.__num_agents}",
+                                 self.__generate_colorations(color_map))
+
+    def __generate_statistical_display(self):
+        """__generate_statistical_display - generates a graph stats over time
+        Inputs:
+            - None
+        Outputs:
+            - None; displays as a window
+        """
+        self.__display.draw_statistics(f"λ={self.__agent_params['lambda']}; Density={self.__network_params['N']}; InfluxRate={self.__network_params['influx']}",
+                                       self.__network_params["t"], self.__plot_points)
+
+    # ----------------------------------------------------------#
+    #                          Getters                          #
+    # ----------------------------------------------------------#
+
+    def get_agents(self):
+        # returns the AgentPopulation holding every agent
+        return self.__agents
+    def get_elapsed_time(self):
+        # returns how many time steps have passed
+        return self.__time_elapsed
+    def get_num_agents(self):
+        # returns number of living agents
+        return self.__num_agents
+    def get_stats(self):
+        # returns the per-age statistical counters
+        return self.__stats
+    def get_plot_points(self):
+        # returns the per-age series of active infections (key 0 is the total)
+        return self.__plot_points
+    def get_cell_state(self):
+        # returns 4 x L x L per-cell counts of each status code; with --workdir it is built one agent block
+        # at a time into a memory-mapped buffer, which the next call overwrites
+        L = self.__network_params["L"]
+        if self.__storage["workdir"] is None:
+            counts = np.zeros(4 * L * L, dtype=np.int32)
+        else:
+            if self.__cell_state is None:
+                self.__cell_state = allocate(self.__storage["workdir"], "cell_state", 4 * L * L, np.int32)
+            counts = self.__cell_state
+            for start, stop in block_ranges(4 * L * L, self.__storage["block_rows"] * L):
+                counts[start:stop] = 0
+        for block in self.__agent_blocks():
+            count_into(counts, block.status.astype(np.int64) * (L * L) + block.location)
+        return counts.reshape(4, L, L)
+    def get_age_counts(self):
+        # returns 4 x L x L per-cell counts of each age category (index age - 1)
+        return self.__age_counts.reshape(4, self.__network_params["L"], self.__network_params["L"])
+    def get_phase_times(self):
+        # returns setup seconds and accumulated seconds per timestep phase (empty phases until enabled)
+        return { "setup": dict(self.__setup_times),
+                 "phases": {} if self.__profiler is None else self.__profiler.get_phase_seconds() }
+    def get_stop_reason(self):
+        # returns (criterion, timestep) when a stopping criterion ended the run early, else None
+        return self.__stop_reason
+    def get_profiler(self):
+        # returns the Profiler of the run (None when profiling is off)
+        return self.__profiler
+
+    # ----------------------------------------------------------#
+    #                     Class Methods                         #
+    # ----------------------------------------------------------#
+
+    def enable_phase_timing(self):
+        """enable_phase_timing - starts timing each phase of every following timestep
+        Wall time is accumulated per phase (infection, death, movement, influx)
+        and read back with get_phase_times; the counters restart at zero. Uses
+        the --profile profiler when there is one, otherwise a silent one.
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__profiler is None:
+            self.__profiler = Profiler()
+        self.__profiler.reset()
+
+    def step(self):
+        """step - runs a single timestep and records its statistic plot-points
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        # stop early (holding the counters to t) once a stopping criterion is met
+        if self.__stopping is not None:
+            reason = self.__stopping.check(self.__stats)
+            if reason is not None:
+                self.__stop(reason)
+                return
+        # with no infectious agent left, fast-forward jumps to the next influx arrival (or to t)
+        if self.__stopping is not None and self.__stopping.quiescent(self.__stats):
+            if not self.__fast_forward():
+                return
+        else:
+            self.__timestep()
+        # update statistic plot-points
+        for key in self.__stats:
+            self.__plot_points[key].append(self.__stats[key]["infected"] - self.__stats[key]["dead"])
+        self.__plot_points[0].append(sum([self.__stats[key]["infected"] - self.__stats[key]["dead"] for key in self.__stats]))
+        if self.__profiler is not None:
+            self.__profiler.end_step(self.__time_elapsed, self.__num_agents, self.__plot_points[0][-1])
+        # stream counters (and periodic snapshots) to the output sink
+        if self.__sink is not None:
+            self.__sink.write_step(self.__time_elapsed, self.__stats)
+            if self.__sink.wants_snapshot(self.__time_elapsed):
+                self.__sink.write_snapshot(self.__time_elapsed, self.get_cell_state())
+        # append a delta frame to the recording
+        if self.__recorder is not None and self.__recorder.wants_frame(self.__time_elapsed):
+            self.__recorder.record(self.__time_elapsed, self.get_cell_state())
+
+    def save_checkpoint(self, path):
+        """save_checkpoint - writes the complete simulation state to a file
+        Stores the agent columns, cell occupancy, all counters and the exact
+        state of every random stream, so a resumed run is bit-identical to an
+        uninterrupted one.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays = { "status": self.__agents.status,
+                   "days_infected": self.__agents.days_infected,
+                   "age": self.__agents.age,
+                   "location": self.__agents.location,
+                   "susceptibility": self.__agents.susceptibility,
+                   "cell_counts": self.__cell_counts,
+                   "plot_points": plot_points_to_array(self.__plot_points),
+                   **topology_to_arrays(self.__topology) }
+        meta = { "engine": "vector",
+                 "network_params": {key: value for key, value in self.__network_params.items() if key != "t"},
+                 "agent_params": {key: value for key, value in self.__agent_params.items() if key != "beta"},
+                 "time_elapsed": self.__time_elapsed,
+                 "num_agents": self.__num_agents,
+                 "stats": self.__stats,
+                 "random_state": self.__streams.get_state() }
+        # make sure every streamed row up to this step is on disk too
+        if self.__sink is not None:
+            self.__sink.flush()
+        if self.__recorder is not None:
+            self.__recorder.flush()
+        write_checkpoint(path, arrays, meta)
+
+    def load_checkpoint(self, path):
+        """load_checkpoint - restores the simulation state written by save_checkpoint
+        Every parameter except t is taken from the checkpoint, so a run can be
+        resumed with a larger t to extend it.
+        Inputs:
+            - path: checkpoint file path
+        Outputs:
+            - None
+        """
+        arrays, meta = read_checkpoint(path, "vector")
+        for key in ("L", "topology"):
+            if meta["network_params"][key] != self.__network_params[key]:
+                raise ValueError(f"{path}: checkpoint has {key}={meta['network_params'][key]}, run has {key}={self.__network_params[key]}")
+        self.__network_params.update(meta["network_params"])
+        self.__topology = topology_from_arrays(arrays, self.__topology)
+        self.__agent_params.update(meta["agent_params"])
+        self.__agents = AgentPopulation(capacity=len(arrays["status"]), workdir=self.__storage["workdir"])
+        self.__agents.append(arrays["age"], arrays["location"], arrays["status"], arrays["days_infected"])
+        # vaccinated agents have their susceptibility zeroed (checkpoints from before interventions lack the column)
+        if "susceptibility" in arrays:
+            self.__agents.susceptibility[:] = arrays["susceptibility"]
+        self.__count_ages()
+        self.__plot_points = plot_points_from_array(arrays["plot_points"])
+        self.__time_elapsed = meta["time_elapsed"]
+        self.__num_agents = meta["num_agents"]
+        self.__stats = stats_from_json(meta["stats"])
+        self.__streams.set_state(meta["random_state"])
+
+    def close(self):
+        """close - releases resources held by the run (flushes the output sink and recording, stops the profiler)
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        if self.__sink is not None:
+            self.__sink.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+        if self.__profiler is not None:
+            self.__profiler.close()
+        if self.__pool is not None:
+            self.__pool.shutdown()
+
+    def run_simulation(self):
+        """run_simulation - runs t timesteps of simulation
+        Inputs:
+            - None
+        Outputs:
+            - None
+        """
+        while self.__time_elapsed < self.__network_params["t"]:
+            previous = self.__time_elapsed
+            self.step()
+            # draw only every render_every steps; never when headless
+            if self.__display is not None and self.__display.should_render(self.__time_elapsed, self.__network_params["t"]):
+                self.__run_phase("render", self.__update_display)
+            # periodically save a checkpoint to resume from (a fast-forward may jump past the multiple itself)
+            if self.__stop_reason is None and self.__checkpoint["every"] > 0 and self.__time_elapsed // self.__checkpoint["every"] > previous // self.__checkpoint["every"]:
+                self.save_checkpoint(self.__checkpoint["path"])
+        self.close()
+        # headless runs report the final counters instead of opening windows
+        if self.__display is None:
+            print(f"t={self.__time_elapsed} agents={self.__num_agents} stats={self.__stats}")
+            if self.__stop_reason is not None:
+                print(f"stopped early at t={self.__stop_reason[1]} ({self.__stop_reason[0]}); counters held until t={self.__time_elapsed}")
+            return
+        self.__display.show()
+        # display statistical graphs
+        self.__generate_statistical_display()
@@ -1,11 +1,11 @@
 import argparse
-import networkx as nx
-import random
-import math
-from Network import *
-from Agent import *
+import importlib
 
-def __parse_arguments():
+# engine name -> (module, class); an engine's module (and numpy with it) is only imported once it is used
+ENGINES = { "graph": ("Network", "Network"), "vector": ("VectorNetwork", "VectorNetwork"),
+            "sharded": ("ShardedNetwork", "ShardedNetwork"), "compartment": ("CompartmentNetwork", "CompartmentNetwork") }
+
+def build_parser():
     # generate a command-line argument parser to handle hyperparameter setting
     parser = argparse.ArgumentParser()
 
@@ -25,14 +25,107 @@ def __parse_arguments():
     parser.add_argument("--symp_l", type=int, nargs='?', default=20)
     # influx - probability that new agent is added per timestep (0 = no new agents)
     parser.add_argument("--influx", type=float, nargs='?', default=0.0)
+    # engine - simulation backend (graph = networkx + Agent objects, vector = NumPy arrays,
+    #          sharded = NumPy arrays split into strips over worker processes,
+    #          compartment = per-cell counts per age and disease day, for high densities)
+    parser.add_argument("--engine", type=str, nargs='?', default="graph", choices=list(ENGINES))
+    # shards - number of strips / worker processes for the sharded engine (default: all cores)
+    parser.add_argument("--shards", type=int, nargs='?', default=None)
+    # movement - one agent attempts a move per step (single) or every mobile agent does (sweep)
+    parser.add_argument("--movement", type=str, nargs='?', default="single", choices=["single", "sweep"])
+    # topology - contact graph between lattice cells (edge_list reads --edge_list)
+    parser.add_argument("--topology", type=str, nargs='?', default="lattice", choices=["lattice", "torus", "small_world", "edge_list"])
+    # rewire - probability of rewiring each lattice edge for the small_world topology
+    parser.add_argument("--rewire", type=float, nargs='?', default=0.1)
+    # edge_list - edge-list file (pairs of node indices i * L + j) for the edge_list topology
+    parser.add_argument("--edge_list", "--edge-list", type=str, nargs='?', default=None)
+    # headless - never open a window (pyplot is not even imported)
+    parser.add_argument("--headless", action="store_true")
+    # render_every - draw the lattice every K timesteps (0 = only the final statistics)
+    parser.add_argument("--render_every", "--render-every", type=int, nargs='?', default=1)
+    # output - directory to stream per-timestep statistics into (default: no output)
+    parser.add_argument("--output", type=str, nargs='?', default=None)
+    # output_format - npz (chunked .npz files), parquet (needs pyarrow) or auto
+    parser.add_argument("--output_format", type=str, nargs='?', default="auto", choices=["auto", "npz", "parquet"])
+    # output_chunk - timesteps buffered in memory between writes
+    parser.add_argument("--output_chunk", type=int, nargs='?', default=100)
+    # snapshot_every - write a full lattice snapshot every K timesteps (0 = never)
+    parser.add_argument("--snapshot_every", "--snapshot-every", type=int, nargs='?', default=0)
+    # record - directory to record per-cell delta frames into, for replay.py (default: no recording)
+    parser.add_argument("--record", type=str, nargs='?', default=None)
+    # record_every - record a frame every K timesteps
+    parser.add_argument("--record_every", "--record-every", type=int, nargs='?', default=1)
+    # keyframe_every - store a full frame every K recorded frames (replays seek to the nearest one)
+    parser.add_argument("--keyframe_every", "--keyframe-every", type=int, nargs='?', default=100)
+    # checkpoint - file to save checkpoints to
+    parser.add_argument("--checkpoint", type=str, nargs='?', default="checkpoint.npz")
+    # checkpoint_every - save a checkpoint every K timesteps (0 = never)
+    parser.add_argument("--checkpoint_every", "--checkpoint-every", type=int, nargs='?', default=0)
+    # resume - checkpoint file to resume a run from (all parameters but t come from the checkpoint)
+    parser.add_argument("--resume", type=str, nargs='?', default=None)
+    # seed - root seed of the per-phase random streams (omit for a fresh random run)
+    parser.add_argument("--seed", type=int, nargs='?', default=None)
+    # profile - time every phase of the timestep loop and count the agents each one updates
+    parser.add_argument("--profile", action="store_true")
+    # profile_every - print a metrics line every K timesteps while profiling (0 = only at the end)
+    parser.add_argument("--profile_every", "--profile-every", type=int, nargs='?', default=100)
+    # metrics_port - serve the profiler's counters as Prometheus text on 127.0.0.1:port/metrics
+    parser.add_argument("--metrics_port", "--metrics-port", type=int, nargs='?', default=None)
+    # workdir - memory-map the vector engine's agent columns and per-cell arrays in this directory (out-of-core runs)
+    parser.add_argument("--workdir", type=str, nargs='?', default=None)
+    # block_rows - lattice rows processed at a time (default: 256 with --workdir, else the whole lattice)
+    parser.add_argument("--block_rows", "--block-rows", type=int, nargs='?', default=None)
+    # debug - graph engine: recount every running counter from the agents after each step and stop on a mismatch
+    parser.add_argument("--debug", action="store_true")
+    # stop_extinct - stop once no agent is infectious and influx is 0 (the counters can no longer change)
+    parser.add_argument("--stop_extinct", "--stop-extinct", action="store_true")
+    # stop_steady - stop after K consecutive timesteps without an infection or death (0 = never)
+    parser.add_argument("--stop_steady", "--stop-steady", type=int, nargs='?', default=0)
+    # stop_attack - stop once this share of all agents has been infected (default: never)
+    parser.add_argument("--stop_attack", "--stop-attack", type=float, nargs='?', default=None)
+    # fast_forward - once no agent is infectious, run only the influx phase (or stop, when influx is 0)
+    parser.add_argument("--fast_forward", "--fast-forward", action="store_true")
+    # threads - vector engine: worker threads running the lattice tiles of the infection and death phases
+    parser.add_argument("--threads", type=int, nargs='?', default=1)
+    # interventions - vector engine: JSON list of distancing/vaccination/lockdown policies (see Interventions.py)
+    parser.add_argument("--interventions", type=str, nargs='?', default=None)
+    # estimate_memory - print the agent storage needed for this run and exit
+    parser.add_argument("--estimate_memory", action="store_true")
+
+    return parser
 
-    return parser.parse_args()
+def default_args(**overrides):
+    # argument namespace with every default, for running simulations from code
+    args = build_parser().parse_args([])
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    return args
+
+def load_engine(name):
+    # imports the simulation class of an engine on first use
+    module, cls = ENGINES[name]
+    return getattr(importlib.import_module(module), cls)
+
+def __parse_arguments():
+    # parse the command-line arguments
+    return build_parser().parse_args()
 
 def main():
     # gather command-line arguments
     args = __parse_arguments()
-    # initialize network
-    network = Network(args)
+    # report agent storage for the vector engine without running anything
+    if args.estimate_memory:
+        from AgentPopulation import AgentPopulation
+        from CompartmentNetwork import CompartmentNetwork
+        count = int(args.L * args.L * args.N)
+        print(f"{count} agents x {AgentPopulation.bytes_per_agent()} bytes/agent = {AgentPopulation.estimate_bytes(count) / 2**20:.1f} MiB")
+        # the compartment engine's storage depends on the cells and disease length, not the agents
+        cells = args.L * args.L
+        print(f"compartment engine: {cells} cells x {CompartmentNetwork.bytes_per_cell(args.asym_l, args.symp_l)} bytes/cell = "
+              f"{CompartmentNetwork.estimate_bytes(args.L, args.asym_l, args.symp_l) / 2**20:.1f} MiB")
+        return
+    # initialize network with the selected engine
+    network = load_engine(args.engine)(args)
     # run simulation based on hyper-parameters given
     network.run_simulation()
 
@@ -0,0 +1,126 @@
+import argparse
+import os
+import numpy as np
+from Recorder import Recording
+from Display import cell_colors
+
+# output extensions written as video (anything else is a directory of PNG frames)
+VIDEO_FORMATS = [".gif", ".mp4"]
+
+def frame_title(time_elapsed, cell_state):
+    # title of a frame, as in the live display: timestep and number of living agents
+    return f"{time_elapsed} - Number of Agents: {int(cell_state[:3].sum())}"
+
+def frame_image(cell_state, scale=1):
+    """frame_image - RGB image of a frame, each cell drawn as a scale x scale block
+    Inputs:
+        - cell_state: 4 x L x L per-cell counts of each status code
+        - (Optional) scale: pixels per cell along each side
+    Outputs:
+        - (L * scale) x (L * scale) x 3 uint8 array
+    """
+    rgb = (cell_colors(cell_state) * 255).astype(np.uint8)
+    if scale > 1:
+        rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+    return rgb
+
+def export_images(recording, out_dir, start=0, stop=None, stride=1, scale=1):
+    """export_images - writes frames as a numbered PNG sequence
+    Inputs:
+        - recording: Recording to read
+        - out_dir: output directory (created if needed)
+        - (Optional) start, stop, stride: frames to export (see Recording.iter_frames)
+        - (Optional) scale: pixels per cell along each side
+    Outputs:
+        - int: number of frames written
+    """
+    import matplotlib.image
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    for time_elapsed, cell_state in recording.iter_frames(start, stop, stride):
+        matplotlib.image.imsave(os.path.join(out_dir, f"frame_{time_elapsed:06d}.png"), frame_image(cell_state, scale))
+        count += 1
+    return count
+
+def export_video(recording, path, fps=10, start=0, stop=None, stride=1, dpi=100):
+    """export_video - writes frames as a GIF (Pillow) or MP4 (ffmpeg) video
+    Inputs:
+        - recording: Recording to read
+        - path: output file; the extension picks the format
+        - (Optional) fps: frames per second of the video
+        - (Optional) start, stop, stride: frames to export (see Recording.iter_frames)
+        - (Optional) dpi: resolution of the rendered figure
+    Outputs:
+        - int: number of frames written
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib import animation
+    if path.endswith(".mp4"):
+        if not animation.writers.is_available("ffmpeg"):
+            raise RuntimeError("writing .mp4 needs ffmpeg on the PATH; write a .gif or a PNG sequence instead")
+        writer = animation.FFMpegWriter(fps=fps)
+    else:
+        writer = animation.PillowWriter(fps=fps)
+    figure = plt.figure(figsize=(8, 8))
+    L = recording.get_L()
+    image = plt.imshow(np.zeros((L, L, 3)), interpolation="nearest")
+    title = plt.title("")
+    count = 0
+    with writer.saving(figure, path, dpi):
+        for time_elapsed, cell_state in recording.iter_frames(start, stop, stride):
+            image.set_data(cell_colors(cell_state))
+            title.set_text(frame_title(time_elapsed, cell_state))
+            writer.grab_frame()
+            count += 1
+    plt.close(figure)
+    return count
+
+def play(recording, fps=10, start=0, stop=None, stride=1):
+    """play - plays frames in a window at a fixed frame rate
+    Inputs:
+        - recording: Recording to read
+        - (Optional) fps: frames per second
+        - (Optional) start, stop, stride: frames to play (see Recording.iter_frames)
+    Outputs:
+        - None; displays as a window
+    """
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(8, 8))
+    L = recording.get_L()
+    image = plt.imshow(np.zeros((L, L, 3)), interpolation="nearest")
+    title = plt.title("")
+    for time_elapsed, cell_state in recording.iter_frames(start, stop, stride):
+        image.set_data(cell_colors(cell_state))
+        title.set_text(frame_title(time_elapsed, cell_state))
+        plt.pause(1 / fps)
+    plt.show()
+
+def main():
+    # command-line options for replaying a recording
+    parser = argparse.ArgumentParser()
+    # recording - directory written with main.py --record
+    parser.add_argument("recording", type=str)
+    # out - .gif/.mp4 file, or a directory for PNG frames (default: play in a window)
+    parser.add_argument("--out", type=str, nargs='?', default=None)
+    parser.add_argument("--fps", type=float, nargs='?', default=10)
+    # start/stop/stride - frame indices to replay (stride 2 = every other frame)
+    parser.add_argument("--start", type=int, nargs='?', default=0)
+    parser.add_argument("--stop", type=int, nargs='?', default=None)
+    parser.add_argument("--stride", type=int, nargs='?', default=1)
+    # scale - pixels per cell of exported PNG frames
+    parser.add_argument("--scale", type=int, nargs='?', default=4)
+    args = parser.parse_args()
+
+    recording = Recording(args.recording)
+    print(f"{len(recording)} frames of {recording.get_L()} x {recording.get_L()}, {recording.nbytes() / 2**20:.1f} MiB")
+    if args.out is None:
+        play(recording, args.fps, args.start, args.stop, args.stride)
+    elif os.path.splitext(args.out)[1] in VIDEO_FORMATS:
+        print(f"wrote {export_video(recording, args.out, args.fps, args.start, args.stop, args.stride)} frames to {args.out}")
+    else:
+        print(f"wrote {export_images(recording, args.out, args.start, args.stop, args.stride, args.scale)} frames to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import default_args, load_engine
+
+SEEDS = range(16)
+STEPS = 30
+
+def infected_by_age(engine, seed):
+    # runs one small simulation and returns the cumulative infections of each age category
+    overrides = {"shards": 2} if engine == "sharded" else {}
+    network = load_engine(engine)(default_args(engine=engine, L=20, N=1, n_0=5, t=STEPS, seed=seed,
+                                               headless=True, **overrides))
+    for _ in range(STEPS):
+        network.step()
+    stats = network.get_stats()
+    if hasattr(network, "close"):
+        network.close()
+    return np.array([stats[age]["infected"] for age in range(1, 5)])
+
+@pytest.fixture(scope="module")
+def reference():
+    # vector engine runs every engine is compared against
+    return np.array([infected_by_age("vector", seed) for seed in SEEDS])
+
+@pytest.mark.parametrize("engine", ["graph", "compartment", "sharded"])
+def test_engines_agree_statistically(reference, engine):
+    runs = np.array([infected_by_age(engine, seed) for seed in SEEDS])
+    # the mean epidemic size agrees within four standard errors of the difference
+    totals, reference_totals = runs.sum(axis=1), reference.sum(axis=1)
+    error = np.sqrt(totals.var(ddof=1) / len(SEEDS) + reference_totals.var(ddof=1) / len(SEEDS))
+    assert abs(totals.mean() - reference_totals.mean()) < 4 * error
+    # and so does its split over the age categories
+    assert np.allclose(runs.sum(axis=0) / totals.sum(), reference.sum(axis=0) / reference_totals.sum(), atol=0.05)
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import pytest
+
+SOURCE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCE)
+
+from OutputSink import COLUMNS, has_pyarrow, load_stats
+
+# runs a simulation with a sink and exits without closing it, like a crashed or killed run
+KILLED_RUN = """
+import os, sys
+from main import default_args, load_engine
+args = default_args(engine="graph", L=20, N=1, n_0=5, t=1000, seed=3, headless=True,
+                    output=sys.argv[1], output_format=sys.argv[2], output_chunk=10)
+network = load_engine("graph")(args)
+for _ in range(35):
+    network.step()
+os._exit(0)
+"""
+
+def run_killed(path, output_format):
+    # runs KILLED_RUN in a child process and checks it exited without closing the sink
+    result = subprocess.run([sys.executable, "-c", KILLED_RUN, str(path), output_format],
+                            cwd=SOURCE, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+@pytest.mark.parametrize("output_format", [
+    "npz",
+    pytest.param("parquet", marks=pytest.mark.skipif(not has_pyarrow(), reason="pyarrow is not installed")),
+])
+def test_killed_run_keeps_completed_chunks(tmp_path, output_format):
+    run_killed(tmp_path, output_format)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    stats = load_stats(tmp_path)
+    assert set(stats) == set(COLUMNS)
+    # 35 steps with chunks of 10: the three full chunks survive, the buffered rows are lost
+    assert len(stats["time"]) == 30
+    assert list(stats["time"]) == sorted(stats["time"])
+    assert (stats["age1_total"] >= 0).all()